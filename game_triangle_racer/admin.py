@@ -4,6 +4,8 @@ from game_triangle_racer.models import (
     Config,
     ConfigOfInitialPlayerResource,
     ConfigOfInitialPlayerCostume,
+    ConfigOfInitialPlayerTimer,
+    ConfigOfResourceLimit,
     Player,
     Resource,
     Costume,
@@ -31,6 +33,20 @@ class ConfigOfInitialPlayerCostumeAdmin(ModelAdmin):
     list_display = ('costume', )
 
 
+# ConfigOfInitialPlayerTimerAdmin
+
+class ConfigOfInitialPlayerTimerAdmin(ModelAdmin):
+
+    list_display = ('timer', 'start_delay', )
+
+
+# ConfigOfResourceLimitAdmin
+
+class ConfigOfResourceLimitAdmin(ModelAdmin):
+
+    list_display = ('resource', 'max_count', )
+
+
 # PlayerAdmin
 
 class PlayerResourceInline(TabularInline):
@@ -95,6 +111,22 @@ class PlayerAdmin(ModelAdmin):
     )
     inlines = [PlayerResourceInline, PlayerCostumeInline, PlayerTimerInline]
 
+    def save_model(self, request, obj, form, change):
+
+        if change:
+            # Версия и снимок состояния меняются только UPDATE с F(): не перезаписываем их прочитанными значениями
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+
+        super().save_related(request, form, formsets, change)
+
+        # Ресурсы, костюмы, таймеры или уровень могли измениться: снимок Pull собирается заново
+        Player.bump_versions([form.instance.pk])
+        Player.update_next_timer_start(form.instance.pk)
+
 
 # TimerAdmin
 
@@ -139,6 +171,8 @@ class ShopSetAdmin(ModelAdmin):
 admin.site.register(Config)
 admin.site.register(ConfigOfInitialPlayerResource, ConfigOfInitialPlayerResourceAdmin)
 admin.site.register(ConfigOfInitialPlayerCostume, ConfigOfInitialPlayerCostumeAdmin)
+admin.site.register(ConfigOfInitialPlayerTimer, ConfigOfInitialPlayerTimerAdmin)
+admin.site.register(ConfigOfResourceLimit, ConfigOfResourceLimitAdmin)
 admin.site.register(Player, PlayerAdmin)
 admin.site.register(Resource)
 admin.site.register(Costume)
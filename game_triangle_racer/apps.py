@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GameTriangleRacerConfig(AppConfig):
 
     name = 'game_triangle_racer'
+
+    def ready(self):
+
+        from game_triangle_racer import signals  # noqa: F401  Подключение обработчиков сигналов
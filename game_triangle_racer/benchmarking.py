@@ -0,0 +1,238 @@
+"""Общие инструменты команд замера производительности (benchmark_*)."""
+
+
+import hashlib
+import io
+import math
+import sys
+import urllib.error
+import urllib.request
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from game_triangle_racer import helpers, jsoncodec
+from game_triangle_racer.models import Player
+from game_triangle_racer.views import interdata
+
+
+# Синтетические игроки создаются на отдельной платформе; после замера удаляются только
+# игроки, созданные этим запуском
+BENCHMARK_PLATFORM = 'benchmark'
+
+# StartAPI обслуживает только VK, поэтому для замеров Start синтетические игроки
+# заводятся на платформе VK в верхнем диапазоне platform_id, недостижимом для реальных id
+VK_PLATFORM = 'vk.com'
+BENCHMARK_VK_PLATFORM_ID_BASE = 2_100_000_000
+
+# Не больше стольких game_id в одном запросе удаления (ограничение числа параметров SQLite)
+DELETE_BATCH_SIZE = 500
+
+
+class BenchmarkPlayer:
+    """Данные синтетического игрока, нужные клиенту для подписанных запросов."""
+
+    def __init__(self, player):
+
+        self.game_id = player.game_id
+        self.platform_id = player.platform_id
+        self.login_stamp = player.login_stamp
+        self.token_hex = player.token.encode('utf-8').hex()
+        self.secret = str(player.session_quasisecret)
+
+    def make_start_payload(self, platform_api_id=1):
+        """Тело запроса StartAPI с верным ключом авторизации VK (для игроков на VK_PLATFORM)."""
+
+        return {
+            interdata.FIELD_PLATFORM: VK_PLATFORM,
+            interdata.FIELD_PLATFORM_ID: self.platform_id,
+            interdata.FIELD_PLATFORM_API_ID: platform_api_id,
+            interdata.FIELD_PLATFORM_AUTH_KEY: make_vk_auth_key(platform_api_id, self.platform_id),
+        }
+
+    def start_session(self, response):
+        """Переходит на сессию из ответа StartAPI. Возвращает False, если сессия не начата."""
+
+        if not interdata.is_successful(response):
+            return False
+
+        self.token_hex = interdata.get_token(response).encode('utf-8').hex()
+        self.secret = str(interdata.get_t(response) - self.login_stamp)
+
+        return True
+
+
+def add_production_db_argument(parser):
+
+    parser.add_argument(
+        '--allow-production-db',
+        action='store_true',
+        help='Разрешить запуск на рабочей БД (PRODUCTION_DATABASE=True): замер создаёт и удаляет игроков.',
+    )
+
+
+def check_database_allowed(options):
+    """Запрещает замер на рабочей БД без явного --allow-production-db."""
+
+    if settings.PRODUCTION_DATABASE and not options['allow_production_db']:
+        raise CommandError(
+            'PRODUCTION_DATABASE=True: замер создаёт и удаляет игроков в рабочей БД. '
+            'Если это действительно нужно, добавьте --allow-production-db.'
+        )
+
+
+def create_benchmark_players(count, platform=BENCHMARK_PLATFORM):
+    """
+    Создаёт count синтетических игроков с открытой сессией.
+
+    Новые platform_id берутся после наибольшего из уже занятых в диапазоне синтетических
+    игроков, поэтому игроки прежних запусков (--keep-players) не мешают и не удаляются.
+    С platform=VK_PLATFORM игроки могут начинать сессии через StartAPI (см. make_vk_auth_key).
+    """
+
+    players = []
+    stamp = helpers.datetime_to_stamp(helpers.datetime_now_utc())
+    base_platform_id = BENCHMARK_VK_PLATFORM_ID_BASE if platform == VK_PLATFORM else 0
+    last_platform_id = Player.objects.filter(
+        platform=platform,
+        platform_id__gt=base_platform_id,
+    ).aggregate(Max('platform_id'))['platform_id__max']
+    first_platform_id = max(base_platform_id, last_platform_id or 0)
+
+    for platform_id in range(first_platform_id + 1, first_platform_id + count + 1):
+        with transaction.atomic():
+            player = Player.create_and_get_new_player(platform, platform_id, stamp)
+            player.login_stamp = stamp
+            player.start_stamp = stamp + platform_id - first_platform_id
+            player.session_quasisecret = player.start_stamp - player.login_stamp
+            player.get_token(expires_in=24 * 3600)
+            player.save()
+
+        players.append(BenchmarkPlayer(player))
+
+    return players
+
+
+def delete_benchmark_players(players):
+    """Удаляет синтетических игроков, созданных create_benchmark_players."""
+
+    game_ids = [player.game_id for player in players]
+
+    for i in range(0, len(game_ids), DELETE_BATCH_SIZE):
+        Player.objects.filter(game_id__in=game_ids[i:i + DELETE_BATCH_SIZE]).delete()
+
+
+def make_vk_auth_key(platform_api_id, platform_id):
+    """Ключ авторизации VK, который StartAPI проверяет через helpers.is_vk_session_valid."""
+
+    return hashlib.md5(f'{platform_api_id}_{platform_id}_{settings.VK_APP_SECURE_KEY}'.encode('utf-8')).hexdigest()
+
+
+def make_signed_body(payload, secret):
+    """Подписывает копию payload так же, как игровой клиент, и возвращает тело запроса."""
+
+    payload = dict(payload)
+    interdata.signify(payload, secret)
+
+    return jsoncodec.dumps(payload)
+
+
+def get_benchmark_host():
+
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+
+    return hosts[0] if hosts else 'localhost'
+
+
+def make_wsgi_environ(path, body, host=None):
+    """Собирает WSGI-окружение POST-запроса с JSON-телом (по HTTPS, как за nginx)."""
+
+    host = host or get_benchmark_host()
+
+    return {
+        'REQUEST_METHOD': 'POST',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+class TestClientTransport:
+    """Запросы через тестовый клиент Django в этом процессе; считает запросы к БД."""
+
+    def __init__(self):
+
+        self.client = Client(raise_request_exception=False, HTTP_HOST=get_benchmark_host())
+
+    def post(self, path, body):
+        """Возвращает (HTTP-статус, тело ответа, число запросов к БД)."""
+
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+
+            queries[0] += 1
+
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            response = self.client.post(path, body, content_type='application/json', secure=True)
+
+        return response.status_code, response.content, queries[0]
+
+    def close(self):
+
+        connection.close()
+
+
+class HttpTransport:
+    """Запросы к запущенному серверу по HTTP."""
+
+    def __init__(self, base_url):
+
+        self.base_url = base_url
+
+    def post(self, path, body):
+
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=body,
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, response.read(), None
+
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), None
+
+    def close(self):
+
+        pass
+
+
+def percentile(sorted_values, q):
+    """Перцентиль q (0..100) по уже отсортированному списку (ближайший ранг)."""
+
+    if not sorted_values:
+        return 0.0
+
+    rank = math.ceil(q / 100.0 * len(sorted_values))
+
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
@@ -0,0 +1,174 @@
+"""Внутрипроцессные кэши для горячих путей игрового API."""
+
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру кэш с вытеснением давно неиспользуемых записей (LRU)
+    и временем жизни записей (TTL).
+
+    Потокобезопасен. Хранит счётчики попаданий и промахов.
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0):
+
+        self.max_size = max(int(max_size), 0)
+        self.ttl = float(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу или default, если записи нет или она устарела."""
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+
+            self.misses += 1
+
+        return default
+
+    def put(self, key, value, ttl=None):
+        """Кладёт значение в кэш. TTL записи не превышает TTL кэша."""
+
+        if self.max_size == 0:
+            return
+
+        ttl = self.ttl if ttl is None else min(float(ttl), self.ttl)
+
+        if ttl <= 0.0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Возвращает счётчики кэша."""
+
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class Snapshot:
+    """
+    Лениво загружаемый снимок редко меняющихся данных (каталоги, настройки).
+
+    Снимок загружается функцией loader при первом обращении и живёт не дольше
+    ttl секунд. Каждая загрузка увеличивает version. invalidate() сбрасывает
+    снимок; загрузка, начатая до сброса, не сохраняет свой результат.
+    """
+
+    def __init__(self, loader, ttl=60.0):
+
+        self.ttl = float(ttl)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._loader = loader
+        self._value = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+
+        value = self._value
+
+        if value is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self.hits += 1
+
+            return value
+
+        return self._load(min_age=self.ttl)
+
+    def peek(self):
+        """Возвращает снимок, если он загружен и не устарел, иначе None. Никогда не обращается к БД."""
+
+        value = self._value
+
+        if value is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self.hits += 1
+
+            return value
+
+        return None
+
+    def refresh(self, min_age=1.0):
+        """Перезагружает снимок, если он старше min_age секунд (защита от частых перезагрузок)."""
+
+        return self._load(min_age=min_age)
+
+    def invalidate(self):
+
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    def stats(self):
+
+        return {
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _load(self, min_age):
+
+        with self._lock:
+            value = self._value
+            age = time.monotonic() - self._loaded_at
+
+            if value is not None and age < min_age:
+                return value
+
+            self.misses += 1
+            generation = self._generation
+
+        value = self._loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.monotonic()
+                self.version += 1
+
+        return value
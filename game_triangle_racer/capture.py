@@ -0,0 +1,95 @@
+"""
+Запись входящих запросов игрового API для воспроизведения командой replay_capture.
+
+При GAME_REQUEST_CAPTURE=True каждый запрос Start/Pull/Push/Shop записывается одной
+строкой JSON через логгер CAPTURE_LOGGER_NAME. Его обработчик (см. LOGGING) - фоновый
+QueuedFileHandler с ротацией по размеру, по файлу на процесс. Конверт запроса:
+
+    {"ts": <время прихода, с>, "endpoint": "pull", "session": "<id сессии>",
+     "player": "<псевдоним игрока>", "body": {...}, "status": 200, "ms": 1.84}
+
+Секреты не записываются. Подпись удаляется (replay подписывает запрос заново),
+токен заменяется необратимым id сессии, а platformID - псевдонимом игрока
+(player есть только у Start). platformAuthKey маскируется.
+"""
+
+
+import hashlib
+import logging
+import time
+from django.conf import settings
+from game_triangle_racer import jsoncodec
+from game_triangle_racer.views import interdata
+
+
+CAPTURE_LOGGER_NAME = 'game_triangle_racer.capture'
+
+# Поля тела, которые в записи заменяются звёздочками
+MASKED_FIELDS = (interdata.FIELD_PLATFORM_AUTH_KEY, )
+
+capture_logger = logging.getLogger(CAPTURE_LOGGER_NAME)
+
+
+def is_enabled():
+
+    return settings.GAME_REQUEST_CAPTURE
+
+
+def _digest(value):
+
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()[:16]
+
+
+def get_session_id(token_hex):
+    """Необратимый id сессии по hex-токену из URL."""
+
+    return _digest(token_hex) if token_hex else None
+
+
+def get_player_alias(platform, platform_id):
+    """Необратимый псевдоним игрока платформы."""
+
+    return _digest(f'{platform}:{platform_id}')
+
+
+def mask_body(data):
+    """Копия тела запроса без подписи, токенов и идентификаторов платформы."""
+
+    masked = {k: v for k, v in data.items() if k != interdata.FIELD_SIGNATURE}
+
+    for name in MASKED_FIELDS:
+        if name in masked:
+            masked[name] = '***'
+
+    masked.pop(interdata.FIELD_PLATFORM_ID, None)
+
+    return masked
+
+
+def record(endpoint, body, status_code, started, token_hex=None, player_alias=None):
+    """
+    Записывает запрос, если запись включена.
+
+    body - сырое тело запроса, started - time.perf_counter() в начале обработки.
+    Тело разбирается заново только при включённой записи.
+    """
+
+    if not is_enabled():
+        return
+
+    elapsed = time.perf_counter() - started
+    data = interdata.from_json(body)
+
+    envelope = {
+        'ts': round(time.time() - elapsed, 6),
+        'endpoint': endpoint,
+        'session': get_session_id(token_hex),
+        'body': mask_body(data) if isinstance(data, dict) else None,
+        'status': status_code,
+        'ms': round(elapsed * 1000.0, 3),
+    }
+
+    if player_alias is not None:
+        envelope['player'] = player_alias
+
+    capture_logger.info(jsoncodec.dumps(envelope).decode('utf-8'))
@@ -0,0 +1,85 @@
+"""
+Каталог ресурсов, костюмов и таймеров, общий для процесса.
+
+Справочники маленькие и меняются только через админку, поэтому горячие пути
+берут соответствия "имя <-> id" и длительности таймеров из снимка в памяти
+и фильтруют строки игрока по целочисленным внешним ключам, без JOIN по имени.
+Снимок сбрасывается сигналами post_save/post_delete (см. signals.py), а в
+остальных процессах устаревает не позже, чем через GAME_CATALOG_CACHE_TTL.
+"""
+
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from game_triangle_racer.caching import Snapshot
+from game_triangle_racer.models import Costume, Resource, Timer
+
+
+# Не перечитываем каталог из-за неизвестных имён чаще, чем раз в столько секунд
+MIN_REFRESH_INTERVAL = 1.0
+
+
+class Catalog:
+    """Неизменяемый снимок справочников. Не изменяйте словари снимка."""
+
+    def __init__(self, resources, costumes, timers):
+
+        self.resource_ids = {name: pk for pk, name in resources}
+        self.resource_names = {pk: name for pk, name in resources}
+        self.costume_ids = {name: pk for pk, name in costumes}
+        self.costume_names = {pk: name for pk, name in costumes}
+        self.timer_ids = {name: pk for pk, name, _ in timers}
+        self.timer_names = {pk: name for pk, name, _ in timers}
+        self.timer_durations = {pk: duration for pk, _, duration in timers}
+
+
+def _load_catalog():
+
+    return Catalog(
+        resources=list(Resource.objects.values_list('id', 'name')),
+        costumes=list(Costume.objects.values_list('id', 'name')),
+        timers=list(Timer.objects.values_list('id', 'name', 'duration')),
+    )
+
+
+_snapshot = Snapshot(_load_catalog, ttl=settings.GAME_CATALOG_CACHE_TTL)
+
+
+def get_catalog():
+    """Возвращает текущий снимок каталога."""
+
+    return _snapshot.get()
+
+
+async def aget_catalog():
+    """Асинхронный вариант get_catalog: загрузка снимка (если нужна) выполняется в потоке."""
+
+    value = _snapshot.peek()
+
+    return value if value is not None else await sync_to_async(get_catalog)()
+
+
+def get_refreshed_catalog():
+    """
+    Возвращает перечитанный снимок каталога.
+
+    Используется, когда в запросе встретилось имя или id, которых нет в снимке:
+    возможно, запись только что добавили в админке другого процесса.
+    """
+
+    return _snapshot.refresh(min_age=MIN_REFRESH_INTERVAL)
+
+
+def invalidate_catalog():
+
+    _snapshot.invalidate()
+
+
+def get_catalog_version():
+
+    return _snapshot.version
+
+
+def get_catalog_stats():
+
+    return _snapshot.stats()
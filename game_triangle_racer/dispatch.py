@@ -0,0 +1,112 @@
+"""
+Облегчённая диспетчеризация подписанных запросов игрового API.
+
+Запросы /api/pull|push|shop|batch/<token>/ аутентифицируются токеном и подписью и не
+используют ни сессии, ни CSRF, ни пользователей Django, ни согласование
+контента DRF. LeanGameAPIMiddleware - WSGI-обёртка над приложением Django,
+которая обрабатывает такие запросы сама, вызывая process_signed_request
+тех же классов представлений, а остальные запросы передаёт приложению.
+
+Включается настройкой GAME_API_LEAN_DISPATCH (см. wsgi.py).
+"""
+
+
+import logging
+from http import HTTPStatus
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import reverse
+from rest_framework import status
+from game_triangle_racer import instrumentation, jsoncodec
+from game_triangle_racer.views import PullAPI, PushAPI, ShopAPI, BatchAPI, interdata
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PLACEHOLDER = 'TOKEN'
+
+# Имя URL -> класс представления, запросы к которым обслуживаются напрямую
+LEAN_ROUTES = {
+    'game_triangle_racer:api-pull': PullAPI,
+    'game_triangle_racer:api-push': PushAPI,
+    'game_triangle_racer:api-shop': ShopAPI,
+    'game_triangle_racer:api-batch': BatchAPI,
+}
+
+
+class LeanGameAPIMiddleware:
+    """WSGI-обёртка, обслуживающая POST-запросы игрового API в обход middleware Django и DRF."""
+
+    def __init__(self, application):
+
+        self.application = application
+        self.routes = []  # (префикс пути, суффикс пути, класс представления, имя для замеров)
+
+        for url_name, view_class in LEAN_ROUTES.items():
+            path_prefix, path_suffix = reverse(url_name, kwargs={'token': _TOKEN_PLACEHOLDER}).split(_TOKEN_PLACEHOLDER)
+            endpoint = url_name.rsplit(':api-', 1)[-1]
+            self.routes.append((path_prefix, path_suffix, view_class, endpoint))
+
+    def __call__(self, environ, start_response):
+
+        route = self.resolve(environ)
+
+        if route is None:
+            return self.application(environ, start_response)
+
+        view_class, token_hex, endpoint = route
+        request = WSGIRequest(environ)
+
+        if settings.SECURE_SSL_REDIRECT and not request.is_secure():
+            return self.application(environ, start_response)  # Перенаправление сделает SecurityMiddleware
+
+        signals.request_started.send(sender=self.__class__, environ=environ)
+
+        try:
+            with instrumentation.measure_request(endpoint):
+                response, status_code = self.handle(view_class, request, token_hex)
+
+        finally:
+            signals.request_finished.send(sender=self.__class__)
+
+        content = jsoncodec.dumps(response)
+        start_response(
+            f'{status_code} {HTTPStatus(status_code).phrase}',
+            [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(content))),
+            ]
+        )
+
+        return [content]
+
+    def resolve(self, environ):
+        """Возвращает (класс представления, hex-токен, имя для замеров) для запроса к API или None."""
+
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return None
+
+        path = environ.get('PATH_INFO', '')
+
+        for path_prefix, path_suffix, view_class, endpoint in self.routes:
+            if path.startswith(path_prefix) and path.endswith(path_suffix):
+                token_hex = path[len(path_prefix):len(path) - len(path_suffix)]
+
+                if token_hex and '/' not in token_hex:
+                    return view_class, token_hex, endpoint
+
+        return None
+
+    @staticmethod
+    def handle(view_class, request, token_hex):
+
+        try:
+            content_type = request.META.get('CONTENT_TYPE', request.META.get('HTTP_CONTENT_TYPE', ''))
+
+            return view_class().process_signed_request(content_type, request.body, token=token_hex)
+
+        except Exception as e:
+            logger.error(f'Ошибка при обработке запроса: {e}', exc_info=True)
+
+            return interdata.create_just_failure(), status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -43,6 +43,9 @@ def stringify(struct):
     
     Важно: порядок элементов в списках и словарях не важен - они сортируются
     для обеспечения стабильности подписи независимо от порядка передачи.
+
+    Эталонная реализация: подписи API вычисляет game_triangle_racer.signature,
+    совместимость с ней проверяют тесты (SignatureCompatibilityTests).
     """
 
     def _(w):
@@ -0,0 +1,179 @@
+"""
+Замер запросов игрового API: число SQL-запросов, время в БД и время обработки.
+
+Обёртка record_query ставится на каждое соединение с БД (connection.execute_wrappers,
+см. signals.py) и считает запросы только пока идёт замер - текущий замер хранится
+в ContextVar, поэтому учитываются и запросы асинхронных представлений, выполняемые
+в потоках через sync_to_async. Вне замера обёртка лишь читает ContextVar.
+
+Замер открывают GameAPIInstrumentationMiddleware (обычный стек Django) и
+LeanGameAPIMiddleware (облегчённая диспетчеризация). Итоги копятся в процессе
+по меткам вида "pull" или "shop:buy" и передаются в метрики (см. metrics.py);
+запросы дольше GAME_SLOW_REQUEST_MS попадают в лог. Включается настройкой
+GAME_API_INSTRUMENTATION.
+"""
+
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from game_triangle_racer import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_current_measure = ContextVar('game_api_request_measure', default=None)
+
+_aggregates = {}  # Метка -> RequestAggregate
+_aggregates_lock = threading.Lock()
+
+
+class RequestMeasure:
+    """Замер одного запроса. Запрос учитывается, только если для него задан endpoint."""
+
+    __slots__ = ('endpoint', 'action', 'queries', 'db_time', 'started')
+
+    def __init__(self, endpoint=None):
+
+        self.endpoint = endpoint
+        self.action = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def label(self):
+
+        return f'{self.endpoint}:{self.action}' if self.action else self.endpoint
+
+
+class RequestAggregate:
+    """Накопленные итоги запросов с одной меткой."""
+
+    __slots__ = ('count', 'queries', 'db_time', 'view_time', 'max_view_time', 'slow')
+
+    def __init__(self):
+
+        self.count = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.max_view_time = 0.0
+        self.slow = 0
+
+    def as_dict(self):
+
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (connection.execute_wrapper): учитывает запрос в текущем замере."""
+
+    measure = _current_measure.get()
+
+    if measure is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+
+    finally:
+        measure.queries += 1
+        measure.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    """Ставит record_query на соединение (один раз на объект соединения)."""
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure_request(endpoint=None):
+    """
+    Замеряет запрос внутри блока with. Возвращает RequestMeasure или None, если замеры выключены.
+
+    Если endpoint не известен заранее, его можно задать позже через set_endpoint.
+    """
+
+    if not settings.GAME_API_INSTRUMENTATION:
+        yield None
+
+        return
+
+    measure = RequestMeasure(endpoint)
+    token = _current_measure.set(measure)
+
+    try:
+        yield measure
+
+    finally:
+        _current_measure.reset(token)
+        _finish(measure)
+
+
+def set_endpoint(endpoint):
+
+    measure = _current_measure.get()
+
+    if measure is not None:
+        measure.endpoint = endpoint
+
+
+def set_action(action):
+    """Уточняет метку текущего запроса действием (например, действием магазина)."""
+
+    measure = _current_measure.get()
+
+    if measure is not None:
+        measure.action = action
+
+
+def _finish(measure):
+
+    if measure.endpoint is None:
+        return
+
+    view_time = time.perf_counter() - measure.started
+    is_slow = view_time * 1000.0 >= settings.GAME_SLOW_REQUEST_MS
+    label = measure.label
+
+    with _aggregates_lock:
+        aggregate = _aggregates.get(label)
+
+        if aggregate is None:
+            aggregate = _aggregates[label] = RequestAggregate()
+
+        aggregate.count += 1
+        aggregate.queries += measure.queries
+        aggregate.db_time += measure.db_time
+        aggregate.view_time += view_time
+        aggregate.max_view_time = max(aggregate.max_view_time, view_time)
+        aggregate.slow += is_slow
+
+    metrics.observe_request(measure.endpoint, measure.action, view_time, measure.queries, measure.db_time, is_slow)
+
+    if is_slow:
+        logger.warning(
+            f'Медленный запрос {label}: {view_time * 1000.0:.1f} мс, '
+            f'SQL-запросов {measure.queries}, в БД {measure.db_time * 1000.0:.1f} мс.'
+        )
+
+
+def get_request_stats():
+    """Возвращает накопленные в процессе итоги: метка -> словарь счётчиков (время в секундах)."""
+
+    with _aggregates_lock:
+        return {label: aggregate.as_dict() for label, aggregate in _aggregates.items()}
+
+
+def reset_request_stats():
+
+    with _aggregates_lock:
+        _aggregates.clear()
@@ -0,0 +1,60 @@
+"""
+Кодирование и разбор JSON для игрового API.
+
+Если установлен orjson, используется он; иначе - стандартный модуль json.
+На входных данных, которые orjson не поддерживает (числа вне 64 бит, NaN,
+нестроковые ключи и т.п.), выполняется откат на json, поэтому результат
+не зависит от того, установлен ли orjson.
+"""
+
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _std_loads(data):
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8')
+
+    return json.loads(data)
+
+
+def _std_dumps(obj):
+
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    Разбирает JSON из str или bytes.
+
+    Ошибки - json.JSONDecodeError или UnicodeDecodeError, как у стандартного модуля.
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # Сообщение и тип ошибки - как у стандартного модуля
+
+    return _std_loads(data)
+
+
+def dumps(obj):
+    """Кодирует объект в компактный JSON (UTF-8, без экранирования не-ASCII). Возвращает bytes."""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+
+    return _std_dumps(obj)
@@ -0,0 +1,77 @@
+"""
+Пределы игровых значений (уровень, количество ресурсов) из Config, общие для процесса.
+
+Пределы читаются из Config и ConfigOfResourceLimit один раз в снимок, поэтому
+проверка целого Push не делает запросов к БД. Снимок сбрасывается сигналами
+(см. signals.py), а в остальных процессах устаревает не позже, чем через
+GAME_LIMITS_CACHE_TTL.
+"""
+
+
+import logging
+from django.conf import settings
+from django.db import DatabaseError
+from game_triangle_racer.caching import Snapshot
+from game_triangle_racer.models import Config, ConfigOfResourceLimit
+
+
+# Значения по умолчанию, если Config ещё не создан
+MAX_LEVEL = 9999
+MAX_RESOURCE_COUNT = 999999999
+
+logger = logging.getLogger(__name__)
+
+
+class Limits:
+    """Неизменяемый снимок пределов."""
+
+    def __init__(self, max_level=MAX_LEVEL, max_resource_count=MAX_RESOURCE_COUNT, max_resource_counts=None):
+
+        self.max_level = max_level
+        self.max_resource_count = max_resource_count
+        self.max_resource_counts = max_resource_counts or {}  # id ресурса -> предел
+
+    def get_max_resource_count(self, resource_id=None):
+        """Возвращает предел для ресурса: собственный, если задан, иначе общий."""
+
+        return self.max_resource_counts.get(resource_id, self.max_resource_count)
+
+
+def _load_limits():
+
+    try:
+        config = Config.objects.order_by('pk').first()
+        max_resource_counts = dict(ConfigOfResourceLimit.objects.values_list('resource_id', 'max_count'))
+
+    except DatabaseError as e:
+        logger.warning(f'Ошибка при получении пределов из конфигурации: {e}')
+
+        return Limits()
+
+    if config is None:
+        return Limits(max_resource_counts=max_resource_counts)
+
+    return Limits(
+        max_level=config.max_level,
+        max_resource_count=config.max_resource_count,
+        max_resource_counts=max_resource_counts,
+    )
+
+
+_snapshot = Snapshot(_load_limits, ttl=settings.GAME_LIMITS_CACHE_TTL)
+
+
+def get_limits():
+    """Возвращает текущий снимок пределов."""
+
+    return _snapshot.get()
+
+
+def invalidate_limits():
+
+    _snapshot.invalidate()
+
+
+def get_limits_stats():
+
+    return _snapshot.stats()
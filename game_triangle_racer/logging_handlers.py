@@ -0,0 +1,171 @@
+"""
+Неблокирующая запись лога для горячего пути API.
+
+QueuedFileHandler только кладёт запись в очередь, а в файл её пишет фоновый
+поток (logging.handlers.QueueListener). Поток запускается при первой записи и
+заново - в дочернем процессе после fork (воркеры gunicorn), поэтому обработчик
+можно создать ещё в мастер-процессе. Оставшиеся в очереди записи дописываются
+при закрытии обработчика (logging.shutdown при выходе).
+
+Текст сообщения (аргументы %-форматирования) вычисляется в вызывающем потоке и
+только для записей, прошедших уровень и фильтры: передавайте аргументы логгеру,
+а не f-строку, а дорогие представления оборачивайте в LazyStr.
+"""
+
+
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+
+class LazyStr:
+    """Строка, которая строится вызовом fn(*args) только при форматировании записи лога."""
+
+    __slots__ = ('fn', 'args')
+
+    def __init__(self, fn, *args):
+
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+
+        return str(self.fn(*self.args))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает лишь долю rate записей уровня max_level и ниже от логгеров с префиксами prefixes.
+
+    Предупреждения и ошибки, а также записи остальных логгеров проходят всегда.
+    """
+
+    def __init__(self, rate=1.0, prefixes=(), max_level='INFO'):
+
+        super().__init__()
+        self.rate = min(max(float(rate), 0.0), 1.0)
+        self.prefixes = tuple(prefixes)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else int(max_level)
+
+    def filter(self, record):
+
+        if self.rate >= 1.0 or record.levelno > self.max_level or not record.name.startswith(self.prefixes):
+            return True
+
+        return random.random() < self.rate
+
+
+class QueuedFileHandler(logging.Handler):
+    """
+    Обработчик, пишущий в файл из фонового потока.
+
+    rotation: 'none' - обычный файл (ротацию можно делать внешним logrotate с copytruncate),
+    'size' - по размеру (max_bytes), 'time' - по времени (when, interval); хранится
+    backup_count старых файлов. Встроенная ротация безопасна, только если в файл пишет
+    один процесс; чтобы у каждого процесса был свой файл, добавьте в filename "{pid}".
+    При переполненной очереди (queue_size) записи отбрасываются и считаются в dropped,
+    чтобы запросы не ждали диск.
+    """
+
+    def __init__(self, filename, rotation='none', max_bytes=50 * 1024 * 1024, backup_count=7,
+                 when='midnight', interval=1, queue_size=10000, encoding='utf-8'):
+
+        super().__init__()
+
+        if rotation not in ('none', 'size', 'time'):
+            raise ValueError(f'Неизвестный режим ротации лога: {rotation!r} (ожидается none, size или time).')
+
+        self.filename = str(filename)
+        self.rotation = rotation
+        self.max_bytes = int(max_bytes)
+        self.backup_count = int(backup_count)
+        self.when = when
+        self.interval = int(interval)
+        self.queue_size = int(queue_size)
+        self.encoding = encoding
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._target = None
+        self._listener = None
+
+    def _make_target(self):
+
+        filename = self.filename.replace('{pid}', str(os.getpid()))
+
+        if self.rotation == 'size':
+            target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding=self.encoding,
+            )
+        elif self.rotation == 'time':
+            target = logging.handlers.TimedRotatingFileHandler(
+                filename, when=self.when, interval=self.interval,
+                backupCount=self.backup_count, encoding=self.encoding,
+            )
+        else:
+            target = logging.FileHandler(filename, encoding=self.encoding)
+
+        target.setFormatter(self.formatter)
+
+        return target
+
+    def _start(self):
+        """Запускает фоновую запись в текущем процессе. Вызывается под блокировкой обработчика."""
+
+        # Очередь, файл и поток родительского процесса после fork не используются
+        self._pid = os.getpid()
+        self._queue = queue.Queue(self.queue_size)
+        self._target = self._make_target()
+        self._listener = logging.handlers.QueueListener(self._queue, self._target)
+        self._listener.start()
+
+    @staticmethod
+    def prepare(record):
+        """Копия записи с готовым текстом сообщения и трассировки (форматирование - в фоновом потоке)."""
+
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+
+            record.exc_info = None
+
+        return record
+
+    def emit(self, record):
+
+        try:
+            if self._pid != os.getpid():
+                self._start()
+
+            self._queue.put_nowait(self.prepare(record))
+
+        except queue.Full:
+            self.dropped += 1
+
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+
+        self.acquire()
+
+        try:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()  # Дописывает оставшиеся в очереди записи
+                self._target.close()
+
+            self._listener = None
+            self._target = None
+            self._pid = None
+
+        finally:
+            self.release()
+
+        super().close()
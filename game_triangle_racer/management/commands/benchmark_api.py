@@ -0,0 +1,251 @@
+import functools
+import random
+import threading
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from game_triangle_racer import benchmarking, catalog, jsoncodec, shop_catalog
+from game_triangle_racer.views import interdata
+
+
+DEFAULT_MIX = 'start=1,pull=8,push=3,shop=3'
+
+# Доли действий магазина внутри запросов Shop
+SHOP_ACTIONS = (('showAll', 1), ('showSome', 2), ('buy', 1))
+
+
+def _parse_mix(mix):
+
+    weights = {}
+
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+
+        if name.strip() not in ('start', 'pull', 'push', 'shop'):
+            raise CommandError(f'--mix: неизвестный запрос "{name}".')
+
+        try:
+            weights[name.strip()] = max(int(weight), 0)
+
+        except ValueError:
+            raise CommandError(f'--mix: ожидается "запрос=вес", получено "{item}".')
+
+    if not any(weights.values()):
+        raise CommandError('--mix: все веса нулевые.')
+
+    return weights
+
+
+class _VirtualClient:
+    """Игровой клиент одного синтетического игрока: формирует подписанные запросы и следит за сессией."""
+
+    def __init__(self, player, rng, game_catalog, shop_set_ids):
+
+        self.player = player
+        self.rng = rng
+        self.resource_names = list(game_catalog.resource_ids)
+        self.costume_names = list(game_catalog.costume_ids)
+        self.timer_names = list(game_catalog.timer_ids)
+        self.shop_set_ids = shop_set_ids
+
+    def make_request(self, endpoint):
+        """Возвращает (путь, тело запроса)."""
+
+        if endpoint == 'start':
+            return reverse('game_triangle_racer:api-start'), jsoncodec.dumps(self.player.make_start_payload())
+
+        payload = getattr(self, f'_make_{endpoint}_payload')()
+        path = reverse(f'game_triangle_racer:api-{endpoint}', kwargs={'token': self.player.token_hex})
+
+        return path, benchmarking.make_signed_body(payload, self.player.secret)
+
+    def _sample(self, names):
+
+        return self.rng.sample(names, self.rng.randint(0, len(names))) if names else []
+
+    def _make_pull_payload(self):
+
+        return {
+            interdata.FIELD_0: [interdata.PLAYER_LEVEL],
+            interdata.FIELD_R: self._sample(self.resource_names),
+            interdata.FIELD_C: self._sample(self.costume_names),
+            interdata.FIELD_Z: self._sample(self.timer_names),
+        }
+
+    def _make_push_payload(self):
+
+        return {
+            interdata.FIELD_0: {interdata.PLAYER_LEVEL: self.rng.randint(1, 100)},
+            interdata.FIELD_R: {name: self.rng.randint(0, 1000) for name in self._sample(self.resource_names)},
+            interdata.FIELD_C: {name: self.rng.random() < 0.5 for name in self._sample(self.costume_names)},
+        }
+
+    def _make_shop_payload(self):
+
+        action = self.rng.choices([a for a, _ in SHOP_ACTIONS], weights=[w for _, w in SHOP_ACTIONS])[0]
+
+        if action == 'buy' and self.shop_set_ids:
+            return {'action': action, 'id': self.rng.choice(self.shop_set_ids)}
+
+        if action == 'showSome':
+            from_id = self.rng.randint(0, max(len(self.shop_set_ids) - 1, 0))
+
+            return {'action': action, 'fromId': from_id, 'toId': from_id + self.rng.randint(0, 4)}
+
+        return {'action': 'showAll'}
+
+    def accept_response(self, endpoint, response):
+        """Проверяет ответ; после Start переходит на новую сессию. Возвращает True, если ответ корректен."""
+
+        if endpoint == 'start':
+            return self.player.start_session(response)
+
+        return interdata.is_signed_well(response, self.player.secret)
+
+
+def _worker(make_transport, clients, endpoints, weights, n_requests, seed, results, lock):
+    """Отправляет n_requests запросов от своих виртуальных клиентов и добавляет замеры в results."""
+
+    rng = random.Random(seed)
+    transport = make_transport()
+    local_results = []  # (запрос, задержка в секундах, корректен ли ответ, число запросов к БД)
+
+    try:
+        for i in range(n_requests):
+            client = clients[i % len(clients)]
+            endpoint = rng.choices(endpoints, weights=weights)[0]
+            path, body = client.make_request(endpoint)
+
+            started = time.perf_counter()
+            status_code, content, queries = transport.post(path, body)
+            latency = time.perf_counter() - started
+
+            is_ok = status_code == 200 and client.accept_response(endpoint, interdata.from_json(content))
+            local_results.append((endpoint, latency, is_ok, queries))
+
+    finally:
+        transport.close()
+
+    with lock:
+        results.extend(local_results)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Нагрузочный замер игрового API: создаёт синтетических игроков и отправляет смесь подписанных '
+        'запросов Start/Pull/Push/Shop через тестовый клиент Django или на запущенный сервер. '
+        'Выводит p50/p95/p99, пропускную способность и число запросов к БД на запрос.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--players', type=int, default=100, help='Число синтетических игроков.')
+        parser.add_argument('--requests', type=int, default=2000, help='Всего запросов (без прогрева).')
+        parser.add_argument('--warmup', type=int, default=100, help='Запросов прогрева (не учитываются).')
+        parser.add_argument('--concurrency', type=int, default=1, help='Число параллельных клиентов (потоков).')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Веса запросов (по умолчанию {DEFAULT_MIX}).')
+        parser.add_argument('--url', default='', help='Адрес запущенного сервера; без него - тестовый клиент.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep-players', action='store_true', help='Не удалять синтетических игроков.')
+        benchmarking.add_production_db_argument(parser)
+
+    def handle(self, *args, **options):
+
+        benchmarking.check_database_allowed(options)
+
+        weights_by_endpoint = _parse_mix(options['mix'])
+        endpoints = list(weights_by_endpoint)
+        weights = [weights_by_endpoint[e] for e in endpoints]
+        concurrency = max(options['concurrency'], 1)
+        n_players = max(options['players'], concurrency)  # Каждый игрок принадлежит одному потоку
+        base_url = options['url'].rstrip('/')
+
+        if base_url:
+            make_transport = functools.partial(benchmarking.HttpTransport, base_url)
+        else:
+            make_transport = benchmarking.TestClientTransport
+
+        game_catalog = catalog.get_refreshed_catalog()
+        shop_set_ids = list(shop_catalog.get_shop_catalog().shop_sets_by_id)
+
+        players = benchmarking.create_benchmark_players(n_players, platform=benchmarking.VK_PLATFORM)
+        rng = random.Random(options['seed'])
+        clients = [_VirtualClient(player, random.Random(rng.random()), game_catalog, shop_set_ids) for player in players]
+        clients_by_worker = [clients[i::concurrency] for i in range(concurrency)]
+
+        self.stdout.write(
+            f'Игроков: {n_players}, запросов: {options["requests"]}, потоков: {concurrency}, '
+            f'смесь: {options["mix"]}, {"сервер " + base_url if base_url else "тестовый клиент"}'
+        )
+
+        try:
+            if options['warmup'] > 0:
+                self._run(make_transport, clients_by_worker, endpoints, weights, options['warmup'], rng)
+
+            started = time.perf_counter()
+            results = self._run(make_transport, clients_by_worker, endpoints, weights, max(options['requests'], 1), rng)
+            elapsed = time.perf_counter() - started
+
+            self._report(results, elapsed, measures_queries=not base_url)
+
+        finally:
+            if not options['keep_players']:
+                benchmarking.delete_benchmark_players(players)
+
+    @staticmethod
+    def _run(make_transport, clients_by_worker, endpoints, weights, n_requests, rng):
+
+        results = []
+        lock = threading.Lock()
+        concurrency = len(clients_by_worker)
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(
+                    make_transport, clients_by_worker[i], endpoints, weights,
+                    n_requests // concurrency + (1 if i < n_requests % concurrency else 0),
+                    rng.random(), results, lock,
+                ),
+            )
+            for i in range(concurrency)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def _report(self, results, elapsed, measures_queries):
+
+        by_endpoint = defaultdict(list)
+
+        for result in results:
+            by_endpoint[result[0]].append(result)
+
+        self.stdout.write(f'Всего: {len(results) / elapsed:.1f} запр/с за {elapsed:.2f} с')
+
+        for endpoint in ('start', 'pull', 'push', 'shop'):
+            endpoint_results = by_endpoint.get(endpoint)
+
+            if not endpoint_results:
+                continue
+
+            latencies = sorted(latency for _, latency, _, _ in endpoint_results)
+            errors = sum(1 for _, _, is_ok, _ in endpoint_results if not is_ok)
+            queries = (
+                f'{sum(q for _, _, _, q in endpoint_results) / len(endpoint_results):5.1f}'
+                if measures_queries else '    -'
+            )
+
+            self.stdout.write(
+                f'{endpoint:5}: {len(endpoint_results):6} запр, {len(endpoint_results) / elapsed:8.1f} запр/с, '
+                f'p50 {benchmarking.percentile(latencies, 50) * 1000:7.2f} мс, '
+                f'p95 {benchmarking.percentile(latencies, 95) * 1000:7.2f} мс, '
+                f'p99 {benchmarking.percentile(latencies, 99) * 1000:7.2f} мс, '
+                f'запросов к БД {queries}, ошибок {errors}'
+            )
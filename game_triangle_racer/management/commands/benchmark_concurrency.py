@@ -0,0 +1,128 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from game_triangle_racer import benchmarking
+
+
+# Смесь запросов одного клиента: (имя URL, тело запроса)
+REQUEST_MIX = (
+    ('game_triangle_racer:api-pull', {'0': ['level'], 'r': [], 'c': [], 'z': []}),
+    ('game_triangle_racer:api-shop', {'action': 'showSome', 'fromId': 0, 'toId': 0}),
+    ('game_triangle_racer:api-push', {'0': {'level': 1}}),
+)
+
+
+def _client(base_url, requests, deadline, latencies, errors, lock):
+    """Отправляет запросы по кругу до deadline, собирая задержки (в секундах)."""
+
+    local_latencies = []
+    local_errors = 0
+    i = 0
+
+    while time.perf_counter() < deadline:
+        path, body = requests[i % len(requests)]
+        i += 1
+        request = urllib.request.Request(
+            base_url + path,
+            data=body,
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        started = time.perf_counter()
+
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+
+        except (urllib.error.URLError, OSError):
+            local_errors += 1
+
+            continue
+
+        local_latencies.append(time.perf_counter() - started)
+
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Нагрузочный тест запущенного сервера: пропускная способность и задержки при разной '
+        'конкурентности. Сравните, например, gunicorn (синхронные воркеры) и '
+        'uvicorn с GAME_API_ASYNC_VIEWS=True на одном и том же числе процессов.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес сервера (без пути).')
+        parser.add_argument('--concurrency', default='1,8,32,128', help='Уровни конкурентности через запятую.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Длительность замера на уровень, секунд.')
+        benchmarking.add_production_db_argument(parser)
+
+    def handle(self, *args, **options):
+
+        benchmarking.check_database_allowed(options)
+
+        base_url = options['url'].rstrip('/')
+        duration = max(options['duration'], 0.1)
+
+        try:
+            levels = [max(int(level), 1) for level in options['concurrency'].split(',')]
+
+        except ValueError:
+            raise CommandError('--concurrency: ожидаются целые числа через запятую.')
+
+        # Каждому клиенту - свой игрок, чтобы записи не ждали блокировок друг друга
+        players = benchmarking.create_benchmark_players(max(levels))
+
+        try:
+            client_requests = [
+                [
+                    (
+                        reverse(url_name, kwargs={'token': player.token_hex}),
+                        benchmarking.make_signed_body(payload, player.secret),
+                    )
+                    for url_name, payload in REQUEST_MIX
+                ]
+                for player in players
+            ]
+
+            self.stdout.write(f'{base_url}, {duration:.0f} с на уровень')
+
+            for level in levels:
+                latencies = []
+                errors = [0]
+                lock = threading.Lock()
+                deadline = time.perf_counter() + duration
+                threads = [
+                    threading.Thread(
+                        target=_client,
+                        args=(base_url, client_requests[i], deadline, latencies, errors, lock),
+                    )
+                    for i in range(level)
+                ]
+                started = time.perf_counter()
+
+                for thread in threads:
+                    thread.start()
+
+                for thread in threads:
+                    thread.join()
+
+                elapsed = time.perf_counter() - started
+                latencies.sort()
+
+                self.stdout.write(
+                    f'конкурентность {level:4}: {len(latencies) / elapsed:8.1f} запр/с, '
+                    f'p50 {benchmarking.percentile(latencies, 50) * 1000:7.1f} мс, '
+                    f'p99 {benchmarking.percentile(latencies, 99) * 1000:7.1f} мс, '
+                    f'ошибок {errors[0]}'
+                )
+
+        finally:
+            benchmarking.delete_benchmark_players(players)
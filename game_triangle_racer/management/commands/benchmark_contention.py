@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from game_triangle_racer import benchmarking, catalog, limits as game_limits, metrics
+from game_triangle_racer.models import Player
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.PushAPI import PushAPI
+
+
+MODES = ('pessimistic', 'optimistic')
+
+
+def _make_push_data(rng, resource_names, costume_names):
+    """Данные Push в пределах текущих ограничений, чтобы запросы не отклонялись проверкой."""
+
+    limits = game_limits.get_limits()
+    resource_ids = catalog.get_catalog().resource_ids
+
+    return {
+        interdata.FIELD_0: {interdata.PLAYER_LEVEL: rng.randint(1, max(limits.max_level, 1))},
+        interdata.FIELD_R: {
+            name: rng.randint(0, min(limits.get_max_resource_count(resource_ids[name]), 1000))
+            for name in resource_names
+        },
+        interdata.FIELD_C: {name: rng.random() < 0.5 for name in costume_names},
+    }
+
+
+def _worker(game_ids, n_pushes, seed, resource_names, costume_names, results, lock):
+
+    rng = random.Random(seed)
+    view = PushAPI()
+    local_results = []
+
+    try:
+        for _ in range(n_pushes):
+            player = Player.objects.get(pk=rng.choice(game_ids))
+            data = _make_push_data(rng, resource_names, costume_names)
+
+            started = time.perf_counter()
+
+            try:
+                response = view.handle_request(data, player)
+                is_ok = interdata.is_successful(response)
+
+            except Exception:
+                is_ok = False
+
+            local_results.append((time.perf_counter() - started, is_ok))
+
+    finally:
+        connection.close()
+
+    with lock:
+        results.extend(local_results)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Замер конкуренции за одного игрока: несколько потоков одновременно выполняют Push для '
+        'небольшого числа игроков в режимах GAME_PUSH_CONCURRENCY=pessimistic (select_for_update) '
+        'и optimistic (проверка версии). Выводит пропускную способность, p50/p99, отказы и конфликты версий.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--players', type=int, default=1, help='Число игроков, за которых конкурируют потоки.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pushes', type=int, default=200, help='Запросов Push на поток.')
+        parser.add_argument('--seed', type=int, default=0)
+        benchmarking.add_production_db_argument(parser)
+
+    def handle(self, *args, **options):
+
+        benchmarking.check_database_allowed(options)
+
+        n_threads = max(options['threads'], 1)
+        n_pushes = max(options['pushes'], 1)
+        game_catalog = catalog.get_refreshed_catalog()
+        resource_names = list(game_catalog.resource_ids)
+        costume_names = list(game_catalog.costume_ids)
+
+        players = benchmarking.create_benchmark_players(max(options['players'], 1))
+        game_ids = [player.game_id for player in players]
+
+        self.stdout.write(
+            f'{connection.vendor}, игроков: {len(game_ids)}, потоков: {n_threads}, Push на поток: {n_pushes}, '
+            f'повторов при конфликте: {settings.GAME_PUSH_MAX_RETRIES}'
+        )
+
+        if not settings.GAME_METRICS_ENABLED:
+            self.stdout.write('GAME_METRICS_ENABLED=False: конфликты версий не подсчитываются.')
+
+        try:
+            for mode in MODES:
+                with override_settings(GAME_PUSH_CONCURRENCY=mode):
+                    conflicts_before = metrics.get_counter('game_push_version_conflicts_total')
+                    results, elapsed = self._run(
+                        game_ids, n_threads, n_pushes, options['seed'], resource_names, costume_names,
+                    )
+                    conflicts = metrics.get_counter('game_push_version_conflicts_total') - conflicts_before
+
+                latencies = sorted(latency for latency, _ in results)
+                failures = sum(1 for _, is_ok in results if not is_ok)
+
+                self.stdout.write(
+                    f'{mode:11}: {len(results) / elapsed:8.1f} запр/с, '
+                    f'p50 {benchmarking.percentile(latencies, 50) * 1000:7.2f} мс, '
+                    f'p99 {benchmarking.percentile(latencies, 99) * 1000:7.2f} мс, '
+                    f'отказов {failures}, конфликтов версий {conflicts}'
+                )
+
+        finally:
+            benchmarking.delete_benchmark_players(players)
+
+    @staticmethod
+    def _run(game_ids, n_threads, n_pushes, seed, resource_names, costume_names):
+
+        results = []
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(game_ids, n_pushes, seed + i, resource_names, costume_names, results, lock),
+            )
+            for i in range(n_threads)
+        ]
+
+        started = time.perf_counter()
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results, time.perf_counter() - started
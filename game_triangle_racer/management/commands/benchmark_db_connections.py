@@ -0,0 +1,76 @@
+import copy
+import time
+from django.conf import settings
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.utils import load_backend
+
+
+def _query(db_connection):
+
+    with db_connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def _run_new_connections(iterations):
+    """Каждый "запрос" открывает собственное соединение (без CONN_MAX_AGE и пула)."""
+
+    settings_dict = copy.deepcopy(connection.settings_dict)
+    settings_dict['CONN_MAX_AGE'] = 0
+    settings_dict['CONN_HEALTH_CHECKS'] = False
+    settings_dict['OPTIONS'].pop('pool', None)
+    backend = load_backend(settings_dict['ENGINE'])
+    db_connection = backend.DatabaseWrapper(settings_dict, alias='benchmark_new_connections')
+
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        db_connection.connect()
+        _query(db_connection)
+        db_connection.close()
+
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def _run_configured(iterations):
+    """Цикл запроса как у обработчика Django: request_started, запрос к БД, request_finished."""
+
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        signals.request_started.send(sender=Command)
+        _query(connection)
+        signals.request_finished.send(sender=Command)
+
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Сравнивает стоимость обращения к БД на запрос: новое соединение на каждый запрос '
+        'против текущей настройки DB_CONNECTION_MODE (persistent - постоянные соединения, pool - пул).'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+
+        iterations = max(options['iterations'], 1)
+
+        # Прогрев
+        _run_new_connections(5)
+        _run_configured(5)
+
+        new_us = _run_new_connections(iterations)
+        configured_us = _run_configured(iterations)
+
+        self.stdout.write(f'{connection.vendor}, DB_CONNECTION_MODE={settings.DB_CONNECTION_MODE}, запросов: {iterations}')
+        self.stdout.write(f'новое соединение на запрос: {new_us:9.1f} мкс/запрос')
+        self.stdout.write(
+            f'текущая настройка        : {configured_us:9.1f} мкс/запрос, x{new_us / configured_us:.2f}'
+        )
@@ -0,0 +1,75 @@
+import time
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from game_triangle_racer import benchmarking
+from game_triangle_racer.dispatch import LeanGameAPIMiddleware
+
+
+# (имя замера, имя URL, тело запроса)
+SCENARIOS = (
+    ('shop showSome', 'game_triangle_racer:api-shop', {'action': 'showSome', 'fromId': 0, 'toId': 0}),
+    ('pull level', 'game_triangle_racer:api-pull', {'0': ['level']}),
+)
+
+
+def _run(application, path, body, iterations):
+    """Прогоняет запросы через WSGI-приложение и возвращает среднее время запроса в микросекундах."""
+
+    def start_response(status, headers):
+
+        if not status.startswith('200'):
+            raise RuntimeError(f'Неожиданный ответ {status} на {path}')
+
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        content = application(benchmarking.make_wsgi_environ(path, body), start_response)
+
+        if hasattr(content, 'close'):
+            content.close()
+
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Сравнивает накладные расходы на запрос к игровому API: полный стек Django + DRF '
+        'против облегчённой диспетчеризации (GAME_API_LEAN_DISPATCH).'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--iterations', type=int, default=2000)
+        benchmarking.add_production_db_argument(parser)
+
+    def handle(self, *args, **options):
+
+        benchmarking.check_database_allowed(options)
+
+        iterations = max(options['iterations'], 1)
+        full_application = WSGIHandler()
+        lean_application = LeanGameAPIMiddleware(full_application)
+        players = benchmarking.create_benchmark_players(1)
+        player = players[0]
+
+        try:
+            for name, url_name, payload in SCENARIOS:
+                path = reverse(url_name, kwargs={'token': player.token_hex})
+                body = benchmarking.make_signed_body(payload, player.secret)
+
+                # Прогрев кэшей и соединения с БД
+                _run(full_application, path, body, 10)
+                _run(lean_application, path, body, 10)
+
+                full_us = _run(full_application, path, body, iterations)
+                lean_us = _run(lean_application, path, body, iterations)
+
+                self.stdout.write(
+                    f'{name:14}: Django + DRF {full_us:8.1f} мкс/запрос, '
+                    f'облегчённая {lean_us:8.1f} мкс/запрос, x{full_us / lean_us:.2f}'
+                )
+
+        finally:
+            benchmarking.delete_benchmark_players(players)
@@ -0,0 +1,99 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from game_triangle_racer import jsoncodec
+from game_triangle_racer.views import interdata
+
+
+def make_pull_response(n_resources=8, n_costumes=20, n_timers=4):
+    """Ответ Pull на все секции, похожий на реальный."""
+
+    return interdata.create_by_field_compositing(
+        interdata.create_just_success(),
+        field_0={interdata.PLAYER_LEVEL: 42, interdata.PLAYER_ID: 5262235},
+        field_r={f'resource{i}': 1000 * i + 7 for i in range(n_resources)},
+        field_c={f'costume{i}': i % 3 != 0 for i in range(n_costumes)},
+        field_z={f'timer{i}': 23001 * i for i in range(n_timers)},
+    )
+
+
+def make_shop_response(n_shop_sets=50, n_components=3):
+    """Ответ Shop showAll, похожий на реальный."""
+
+    shop_sets = [
+        {
+            "id": i,
+            "name": f"Набор {i}",
+            "price": [{"name": "coins", "count": 100 + i}],
+            "components": [{"name": f"resource{j}", "count": 10 * (j + 1)} for j in range(n_components)],
+        }
+        for i in range(1, n_shop_sets + 1)
+    ]
+
+    return interdata.create_by_extending(
+        interdata.create_just_success(),
+        **{
+            "shopSetsCount": len(shop_sets),
+            "shopSets": shop_sets,
+        }
+    )
+
+
+def _std_dumps(obj):
+    """Сериализация так, как это делает стандартный JSONRenderer DRF."""
+
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def _std_loads(data):
+
+    return json.loads(data.decode('utf-8'))
+
+
+def _measure(fn, arg, iterations):
+
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        fn(arg)
+
+    return iterations / (time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+
+    help = 'Сравнивает скорость кодирования и разбора JSON: стандартный json против jsoncodec.'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--shop-sets', type=int, default=50, help='Наборов в ответе showAll.')
+
+    def handle(self, *args, **options):
+
+        iterations = max(options['iterations'], 1)
+        payloads = {
+            'pull': make_pull_response(),
+            'shop': make_shop_response(n_shop_sets=max(options['shop_sets'], 1)),
+        }
+
+        self.stdout.write(f'jsoncodec: {jsoncodec.BACKEND}, итераций: {iterations}')
+
+        for name, payload in payloads.items():
+            encoded = _std_dumps(payload)
+
+            if jsoncodec.loads(jsoncodec.dumps(payload)) != payload:
+                self.stderr.write(f'{name}: результат jsoncodec отличается от исходных данных!')
+
+            for operation, std_fn, fast_fn, arg in (
+                ('dumps', _std_dumps, jsoncodec.dumps, payload),
+                ('loads', _std_loads, jsoncodec.loads, encoded),
+            ):
+                std_rate = _measure(std_fn, arg, iterations)
+                fast_rate = _measure(fast_fn, arg, iterations)
+
+                self.stdout.write(
+                    f'{name:5} {operation}: json {std_rate:10.0f} оп/с, '
+                    f'jsoncodec {fast_rate:10.0f} оп/с, x{fast_rate / std_rate:.2f} '
+                    f'({len(encoded)} байт)'
+                )
@@ -0,0 +1,74 @@
+import hashlib
+import time
+from django.core.management.base import BaseCommand
+from game_triangle_racer import helpers, signature
+
+
+SECRET = '1234567'
+
+
+def _legacy_sig(struct, secret, exclude=None):
+    """Подпись так, как её вычисляли раньше (и вычисляет игровой клиент): через helpers.stringify."""
+
+    struct = {k: v for k, v in struct.items() if k != exclude}
+
+    return hashlib.md5(f'{helpers.stringify(struct)}{secret}'.encode('utf-8')).hexdigest()
+
+
+def _freeze(value):
+    """Заменяет словари и списки на CanonicalDict и CanonicalList (как в снимках)."""
+
+    if isinstance(value, list):
+        return signature.CanonicalList(_freeze(e) for e in value)
+
+    if isinstance(value, dict):
+        return signature.CanonicalDict({k: _freeze(v) for k, v in value.items()})
+
+    return value
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Сравнивает скорость подписи game_triangle_racer.signature и прежнего helpers.stringify. '
+        'Побайтную совместимость подписей проверяют тесты (SignatureCompatibilityTests).'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--iterations', type=int, default=2000, help='Итераций замера.')
+
+    def handle(self, *args, **options):
+
+        iterations = max(options['iterations'], 1)
+
+        shop_sets = [
+            {
+                'id': i,
+                'name': f'Набор {i}',
+                'price': [{'name': 'coins', 'count': 100 + i}],
+                'components': [{'name': f'resource{j}', 'count': 10 * (j + 1)} for j in range(3)],
+            }
+            for i in range(1, 51)
+        ]
+        payloads = (
+            ('showAll', {'isSuccess': 1, 'shopSetsCount': len(shop_sets), 'shopSets': shop_sets}),
+            ('showAll (снимок)', {'isSuccess': 1, 'shopSetsCount': len(shop_sets), 'shopSets': _freeze(shop_sets)}),
+            ('pull', {'0': {'level': 42, 'playerID': 5262235}, 'r': {'stars': 0, 'lives': 2, 'coins': 1000}}),
+        )
+
+        for name, payload in payloads:
+            rates = []
+
+            for fn in (_legacy_sig, signature.compute):
+                started = time.perf_counter()
+
+                for _ in range(iterations):
+                    fn(payload, SECRET)
+
+                rates.append(iterations / (time.perf_counter() - started))
+
+            self.stdout.write(
+                f'{name:16}: stringify {rates[0]:9.0f} подп/с, signature {rates[1]:9.0f} подп/с, '
+                f'x{rates[1] / rates[0]:.2f}'
+            )
@@ -0,0 +1,234 @@
+import functools
+import threading
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from game_triangle_racer import benchmarking, jsoncodec
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.StartAPI import PULL_FIELDS as START_PULL_FIELDS
+
+
+def load_capture(paths):
+    """Читает конверты запросов из файлов записи (см. game_triangle_racer.capture) в порядке времени прихода."""
+
+    envelopes = []
+    skipped = 0
+
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        envelope = jsoncodec.loads(line)
+
+                    except ValueError:
+                        skipped += 1
+
+                        continue
+
+                    if isinstance(envelope, dict) and envelope.get('endpoint') and isinstance(envelope.get('body'), dict):
+                        envelopes.append(envelope)
+                    else:
+                        skipped += 1
+
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать {path}: {e}')
+
+    envelopes.sort(key=lambda envelope: envelope['ts'])  # Сортировка устойчива: порядок внутри файла сохраняется
+
+    return envelopes, skipped
+
+
+def assign_identities(envelopes):
+    """
+    Возвращает список ключей игроков для конвертов (в том же порядке).
+
+    Сессии, начатые записанным Start, принадлежат игроку из Start; сессии без Start
+    (запись включили посреди сессии) считаются отдельными игроками.
+    """
+
+    session_owners = {}
+    keys = []
+
+    for envelope in envelopes:
+        session = envelope.get('session')
+
+        if envelope['endpoint'] == 'start':
+            key = ('player', envelope.get('player'))
+
+            if session:
+                session_owners[session] = key
+        else:
+            key = session_owners.setdefault(session, ('session', session))
+
+        keys.append(key)
+
+    return keys
+
+
+def _make_request(envelope, player):
+    """Возвращает (путь, тело запроса) для локального игрока: Start с его ключом VK, остальное - с его подписью."""
+
+    endpoint = envelope['endpoint']
+    body = envelope['body']
+
+    if endpoint == 'start':
+        platform_api_id = body.get(interdata.FIELD_PLATFORM_API_ID) or 1
+
+        payload = player.make_start_payload(platform_api_id)
+        payload.update((name, body[name]) for name in START_PULL_FIELDS if name in body)
+
+        return reverse('game_triangle_racer:api-start'), jsoncodec.dumps(payload)
+
+    path = reverse(f'game_triangle_racer:api-{endpoint}', kwargs={'token': player.token_hex})
+
+    return path, benchmarking.make_signed_body(body, player.secret)
+
+
+def _worker(make_transport, items, first_ts, started, speed, results, lock):
+    """Отправляет свои запросы в записанном порядке, выдерживая темп записи, ускоренный в speed раз."""
+
+    transport = make_transport()
+    local_results = []  # (запрос, задержка, статус, записанный статус, записанное время в мс, отставание от темпа)
+
+    try:
+        for envelope, player in items:
+            lag = 0.0
+
+            if speed > 0:
+                delay = started + (envelope['ts'] - first_ts) / speed - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lag = -delay
+
+            path, body = _make_request(envelope, player)
+
+            request_started = time.perf_counter()
+            status_code, content, _ = transport.post(path, body)
+            latency = time.perf_counter() - request_started
+
+            if envelope['endpoint'] == 'start' and status_code == 200:
+                player.start_session(interdata.from_json(content))
+
+            local_results.append(
+                (envelope['endpoint'], latency, status_code, envelope.get('status'), envelope.get('ms'), lag)
+            )
+
+    finally:
+        transport.close()
+
+    with lock:
+        results.extend(local_results)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Воспроизводит запросы, записанные при GAME_REQUEST_CAPTURE=True, на локальной копии: каждому '
+        'записанному игроку (или сессии без Start) сопоставляется синтетический игрок, запросы '
+        'подписываются его секретом и отправляются в записанном порядке с исходным или ускоренным темпом. '
+        'Выводит задержки воспроизведения рядом с записанными.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('paths', nargs='+', help='Файлы записи (включая ротированные).')
+        parser.add_argument('--speed', type=float, default=1.0, help='Ускорение темпа; 0 - без пауз.')
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Число потоков; запросы одного игрока всегда идут из одного потока по порядку.',
+        )
+        parser.add_argument('--limit', type=int, default=0, help='Воспроизвести только первые N запросов.')
+        parser.add_argument('--url', default='', help='Адрес запущенного сервера; без него - тестовый клиент.')
+        parser.add_argument('--keep-players', action='store_true', help='Не удалять синтетических игроков.')
+        benchmarking.add_production_db_argument(parser)
+
+    def handle(self, *args, **options):
+
+        benchmarking.check_database_allowed(options)
+
+        envelopes, skipped = load_capture(options['paths'])
+
+        if options['limit'] > 0:
+            envelopes = envelopes[:options['limit']]
+
+        if not envelopes:
+            raise CommandError('В записи нет запросов.')
+
+        keys = assign_identities(envelopes)
+        distinct_keys = list(dict.fromkeys(keys))
+        concurrency = min(max(options['concurrency'], 1), len(distinct_keys))
+        base_url = options['url'].rstrip('/')
+
+        if base_url:
+            make_transport = functools.partial(benchmarking.HttpTransport, base_url)
+        else:
+            make_transport = benchmarking.TestClientTransport
+
+        players = benchmarking.create_benchmark_players(len(distinct_keys), platform=benchmarking.VK_PLATFORM)
+        player_by_key = dict(zip(distinct_keys, players))
+        worker_by_key = {key: i % concurrency for i, key in enumerate(distinct_keys)}
+        items_by_worker = [[] for _ in range(concurrency)]
+
+        for envelope, key in zip(envelopes, keys):
+            items_by_worker[worker_by_key[key]].append((envelope, player_by_key[key]))
+
+        self.stdout.write(
+            f'Запросов: {len(envelopes)} (пропущено строк: {skipped}), игроков: {len(players)}, '
+            f'потоков: {concurrency}, ускорение: {options["speed"] or "без пауз"}, '
+            f'{"сервер " + base_url if base_url else "тестовый клиент"}'
+        )
+
+        try:
+            results = []
+            lock = threading.Lock()
+            started = time.perf_counter()
+            threads = [
+                threading.Thread(
+                    target=_worker,
+                    args=(make_transport, items, envelopes[0]['ts'], started, options['speed'], results, lock),
+                )
+                for items in items_by_worker
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            self._report(results, time.perf_counter() - started)
+
+        finally:
+            if not options['keep_players']:
+                benchmarking.delete_benchmark_players(players)
+
+    def _report(self, results, elapsed):
+
+        by_endpoint = defaultdict(list)
+
+        for result in results:
+            by_endpoint[result[0]].append(result)
+
+        self.stdout.write(
+            f'Всего: {len(results) / elapsed:.1f} запр/с за {elapsed:.2f} с, '
+            f'наибольшее отставание от темпа записи: {max(lag for *_, lag in results) * 1000:.1f} мс'
+        )
+
+        for endpoint, endpoint_results in sorted(by_endpoint.items()):
+            latencies = sorted(latency for _, latency, *_ in endpoint_results)
+            captured = sorted(ms / 1000.0 for *_, ms, _ in endpoint_results if ms is not None)
+            mismatches = sum(1 for _, _, status_code, captured_status, *_ in endpoint_results if status_code != captured_status)
+
+            self.stdout.write(
+                f'{endpoint:5}: {len(endpoint_results):6} запр, '
+                f'p50 {benchmarking.percentile(latencies, 50) * 1000:7.2f} мс, '
+                f'p95 {benchmarking.percentile(latencies, 95) * 1000:7.2f} мс, '
+                f'p99 {benchmarking.percentile(latencies, 99) * 1000:7.2f} мс; '
+                f'в записи p50 {benchmarking.percentile(captured, 50) * 1000:7.2f} мс, '
+                f'p99 {benchmarking.percentile(captured, 99) * 1000:7.2f} мс; '
+                f'статус отличается: {mismatches}'
+            )
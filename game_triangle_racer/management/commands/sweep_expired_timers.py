@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from game_triangle_racer import helpers, metrics
+from game_triangle_racer.models import Player, PlayerTimer, Timer
+
+
+def sweep_expired_player_timers(chunk_size=1000, sleep=0.1):
+    """
+    Удаляет истёкшие таймеры игроков пакетами не больше chunk_size строк.
+
+    Таймер истёк, если start_datetime + duration <= now, то есть
+    start_datetime <= now - duration. Граница считается отдельно для каждого
+    типа таймера, поэтому условие проверяется в SQL по индексу
+    (timer, start_datetime). Между пакетами делается пауза sleep секунд,
+    чтобы не мешать рабочей нагрузке. Версии игровых данных игроков, у которых
+    удалены таймеры, увеличиваются: их ответ Pull изменился.
+
+    Возвращает количество удалённых строк.
+    """
+
+    deleted_total = 0
+
+    for timer_id, duration in Timer.objects.values_list('id', 'duration'):
+        cutoff = helpers.datetime_now_utc() - timedelta(milliseconds=duration)
+        expired = PlayerTimer.objects.filter(timer_id=timer_id, start_datetime__lte=cutoff)
+
+        while True:
+            rows = list(expired.order_by().values_list('pk', 'player_id')[:chunk_size])
+
+            if not rows:
+                break
+
+            pks = [pk for pk, _ in rows]
+
+            # Условие повторяется, чтобы не удалить таймер, перезапущенный после выборки
+            deleted, _ = expired.filter(pk__in=pks).delete()
+            deleted_total += deleted
+
+            if deleted:
+                Player.bump_versions({player_id for _, player_id in rows})
+
+            if len(pks) < chunk_size:
+                break
+
+            if sleep > 0:
+                time.sleep(sleep)
+
+    return deleted_total
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Удаляет истёкшие таймеры игроков пакетами (однократно или в цикле) и увеличивает версии данных '
+        'игроков, у которых таймеры истекли. Запуски запланированных таймеров учитывает само чтение '
+        'версии (Player.next_timer_start), цикл для этого не нужен.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Строк в одном DELETE.')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Пауза между пакетами, секунды.')
+        parser.add_argument('--loop', action='store_true', help='Работать непрерывно.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Пауза между проходами в цикле, секунды.')
+
+    def handle(self, *args, **options):
+
+        chunk_size = max(options['chunk_size'], 1)
+        sleep = max(options['sleep'], 0.0)
+
+        try:
+            while True:
+                close_old_connections()
+
+                started = time.perf_counter()
+                deleted = sweep_expired_player_timers(chunk_size=chunk_size, sleep=sleep)
+                elapsed = time.perf_counter() - started
+
+                metrics.inc('game_timer_sweeper_runs_total')
+                metrics.inc('game_timer_sweeper_deleted_total', deleted)
+                metrics.set_gauge('game_timer_sweeper_last_run_timestamp_seconds', time.time())
+                metrics.set_gauge('game_timer_sweeper_last_duration_seconds', elapsed)
+                metrics.flush()
+
+                self.stdout.write(
+                    f'Удалено истёкших таймеров: {deleted} за {elapsed:.3f} с '
+                    f'({deleted / elapsed if elapsed > 0 else 0.0:.1f} строк/с).'
+                )
+
+                if not options['loop']:
+                    break
+
+                time.sleep(max(options['interval'], 0.0))
+
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено.')
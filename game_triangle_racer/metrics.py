@@ -0,0 +1,460 @@
+"""
+Метрики игрового API в текстовом формате Prometheus, общие для всех процессов.
+
+Каждый процесс (воркер gunicorn, очистка таймеров) копит значения в памяти, а фоновый
+поток процесса раз в GAME_METRICS_FLUSH_INTERVAL секунд записывает их в собственный
+файл каталога GAME_METRICS_DIR (атомарно: временный файл с уникальным именем и
+os.replace), так что запись файла не задерживает обработку запросов. Эндпоинт
+/game_triangle_racer/metrics (см. views.MetricsView) читает файлы всех процессов
+и складывает значения; у датчиков (gauge) берётся максимум. Внешние сервисы не нужны.
+
+Чтобы счётчики не уменьшались, а каталог не рос, значения завершившегося процесса
+переносятся в общий файл архива ARCHIVE_FILE_NAME (счётчики и гистограммы
+складываются, у датчиков остаётся последнее значение), а файл процесса удаляется:
+при штатном завершении - самим процессом, после падения - при ближайшем чтении
+метрик. Каталог можно очищать при перезапуске сервиса - Prometheus воспримет это
+как сброс счётчиков.
+"""
+
+
+import atexit
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+from game_triangle_racer import jsoncodec
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE_NAME = 'archive.json'
+ARCHIVE_LOCK_FILE_NAME = 'archive.lock'
+
+# Границы корзин гистограммы времени обработки запроса, секунды
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Имя метрики -> (тип, описание)
+METRICS = {
+    'game_api_requests_total': ('counter', 'Обработанные запросы к игровому API.'),
+    'game_api_request_duration_seconds': ('histogram', 'Время обработки запроса к игровому API.'),
+    'game_api_db_queries_total': ('counter', 'SQL-запросы при обработке запросов к игровому API.'),
+    'game_api_db_seconds_total': ('counter', 'Время SQL-запросов при обработке запросов к игровому API.'),
+    'game_api_slow_requests_total': ('counter', 'Запросы дольше GAME_SLOW_REQUEST_MS.'),
+    'game_api_unauthorized_total': ('counter', 'Запросы, отклонённые с 401 (reason: token или signature).'),
+    'game_push_validation_failures_total': ('counter', 'Запросы Push, отклонённые проверкой данных.'),
+    'game_push_version_conflicts_total': ('counter', 'Конфликты версий игрока в оптимистичном режиме Push.'),
+    'game_cache_hits_total': ('counter', 'Попадания во внутрипроцессные кэши.'),
+    'game_cache_misses_total': ('counter', 'Промахи внутрипроцессных кэшей.'),
+    'game_timer_sweeper_runs_total': ('counter', 'Проходы очистки истёкших таймеров.'),
+    'game_timer_sweeper_deleted_total': ('counter', 'Удалённые очисткой истёкшие таймеры.'),
+    'game_timer_sweeper_last_run_timestamp_seconds': ('gauge', 'Время окончания последнего прохода очистки.'),
+    'game_timer_sweeper_last_duration_seconds': ('gauge', 'Длительность последнего прохода очистки.'),
+}
+
+
+def _key(name, labels):
+
+    return name, tuple(sorted(labels.items()))
+
+
+class _ProcessMetrics:
+    """Значения метрик текущего процесса. Потокобезопасен; после fork начинает с нуля."""
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Записи файла процесса идут по одной, в порядке снятия значений
+        self._pid = None
+        self._path = None
+        self._is_archived = False
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}  # Ключ -> [количество в каждой корзине..., в +Inf, сумма]
+
+    def _check_pid(self):
+        """
+        Вызывается под блокировкой. В дочернем процессе (после fork) сбрасывает унаследованные
+        значения; в каждом процессе запускает фоновый поток записи файла.
+        """
+
+        pid = os.getpid()
+
+        if pid != self._pid:
+            self._pid = pid
+            self._path = Path(settings.GAME_METRICS_DIR) / f'{pid}-{uuid.uuid4().hex[:8]}.json'
+            self._is_archived = False
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            threading.Thread(target=self._run_flusher, args=(pid,), name='game-metrics-flusher', daemon=True).start()
+
+    def _reset_locks_after_fork(self):
+        """Блокировки, которые в момент fork держал другой поток, в дочернем процессе не освободятся."""
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _run_flusher(self, pid):
+
+        while os.getpid() == pid and not self._is_archived:
+            time.sleep(max(settings.GAME_METRICS_FLUSH_INTERVAL, 0.1))
+            self.flush()
+
+    def inc(self, name, value=1, labels=None):
+
+        key = _key(name, labels or {})
+
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_counter(self, name, value, labels=None):
+        """Задаёт счётчик целиком (для счётчиков, которые и так копятся в процессе, например в кэшах)."""
+
+        key = _key(name, labels or {})
+
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = value
+
+    def set_gauge(self, name, value, labels=None):
+
+        key = _key(name, labels or {})
+
+        with self._lock:
+            self._check_pid()
+            self._gauges[key] = value
+
+    def observe(self, name, value, buckets, labels=None):
+
+        key = _key(name, labels or {})
+
+        with self._lock:
+            self._check_pid()
+            histogram = self._histograms.get(key)
+
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+
+            for i, upper_bound in enumerate(buckets):
+                if value <= upper_bound:
+                    histogram[i] += 1
+
+                    break
+
+            else:
+                histogram[len(buckets)] += 1
+
+            histogram[-1] += value
+
+    def flush(self):
+        """Записывает значения процесса в его файл."""
+
+        with self._flush_lock:
+            _collect_cache_stats(self)
+
+            with self._lock:
+                self._check_pid()
+
+                if self._is_archived:
+                    return  # Файл уже перенесён в архив: новая запись посчитала бы значения дважды
+
+                path = self._path
+                content = jsoncodec.dumps({
+                    'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                    'gauges': [[name, labels, value] for (name, labels), value in self._gauges.items()],
+                    'histograms': [[name, labels, values] for (name, labels), values in self._histograms.items()],
+                })
+
+            try:
+                _write_atomically(path, content)
+
+            except OSError as e:
+                logger.warning(f'Не удалось записать метрики в {path}: {e}')
+
+    def archive(self):
+        """Переносит значения процесса в архив и удаляет его файл (при завершении процесса)."""
+
+        with self._flush_lock:
+            with self._lock:
+                path = self._path if self._pid == os.getpid() and not self._is_archived else None
+                self._is_archived = True
+
+            if path is not None:
+                _archive([path])
+
+
+_process_metrics = _ProcessMetrics()
+os.register_at_fork(after_in_child=_process_metrics._reset_locks_after_fork)
+
+
+def _collect_cache_stats(process_metrics):
+    """Переносит счётчики внутрипроцессных кэшей в метрики процесса."""
+
+    # Импорт здесь: модули кэшей зависят от моделей, а метрики нужны и до их загрузки
+    from game_triangle_racer import catalog, limits, player_template, shop_catalog
+    from game_triangle_racer.models.Player import player_id_cache, token_cache
+
+    for cache_name, stats in (
+        ('token', token_cache.stats()),
+        ('player_id', player_id_cache.stats()),
+        ('catalog', catalog.get_catalog_stats()),
+        ('shop_catalog', shop_catalog.get_shop_catalog_stats()),
+        ('limits', limits.get_limits_stats()),
+        ('player_template', player_template.get_template_stats()),
+    ):
+        process_metrics.set_counter('game_cache_hits_total', stats['hits'], {'cache': cache_name})
+        process_metrics.set_counter('game_cache_misses_total', stats['misses'], {'cache': cache_name})
+
+
+def inc(name, value=1, **labels):
+    """Увеличивает счётчик name с метками labels."""
+
+    if settings.GAME_METRICS_ENABLED:
+        _process_metrics.inc(name, value, labels)
+
+
+def set_gauge(name, value, **labels):
+
+    if settings.GAME_METRICS_ENABLED:
+        _process_metrics.set_gauge(name, value, labels)
+
+
+def observe_request(endpoint, action, duration, queries, db_time, is_slow):
+    """Учитывает обработанный запрос к игровому API (вызывается из instrumentation)."""
+
+    if not settings.GAME_METRICS_ENABLED:
+        return
+
+    labels = {'endpoint': endpoint, 'action': action or ''}
+    _process_metrics.inc('game_api_requests_total', 1, labels)
+    _process_metrics.observe('game_api_request_duration_seconds', duration, REQUEST_DURATION_BUCKETS, labels)
+    _process_metrics.inc('game_api_db_queries_total', queries, labels)
+    _process_metrics.inc('game_api_db_seconds_total', db_time, labels)
+
+    if is_slow:
+        _process_metrics.inc('game_api_slow_requests_total', 1, labels)
+
+
+def get_counter(name, **labels):
+    """Возвращает значение счётчика в текущем процессе (без других процессов)."""
+
+    with _process_metrics._lock:
+        return _process_metrics._counters.get(_key(name, labels), 0)
+
+
+def flush():
+
+    if settings.GAME_METRICS_ENABLED:
+        _process_metrics.flush()
+
+
+def _flush_at_exit():
+
+    if settings.configured and settings.GAME_METRICS_ENABLED and _process_metrics._pid == os.getpid():
+        _process_metrics.flush()
+        _process_metrics.archive()
+
+
+atexit.register(_flush_at_exit)
+
+
+def _write_atomically(path, content):
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Уникальное имя: параллельные записи не портят временные файлы друг друга
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'{path.stem}-', suffix='.tmp', delete=False) as tmp_file:
+        tmp_file.write(content)
+
+    try:
+        os.replace(tmp_file.name, path)
+
+    except OSError:
+        os.unlink(tmp_file.name)
+        raise
+
+
+def _read(path):
+    """Возвращает значения из файла метрик или None, если его не удалось прочитать."""
+
+    try:
+        return jsoncodec.loads(path.read_bytes())
+
+    except FileNotFoundError:
+        return None  # Файл успели перенести в архив
+
+    except (OSError, ValueError) as e:
+        logger.warning(f'Не удалось прочитать метрики из {path}: {e}')
+
+        return None
+
+
+def _accumulate(totals, data, keep_last_gauges=False):
+    """Добавляет значения data к totals = (счётчики, датчики, гистограммы)."""
+
+    counters, gauges, histograms = totals
+
+    for name, labels, value in data.get('counters', ()):
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+
+    for name, labels, value in data.get('gauges', ()):
+        key = (name, tuple(map(tuple, labels)))
+        gauges[key] = value if keep_last_gauges else max(gauges.get(key, value), value)
+
+    for name, labels, values in data.get('histograms', ()):
+        key = (name, tuple(map(tuple, labels)))
+        total = histograms.get(key)
+        histograms[key] = values if total is None else [a + b for a, b in zip(total, values)]
+
+
+def _get_pid(path):
+    """PID процесса по имени файла '<pid>-<суффикс>.json' или None (например, для архива)."""
+
+    pid = path.stem.split('-', 1)[0]
+
+    return int(pid) if path.stem != pid and pid.isdigit() else None
+
+
+def _is_process_alive(pid):
+
+    try:
+        os.kill(pid, 0)
+
+    except ProcessLookupError:
+        return False
+
+    except PermissionError:
+        return True  # Процесс есть, но принадлежит другому пользователю
+
+    return True
+
+
+def _archive(paths):
+    """
+    Переносит значения файлов процессов в файл архива и удаляет их.
+
+    Архив меняется под файловой блокировкой, поэтому процессы, завершающиеся
+    одновременно, и чтение метрик не теряют значения друг друга.
+    """
+
+    directory = Path(settings.GAME_METRICS_DIR)
+    archive_path = directory / ARCHIVE_FILE_NAME
+
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with open(directory / ARCHIVE_LOCK_FILE_NAME, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            totals = ({}, {}, {})
+            _accumulate(totals, _read(archive_path) or {})
+            archived_paths = []
+
+            # По времени изменения: у датчиков остаётся значение процесса, записавшего его последним
+            for path in sorted((path for path in paths if path.exists()), key=lambda path: path.stat().st_mtime):
+                data = _read(path)
+
+                if data is not None:
+                    _accumulate(totals, data, keep_last_gauges=True)
+                    archived_paths.append(path)
+
+            if not archived_paths:
+                return
+
+            counters, gauges, histograms = totals
+            _write_atomically(archive_path, jsoncodec.dumps({
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+                'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+            }))
+
+            for path in archived_paths:
+                path.unlink(missing_ok=True)
+
+    except OSError as e:
+        logger.warning(f'Не удалось перенести метрики в архив {archive_path}: {e}')
+
+
+def _archive_dead_processes():
+    """Переносит в архив файлы процессов, завершившихся без atexit (например, убитых)."""
+
+    dead_paths = [
+        path for path in Path(settings.GAME_METRICS_DIR).glob('*.json')
+        if (pid := _get_pid(path)) is not None and not _is_process_alive(pid)
+    ]
+
+    if dead_paths:
+        _archive(dead_paths)
+
+
+def _load_all():
+    """Читает и складывает значения всех процессов и архива."""
+
+    _archive_dead_processes()
+    totals = ({}, {}, {})
+
+    for path in Path(settings.GAME_METRICS_DIR).glob('*.json'):
+        data = _read(path)
+
+        if data is not None:
+            _accumulate(totals, data)
+
+    return totals
+
+
+def _escape(value):
+
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+
+    pairs = [*labels, *extra]
+
+    if not pairs:
+        return ''
+
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """Возвращает метрики всех процессов в текстовом формате Prometheus 0.0.4."""
+
+    counters, gauges, histograms = _load_all()
+    lines = []
+
+    for name, (metric_type, help_text) in METRICS.items():
+        values = counters if metric_type == 'counter' else gauges if metric_type == 'gauge' else histograms
+        series = sorted((labels, value) for (metric_name, labels), value in values.items() if metric_name == name)
+
+        if not series:
+            continue
+
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+        for labels, value in series:
+            if metric_type != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+                continue
+
+            cumulative = 0
+
+            for upper_bound, count in zip(REQUEST_DURATION_BUCKETS, value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", upper_bound)])} {cumulative}')
+
+            cumulative += value[len(REQUEST_DURATION_BUCKETS)]
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,39 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from game_triangle_racer import instrumentation
+
+
+class GameAPIInstrumentationMiddleware:
+    """Замеряет запросы к игровому API (см. game_triangle_racer.instrumentation)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with instrumentation.measure_request():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+
+        with instrumentation.measure_request():
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+
+        match = request.resolver_match
+
+        # Учитываются только запросы к API игры: имена URL вида "api-pull"
+        if match and match.namespace == 'game_triangle_racer' and match.url_name.startswith('api-'):
+            instrumentation.set_endpoint(match.url_name[len('api-'):])
+
+        return None
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playertimer',
+            index=models.Index(fields=['timer', 'start_datetime'], name='player_timer_expiry_idx'),
+        ),
+    ]
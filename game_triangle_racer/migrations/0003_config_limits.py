@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0002_playertimer_player_timer_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='config',
+            name='max_level',
+            field=models.PositiveSmallIntegerField(default=9999, help_text='Максимальный уровень игрока'),
+        ),
+        migrations.AddField(
+            model_name='config',
+            name='max_resource_count',
+            field=models.PositiveIntegerField(default=999999999, help_text='Максимальное количество любого ресурса (если для ресурса не задан свой предел)'),
+        ),
+        migrations.CreateModel(
+            name='ConfigOfResourceLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_count', models.PositiveIntegerField(help_text='Максимальное количество ресурса')),
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='game_triangle_racer.resource')),
+            ],
+        ),
+    ]
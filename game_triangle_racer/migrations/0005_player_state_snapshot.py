@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0004_player_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='state_snapshot',
+            field=models.JSONField(blank=True, editable=False, help_text='Денормализованный снимок игровых данных для Pull (см. player_state); NULL - собрать заново', null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0005_player_state_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigOfInitialPlayerTimer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_delay', models.PositiveIntegerField(default=0, help_text='Задержка запуска от момента регистрации в миллисекундах')),
+                ('timer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='game_triangle_racer.timer')),
+            ],
+        ),
+    ]
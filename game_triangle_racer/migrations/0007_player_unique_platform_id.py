@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+def check_no_duplicate_players(apps, schema_editor):
+    """
+    Останавливает миграцию, если у одного игрока платформы несколько записей.
+
+    Иначе ограничение не создастся с малопонятной ошибкой БД. Какую из записей
+    оставить, решает администратор: дубликаты перечисляются с их game_id.
+    """
+
+    Player = apps.get_model('game_triangle_racer', 'Player')
+    duplicate_keys = Player.objects.values('platform', 'platform_id').annotate(
+        count=models.Count('game_id'),
+    ).filter(count__gt=1).order_by('platform', 'platform_id')
+    duplicates = [
+        '{}/{}: game_id {}'.format(
+            key['platform'],
+            key['platform_id'],
+            ', '.join(map(str, Player.objects.filter(
+                platform=key['platform'],
+                platform_id=key['platform_id'],
+            ).order_by('game_id').values_list('game_id', flat=True))),
+        )
+        for key in duplicate_keys
+    ]
+
+    if duplicates:
+        raise RuntimeError(
+            'Несколько записей одного игрока платформы; оставьте одну из каждой группы '
+            'и повторите миграцию:\n' + '\n'.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0006_config_of_initial_player_timer'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_players, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='player',
+            name='player_platform_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='player',
+            constraint=models.UniqueConstraint(fields=('platform', 'platform_id'), name='unique_player_platform_id'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_next_timer_start(apps, schema_editor):
+    """Запоминает ближайший запуск у игроков, чьи таймеры ещё не запустились."""
+
+    Player = apps.get_model('game_triangle_racer', 'Player')
+    PlayerTimer = apps.get_model('game_triangle_racer', 'PlayerTimer')
+    utcnow = timezone.now()
+    planned = PlayerTimer.objects.filter(start_datetime__gt=utcnow)
+
+    Player.objects.filter(pk__in=planned.values('player_id')).update(
+        next_timer_start=models.Subquery(
+            planned.filter(player_id=models.OuterRef('pk')).order_by('start_datetime').values('start_datetime')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_triangle_racer', '0007_player_unique_platform_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='next_timer_start',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Ближайший запуск запланированного таймера: после него чтение версии увеличивает её', null=True),
+        ),
+        migrations.RunPython(fill_next_timer_start, migrations.RunPython.noop),
+    ]
@@ -5,3 +5,8 @@ class Config(models.Model):
     """Common setting for whole game."""
 
     game_default_life_recovery_interval = models.PositiveSmallIntegerField(default=1800)  # 30 minutes
+    max_level = models.PositiveSmallIntegerField(default=9999, help_text="Максимальный уровень игрока")
+    max_resource_count = models.PositiveIntegerField(
+        default=999999999,
+        help_text="Максимальное количество любого ресурса (если для ресурса не задан свой предел)"
+    )
@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class ConfigOfInitialPlayerTimer(models.Model):
+    """Конфигурация таймеров, запускаемых новым игрокам при регистрации."""
+
+    timer = models.OneToOneField('Timer', unique=True, on_delete=models.CASCADE)
+    start_delay = models.PositiveIntegerField(
+        default=0,
+        help_text="Задержка запуска от момента регистрации в миллисекундах"
+    )
+
+    def __str__(self):
+
+        return f"Начальный '{self.timer.name}' через {self.start_delay} мс"
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class ConfigOfResourceLimit(models.Model):
+    """Предел количества конкретного ресурса у игрока (заменяет общий предел из Config)."""
+
+    resource = models.OneToOneField('Resource', unique=True, on_delete=models.CASCADE)
+    max_count = models.PositiveIntegerField(help_text="Максимальное количество ресурса")
+
+    def __str__(self):
+
+        return f"Предел '{self.resource.name}' x {self.max_count}"
@@ -2,15 +2,40 @@ import os
 import base64
 import logging
 from datetime import timedelta
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
 from django.db.utils import IntegrityError
 from game_triangle_racer import helpers
+from game_triangle_racer.caching import LRUCache
+from game_triangle_racer.models.PlayerCostume import PlayerCostume
 from game_triangle_racer.models.PlayerResource import PlayerResource
-from game_triangle_racer.models.ConfigOfInitialPlayerResource import ConfigOfInitialPlayerResource
+from game_triangle_racer.models.PlayerTimer import PlayerTimer
 
 
 logger = logging.getLogger(__name__)
 
+# Кэш "токен -> (game_id, session_quasisecret, token_expiration)" для аутентификации
+# API-запросов без обращения к БД. Каждый процесс держит свой кэш, поэтому отзыв
+# токена в другом процессе становится виден здесь не позже, чем через TTL записи.
+token_cache = LRUCache(
+    max_size=settings.GAME_TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.GAME_TOKEN_CACHE_TTL,
+)
+
+_TOKEN_CACHE_FIELD_NAMES = ('game_id', 'session_quasisecret', 'token', 'token_expiration')
+
+# Поля игровых данных, которые читают обработчики API. Каждая запись меняет их, поэтому в кэш
+# токенов они не попадают; игроку из кэша они догружаются все вместе одним запросом
+_GAME_FIELD_NAMES = ('level', 'version', 'next_timer_start')
+
+# Кэш "(платформа, ID на платформе) -> game_id" для входа вернувшихся игроков без поиска
+# по платформе. Соответствие не меняется, а запись об удалённом игроке обнаруживается
+# по UPDATE, не нашедшему строку (см. Player.log_in).
+player_id_cache = LRUCache(
+    max_size=settings.GAME_PLAYER_ID_CACHE_MAX_SIZE,
+    ttl=settings.GAME_PLAYER_ID_CACHE_TTL,
+)
+
 
 class Player(models.Model):
     """Представляет данные и состояние игрока в игре."""
@@ -47,21 +72,61 @@ class Player(models.Model):
     platform_id = models.PositiveIntegerField(default=0, help_text="ID игрока на платформе")
 
     level = models.PositiveSmallIntegerField(default=0, help_text="Текущий уровень игрока")
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text="Версия игровых данных: увеличивается при каждом их изменении"
+    )
+    state_snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Денормализованный снимок игровых данных для Pull (см. player_state); NULL - собрать заново"
+    )
+    next_timer_start = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Ближайший запуск запланированного таймера: после него чтение версии увеличивает её"
+    )
 
     costumes = models.ManyToManyField('Costume', through='PlayerCostume')
     resources = models.ManyToManyField('Resource', through='PlayerResource')
     timers = models.ManyToManyField('Timer', through='PlayerTimer')
 
+    # True, если объект собран из кэша токенов (остальные поля загружаются из БД по обращению,
+    # игровые поля _GAME_FIELD_NAMES - все сразу, см. refresh_from_db)
+    from_token_cache = False
+
     class Meta:
 
-        indexes = [
-            models.Index(fields=['platform', 'platform_id'], name='player_platform_idx'),
-        ]
+        constraints = (
+            models.UniqueConstraint(fields=('platform', 'platform_id'), name='unique_player_platform_id'),
+        )
 
     def __str__(self):
 
         return str(self.game_id)
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        Перечитывает поля игрока из БД.
+
+        Игроку из кэша токенов вместе с любым игровым полем догружаются и остальные
+        незагруженные игровые поля: обращение к каждому из них не стоит отдельного запроса.
+        """
+
+        if fields is not None and self.from_token_cache and not set(fields).isdisjoint(_GAME_FIELD_NAMES):
+            fields = list(dict.fromkeys([*fields, *self.get_game_fields_to_load()]))
+
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def get_game_fields_to_load(self):
+        """Игровые поля, ещё не загруженные из БД (у игрока из кэша токенов)."""
+
+        deferred_fields = self.get_deferred_fields()
+
+        return [name for name in _GAME_FIELD_NAMES if name in deferred_fields]
+
     def get_token(self, expires_in=3600):
 
         utcnow = helpers.datetime_now_utc()
@@ -69,6 +134,7 @@ class Player(models.Model):
         if self.token and self.token_expiration > utcnow + timedelta(seconds=60):
             return self.token
 
+        self.forget_cached_token()
         self.token = base64.b64encode(os.urandom(24)).decode('utf-8')
         self.token_expiration = utcnow + timedelta(seconds=expires_in)
         self.save()
@@ -81,54 +147,302 @@ class Player(models.Model):
         utcnow = helpers.datetime_now_utc()
         self.token_expiration = utcnow - timedelta(seconds=1)
         self.save(update_fields=['token_expiration'])
+        self.forget_cached_token()
+
+    def forget_cached_token(self):
+        """
+        Удаляет токен игрока из кэша токенов.
+
+        Удаление повторяется после фиксации текущей транзакции, чтобы параллельный
+        запрос не успел вернуть в кэш данные, прочитанные до фиксации.
+        """
+
+        token = self.token
+
+        if not token:
+            return
+
+        token_cache.invalidate(token)
+        transaction.on_commit(lambda: token_cache.invalidate(token))
+
+    async def aforget_cached_token(self):
+        """Асинхронный вариант forget_cached_token: вне транзакции удаление после фиксации не нужно."""
+
+        if self.token:
+            token_cache.invalidate(self.token)
 
     @staticmethod
-    def get_player_by_token(token):
-        """Возвращает игрока по токену, если токен валиден и не истёк."""
+    def get_player_by_token(token, use_cache=True):
+        """
+        Возвращает игрока по токену, если токен валиден и не истёк.
 
-        player = Player.objects.filter(token=token).first()
+        При попадании в кэш возвращается объект только с полями из кэша
+        (game_id, session_quasisecret, token, token_expiration); остальные поля
+        догружаются из БД при первом обращении, игровые (уровень, версия) - одним запросом.
+        """
 
-        if player:
-            utcnow = helpers.datetime_now_utc()
+        utcnow = helpers.datetime_now_utc()
 
-            if player.token_expiration < utcnow:
-                player = None
+        cached = token_cache.get(token) if use_cache else None
 
-        return player
+        if cached is not None:
+            return Player._get_player_from_cached_token(token, cached, utcnow)
+
+        return Player._remember_token(Player.objects.filter(token=token).first(), utcnow)
+
+    @staticmethod
+    async def aget_player_by_token(token, use_cache=True):
+        """Асинхронный вариант get_player_by_token. Поля вне кэша догружайте через arefresh_from_db()."""
+
+        utcnow = helpers.datetime_now_utc()
+
+        cached = token_cache.get(token) if use_cache else None
+
+        if cached is not None:
+            return Player._get_player_from_cached_token(token, cached, utcnow)
+
+        return Player._remember_token(await Player.objects.filter(token=token).afirst(), utcnow)
 
     @staticmethod
-    def get_player_by_token_from_hex(hex_token):
+    def get_player_by_token_from_hex(hex_token, use_cache=True):
         """Декодирует hex-токен из URL и возвращает игрока."""
 
+        token = Player._decode_hex_token(hex_token)
+
+        return Player.get_player_by_token(token, use_cache=use_cache) if token is not None else None
+
+    @staticmethod
+    async def aget_player_by_token_from_hex(hex_token, use_cache=True):
+        """Асинхронный вариант get_player_by_token_from_hex."""
+
+        token = Player._decode_hex_token(hex_token)
+
+        return await Player.aget_player_by_token(token, use_cache=use_cache) if token is not None else None
+
+    @staticmethod
+    def _decode_hex_token(hex_token):
+
         try:
-            token = bytes.fromhex(hex_token).decode('utf-8')
+            return bytes.fromhex(hex_token).decode('utf-8')
 
         except (ValueError, UnicodeDecodeError):
             return None
 
-        return Player.get_player_by_token(token)
+    @staticmethod
+    def _get_player_from_cached_token(token, cached, utcnow):
+
+        game_id, session_quasisecret, token_expiration = cached
+
+        if token_expiration < utcnow:
+            token_cache.invalidate(token)
+
+            return None
+
+        player = Player.from_db(
+            router.db_for_read(Player),
+            _TOKEN_CACHE_FIELD_NAMES,
+            (game_id, session_quasisecret, token, token_expiration),
+        )
+        player.from_token_cache = True
+
+        return player
+
+    @staticmethod
+    def _remember_token(player, utcnow):
+        """Кладёт в кэш токенов только что прочитанного из БД игрока. Возвращает игрока или None, если токен истёк."""
+
+        if player:
+            if player.token_expiration < utcnow:
+                player = None
+            else:
+                token_cache.put(
+                    player.token,
+                    (player.game_id, player.session_quasisecret, player.token_expiration),
+                    ttl=(player.token_expiration - utcnow).total_seconds(),
+                )
+
+        return player
+
+    @staticmethod
+    def bump_versions(game_ids):
+        """
+        Увеличивает версии игровых данных игроков и сбрасывает их снимки состояния одним UPDATE.
+
+        game_ids - итерируемое game_id или QuerySet с одним столбцом (тогда он станет подзапросом).
+        """
+
+        if not isinstance(game_ids, models.QuerySet):
+            game_ids = list(game_ids)
+
+        return Player.objects.filter(pk__in=game_ids).update(
+            version=models.F('version') + 1,
+            state_snapshot=None,
+        )
+
+    @staticmethod
+    def is_next_timer_started(next_timer_start, utcnow=None):
+        """True, если запланированный таймер игрока уже запустился (его нет в версии, которую видел клиент)."""
+
+        return next_timer_start is not None and next_timer_start <= (utcnow or helpers.datetime_now_utc())
+
+    @staticmethod
+    def bump_version_for_started_timers(game_id):
+        """
+        Увеличивает версию игрока, если запустился его запланированный таймер, и запоминает следующий запуск.
+
+        Запланированный таймер появляется в ответе Pull при запуске без записи в БД,
+        поэтому условный Pull узнаёт о запуске по next_timer_start. Условие в UPDATE
+        не даёт параллельным чтениям увеличить версию дважды за один запуск.
+        """
+
+        utcnow = helpers.datetime_now_utc()
+
+        return Player.objects.filter(pk=game_id, next_timer_start__lte=utcnow).update(
+            version=models.F('version') + 1,
+            next_timer_start=_get_next_timer_start(game_id, utcnow),
+        )
 
     @staticmethod
-    def create_and_get_new_player(platform, platform_id, regin_stamp):
+    def update_next_timer_start(game_id):
+        """Пересчитывает ближайший запуск таймера игрока после изменения его таймеров."""
 
-        player = Player.objects.create(
-            platform=platform,
-            platform_id=platform_id,
-            regin_stamp=regin_stamp
+        return Player.objects.filter(pk=game_id).update(
+            next_timer_start=_get_next_timer_start(game_id, helpers.datetime_now_utc()),
         )
 
-        player_resources = []; print(PlayerResource)
+    @staticmethod
+    def log_in(platform, platform_id, login_stamp, regin_stamp=None):
+        """
+        Отмечает вход игрока платформы, регистрируя его при первом входе. Возвращает game_id.
+
+        regin_stamp - отметка регистрации нового игрока (по умолчанию login_stamp).
+        С login_stamp=None отметка входа не меняется (новый игрок регистрируется с 0).
+
+        Вернувшийся игрок обновляется одним UPDATE по первичному ключу (game_id берётся из
+        player_id_cache или одним SELECT). Только новый игрок регистрируется в транзакции;
+        если его одновременно зарегистрировал другой запрос, вставка нарушит ограничение
+        unique_player_platform_id, транзакция откатится, и игрок будет найден заново.
+        """
+
+        key = (platform, platform_id)
+        game_id = player_id_cache.get(key)
 
-        for row in ConfigOfInitialPlayerResource.objects.all().iterator():
-            player_resources.append(
-                PlayerResource(player=player, resource=row.resource, count=row.initial_count)
+        if game_id is None:
+            game_id = Player.objects.filter(
+                platform=platform,
+                platform_id=platform_id,
+            ).values_list('game_id', flat=True).first()
+
+        if game_id is not None and Player._mark_login(game_id, login_stamp):
+            player_id_cache.put(key, game_id)
+
+            return game_id
+
+        player_id_cache.invalidate(key)  # Игрок из кэша мог быть удалён
+        logger.info('Пользователь %s - новый игрок. Регистрация...', platform_id)
+
+        try:
+            with transaction.atomic():
+                game_id = Player.create_and_get_new_player(
+                    platform,
+                    platform_id,
+                    login_stamp if regin_stamp is None else regin_stamp,
+                    login_stamp=login_stamp or 0,
+                ).game_id
+
+        except IntegrityError:
+            game_id = Player.objects.filter(
+                platform=platform,
+                platform_id=platform_id,
+            ).values_list('game_id', flat=True).first()
+
+            if game_id is None:
+                raise
+
+            logger.info('Пользователь %s зарегистрирован параллельным запросом.', platform_id)
+            Player._mark_login(game_id, login_stamp)
+
+        player_id_cache.put(key, game_id)
+
+        return game_id
+
+    @staticmethod
+    def _mark_login(game_id, login_stamp):
+        """Записывает отметку входа (при None только проверяет, что игрок есть). Возвращает True, если игрок есть."""
+
+        players = Player.objects.filter(pk=game_id)
+
+        if login_stamp is None:
+            return players.exists()
+
+        return bool(players.update(login_stamp=login_stamp))
+
+    @staticmethod
+    def create_and_get_new_player(platform, platform_id, regin_stamp, login_stamp=0):
+        """
+        Регистрирует игрока по шаблону нового игрока (см. player_template).
+
+        Начальные ресурсы, костюмы и таймеры записываются одним bulk_create на таблицу.
+        При GAME_PLAYER_STATE_SNAPSHOT снимок состояния собирается из шаблона сразу,
+        и первый Pull не читает таблицы игрока.
+        """
+
+        # Импорт здесь: модуль шаблона сам импортирует модели
+        from game_triangle_racer import player_template
+
+        template = player_template.get_template()
+        utcnow = helpers.datetime_now_utc()
+        timer_starts = [
+            (timer_id, utcnow + timedelta(milliseconds=start_delay)) for timer_id, start_delay in template.timers
+        ]
+
+        # Игрок и его начальные данные - одной транзакцией (внутри транзакции вызывающего - без точки сохранения)
+        with transaction.atomic(savepoint=False):
+            player = Player.objects.create(
+                platform=platform,
+                platform_id=platform_id,
+                regin_stamp=regin_stamp,
+                login_stamp=login_stamp,
+                next_timer_start=min(
+                    (start_datetime for _, start_datetime in timer_starts if start_datetime > utcnow), default=None,
+                ),
+                state_snapshot=(
+                    template.make_state(Player._meta.get_field('level').default, timer_starts)
+                    if settings.GAME_PLAYER_STATE_SNAPSHOT else None
+                ),
             )
 
-        if player_resources:
             try:
-                PlayerResource.objects.bulk_create(player_resources)
+                if template.resources:
+                    PlayerResource.objects.bulk_create([
+                        PlayerResource(player=player, resource_id=resource_id, count=count)
+                        for resource_id, count in template.resources
+                    ])
+
+                if template.costume_ids:
+                    PlayerCostume.objects.bulk_create([
+                        PlayerCostume(player=player, costume_id=costume_id) for costume_id in template.costume_ids
+                    ])
+
+                if timer_starts:
+                    PlayerTimer.objects.bulk_create([
+                        PlayerTimer(player=player, timer_id=timer_id, start_datetime=start_datetime)
+                        for timer_id, start_datetime in timer_starts
+                    ])
+
             except IntegrityError as e:
-                logger.error(f'Ошибка при создании начальных ресурсов для игрока {player.platform_id}: {e}')
+                logger.error('Ошибка при создании начальных данных для игрока %s: %s', player.platform_id, e)
                 raise
 
         return player
+
+
+def _get_next_timer_start(game_id, after):
+    """Подзапрос: ближайшее время запуска таймера игрока позже after (NULL, если такого нет)."""
+
+    return models.Subquery(
+        PlayerTimer.objects.filter(
+            player_id=game_id,
+            start_datetime__gt=after,
+        ).order_by('start_datetime').values('start_datetime')[:1]
+    )
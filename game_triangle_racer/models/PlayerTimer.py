@@ -28,29 +28,38 @@ class PlayerTimer(models.Model):
         indexes = [
             models.Index(fields=['player', 'timer'], name='player_timer_idx'),
             models.Index(fields=['state'], name='player_timer_state_idx'),
+            models.Index(fields=['timer', 'start_datetime'], name='player_timer_expiry_idx'),
         ]
 
     def __str__(self):
 
         return f"{self.player.game_id} - {self.timer.name} ({self.get_state_display()})"
 
-    def update(self):
-        """Обновляет состояние таймера на основе текущего времени."""
+    @staticmethod
+    def evaluate(start_datetime, duration, utcnow):
+        """
+        Вычисляет состояние таймера и оставшееся время (мс) на момент utcnow.
 
-        utcnow = helpers.datetime_now_utc()
-        utcrun = self.start_datetime
+        Ничего не записывает в БД: состояние полностью определяется временем
+        запуска и длительностью таймера.
+        """
+
+        if utcnow < start_datetime:
+            return PlayerTimer.State.PLANNED, duration
+
+        delta_ms = int((utcnow - start_datetime).total_seconds() * 1000.0)
+        d = duration - delta_ms
 
-        if utcnow >= utcrun:
-            delta_ms = int((utcnow - utcrun).total_seconds() * 1000.0)
-            durat_ms = self.timer.duration
+        if d > 0:
+            return PlayerTimer.State.WORKING, d
 
-            d = durat_ms - delta_ms
+        return PlayerTimer.State.EXPIRED, 0
 
-            if d > 0:
-                self.state = PlayerTimer.State.WORKING
-                self.remaining = d
-            else:
-                self.state = PlayerTimer.State.EXPIRED
-                self.remaining = 0
+    def update(self):
+        """Обновляет состояние таймера на основе текущего времени."""
+
+        utcnow = helpers.datetime_now_utc()
 
+        if utcnow >= self.start_datetime:
+            self.state, self.remaining = PlayerTimer.evaluate(self.start_datetime, self.timer.duration, utcnow)
             self.save(update_fields=['state', 'remaining'])
@@ -1,6 +1,8 @@
 from game_triangle_racer.models.Config import Config
 from game_triangle_racer.models.ConfigOfInitialPlayerCostume import ConfigOfInitialPlayerCostume
 from game_triangle_racer.models.ConfigOfInitialPlayerResource import ConfigOfInitialPlayerResource
+from game_triangle_racer.models.ConfigOfInitialPlayerTimer import ConfigOfInitialPlayerTimer
+from game_triangle_racer.models.ConfigOfResourceLimit import ConfigOfResourceLimit
 from game_triangle_racer.models.Costume import Costume
 from game_triangle_racer.models.Player import Player
 from game_triangle_racer.models.PlayerCostume import PlayerCostume
@@ -17,6 +19,8 @@ __all__ = [
     "Config",
     "ConfigOfInitialPlayerCostume",
     "ConfigOfInitialPlayerResource",
+    "ConfigOfInitialPlayerTimer",
+    "ConfigOfResourceLimit",
     "Player",
     "PlayerCostume",
     "PlayerResource",
@@ -0,0 +1,26 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from game_triangle_racer import jsoncodec
+
+
+class FastJSONParser(BaseParser):
+    """JSON-парсер DRF на основе jsoncodec (orjson, если установлен)."""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+
+            return jsoncodec.loads(data)
+
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
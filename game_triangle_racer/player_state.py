@@ -0,0 +1,173 @@
+"""
+Денормализованный снимок состояния игрока (Player.state_snapshot) для Pull одним чтением по первичному ключу.
+
+Снимок хранит id, а не имена, чтобы переименование в каталоге его не портило:
+
+    {"l": <уровень>, "r": {"<id ресурса>": <количество>}, "c": [<id костюма>, ...],
+     "z": {"<id таймера>": "<время запуска, ISO 8601>"}}
+
+Источник истины - по-прежнему таблицы PlayerResource, PlayerCostume и PlayerTimer.
+Push дописывает свои изменения в снимок в той же транзакции (под блокировкой строки
+игрока или под проверкой версии), остальные изменения (покупка, админка) сбрасывают
+снимок в NULL вместе с увеличением версии (Player.bump_versions). Pull при пустом
+снимке собирает его из таблиц и записывает условным UPDATE: только если версия не
+изменилась и снимок всё ещё пуст, иначе собранный снимок мог устареть.
+"""
+
+
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from game_triangle_racer import catalog
+from game_triangle_racer.models import Player, PlayerResource, PlayerCostume, PlayerTimer
+
+
+def build_state(game_id):
+    """Собирает снимок из таблиц игрока."""
+
+    level = Player.objects.filter(pk=game_id).values_list('level', flat=True).get()
+
+    return {
+        'l': level,
+        'r': {
+            str(resource_id): count
+            for resource_id, count in PlayerResource.objects.filter(player_id=game_id).values_list('resource_id', 'count')
+        },
+        'c': sorted(PlayerCostume.objects.filter(player_id=game_id).values_list('costume_id', flat=True)),
+        'z': {
+            str(timer_id): start_datetime.isoformat()
+            for timer_id, start_datetime in PlayerTimer.objects.filter(player_id=game_id).values_list(
+                'timer_id', 'start_datetime'
+            )
+        },
+    }
+
+
+def load_state(player):
+    """
+    Возвращает (версия, снимок) игрока: одним запросом, если снимок есть, иначе собирает и сохраняет его.
+
+    Версия прочитана не позже данных снимка, поэтому не бывает новее их. Если запустился
+    запланированный таймер, версия сначала увеличивается (снимок от этого не меняется).
+    """
+
+    version, state, next_timer_start = _query_state(player.pk).get()
+
+    if Player.is_next_timer_started(next_timer_start):
+        Player.bump_version_for_started_timers(player.pk)
+        version, state, _ = _query_state(player.pk).get()
+
+    return version, state if state is not None else _rebuild_state(player.pk, version)
+
+
+async def aload_state(player):
+    """Асинхронный вариант load_state."""
+
+    version, state, next_timer_start = await _query_state(player.pk).aget()
+
+    if Player.is_next_timer_started(next_timer_start):
+        await sync_to_async(Player.bump_version_for_started_timers)(player.pk)
+        version, state, _ = await _query_state(player.pk).aget()
+
+    return version, state if state is not None else await sync_to_async(_rebuild_state)(player.pk, version)
+
+
+def _query_state(game_id):
+
+    return Player.objects.filter(pk=game_id).values_list('version', 'state_snapshot', 'next_timer_start')
+
+
+def _rebuild_state(game_id, version):
+
+    state = build_state(game_id)
+    Player.objects.filter(pk=game_id, version=version, state_snapshot__isnull=True).update(state_snapshot=state)
+
+    return state
+
+
+def merge_push(state, level, input_fields_r, input_fields_c):
+    """
+    Возвращает снимок с изменениями Push или None, если снимка нет (его соберёт следующий Pull).
+
+    Имена уже проверены при записи в таблицы, поэтому все они есть в каталоге.
+    """
+
+    if state is None:
+        return None
+
+    game_catalog = catalog.get_catalog()
+    state = {**state, 'r': dict(state['r']), 'c': set(state['c'])}
+
+    if level is not None:
+        state['l'] = level
+
+    for name, count in (input_fields_r or {}).items():
+        state['r'][str(game_catalog.resource_ids[name])] = count
+
+    for name, should_have in (input_fields_c or {}).items():
+        costume_id = game_catalog.costume_ids[name]
+
+        if should_have:
+            state['c'].add(costume_id)
+        else:
+            state['c'].discard(costume_id)
+
+    state['c'] = sorted(state['c'])
+
+    return state
+
+
+def get_state_rows(state, input_fields_r, input_fields_c, input_fields_z, game_catalog):
+    """
+    Строки снимка в том же виде, что дают запросы PullAPI.query_player_*.
+
+    Возвращает (rows_r, rows_c, rows_z); для непрошенных полей - None.
+    """
+
+    rows_r = rows_c = rows_z = None
+
+    if input_fields_r is not None:
+        requested = {game_catalog.resource_ids[name] for name in input_fields_r if name in game_catalog.resource_ids}
+        rows_r = [
+            (int(resource_id), count) for resource_id, count in state['r'].items() if int(resource_id) in requested
+        ]
+
+    if input_fields_c is not None:
+        rows_c = list(state['c'])
+
+    if input_fields_z is not None:
+        rows_z = [
+            (int(timer_id), datetime.fromisoformat(start_datetime)) for timer_id, start_datetime in state['z'].items()
+        ]
+
+        if input_fields_z:
+            requested = {game_catalog.timer_ids[name] for name in input_fields_z if name in game_catalog.timer_ids}
+            rows_z = [(timer_id, start_datetime) for timer_id, start_datetime in rows_z if timer_id in requested]
+
+    return rows_r, rows_c, rows_z
+
+
+def needs_refreshed_catalog(state, game_catalog):
+    """True, если в снимке есть костюмы или таймеры, которых нет в снимке каталога (его нужно перечитать)."""
+
+    return (
+        any(costume_id not in game_catalog.costume_names for costume_id in state['c'])
+        or any(int(timer_id) not in game_catalog.timer_names for timer_id in state['z'])
+    )
+
+
+def make_output_fields(player, state, input_fields_0, input_fields_r, input_fields_c, input_fields_z, game_catalog):
+    """Собирает поля ответа Pull из снимка. Возвращает (output_fields_0, _r, _c, _z)."""
+
+    # Импорт здесь: PullAPI сам импортирует этот модуль
+    from game_triangle_racer.views.PullAPI import PullAPI
+
+    rows_r, rows_c, rows_z = get_state_rows(state, input_fields_r, input_fields_c, input_fields_z, game_catalog)
+
+    player.level = state['l']  # Уровень берётся из снимка, без догрузки поля
+
+    return (
+        PullAPI.read_player_common_data(player, input_fields_0),
+        None if rows_r is None else PullAPI.make_output_fields_r(input_fields_r, rows_r, game_catalog),
+        None if rows_c is None else PullAPI.make_output_fields_c(input_fields_c, rows_c, game_catalog),
+        None if rows_z is None else PullAPI.make_output_fields_z(input_fields_z, rows_z, game_catalog),
+    )
@@ -0,0 +1,81 @@
+"""
+Шаблон нового игрока: начальные ресурсы, костюмы и таймеры, общий для процесса.
+
+Шаблон читается из ConfigOfInitialPlayerResource, ConfigOfInitialPlayerCostume и
+ConfigOfInitialPlayerTimer один раз в снимок, поэтому регистрация игрока не читает
+конфигурацию. Снимок сбрасывается сигналами (см. signals.py), а в остальных
+процессах устаревает не позже, чем через GAME_NEW_PLAYER_TEMPLATE_CACHE_TTL.
+"""
+
+
+import logging
+from django.conf import settings
+from django.db import DatabaseError
+from game_triangle_racer.caching import Snapshot
+from game_triangle_racer.models import (
+    ConfigOfInitialPlayerCostume,
+    ConfigOfInitialPlayerResource,
+    ConfigOfInitialPlayerTimer,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class NewPlayerTemplate:
+    """Неизменяемый снимок шаблона нового игрока."""
+
+    def __init__(self, resources=(), costume_ids=(), timers=()):
+
+        self.resources = tuple(resources)  # (id ресурса, начальное количество)
+        self.costume_ids = tuple(costume_ids)
+        self.timers = tuple(timers)  # (id таймера, задержка запуска в мс)
+
+    def make_state(self, level, timer_starts):
+        """
+        Снимок состояния нового игрока (см. player_state).
+
+        timer_starts - пары (id таймера, время запуска), с которыми создаются таймеры игрока.
+        """
+
+        return {
+            'l': level,
+            'r': {str(resource_id): count for resource_id, count in self.resources},
+            'c': sorted(self.costume_ids),
+            'z': {str(timer_id): start_datetime.isoformat() for timer_id, start_datetime in timer_starts},
+        }
+
+
+def _load_template():
+
+    try:
+        return NewPlayerTemplate(
+            resources=ConfigOfInitialPlayerResource.objects.values_list('resource_id', 'initial_count'),
+            costume_ids=ConfigOfInitialPlayerCostume.objects.values_list('costume_id', flat=True),
+            timers=ConfigOfInitialPlayerTimer.objects.values_list('timer_id', 'start_delay'),
+        )
+
+    except DatabaseError as e:
+        # Без шаблона игрок был бы зарегистрирован без начальных данных: пусть регистрация не удастся
+        logger.error('Ошибка при получении шаблона нового игрока: %s', e)
+
+        raise
+
+
+_snapshot = Snapshot(_load_template, ttl=settings.GAME_NEW_PLAYER_TEMPLATE_CACHE_TTL)
+
+
+def get_template():
+    """Возвращает текущий снимок шаблона нового игрока."""
+
+    return _snapshot.get()
+
+
+def invalidate_template():
+
+    _snapshot.invalidate()
+
+
+def get_template_stats():
+
+    return _snapshot.stats()
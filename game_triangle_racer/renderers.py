@@ -0,0 +1,17 @@
+from rest_framework.renderers import BaseRenderer
+from game_triangle_racer import jsoncodec
+
+
+class FastJSONRenderer(BaseRenderer):
+    """JSON-рендерер DRF на основе jsoncodec (orjson, если установлен)."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if data is None:
+            return b''
+
+        return jsoncodec.dumps(data)
@@ -0,0 +1,92 @@
+"""
+Готовый к отдаче снимок витрины магазина, общий для процесса.
+
+Наборы магазина меняются только через админку, поэтому ответы showAll/showSome
+собираются из снимка в памяти без обращения к БД. Снимок сбрасывается сигналами
+(см. signals.py), а в остальных процессах устаревает не позже, чем через
+GAME_SHOP_CATALOG_CACHE_TTL.
+"""
+
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from game_triangle_racer.caching import Snapshot
+from game_triangle_racer.models import ShopSet
+from game_triangle_racer.signature import CanonicalDict, CanonicalList
+
+
+class ShopCatalog:
+    """Неизменяемый снимок витрины. Словари наборов отдаются в ответах как есть - не изменяйте их."""
+
+    def __init__(self, shop_sets, prices, contents):
+
+        self.shop_sets = CanonicalList(shop_sets)  # Упорядочены по pk
+        self.shop_sets_by_id = {shop_set['id']: shop_set for shop_set in shop_sets}
+        self.prices = prices  # id набора -> ((id ресурса, количество), ...)
+        self.contents = contents  # id набора -> ((id ресурса, количество), ...)
+
+
+def _serialize_components(components):
+
+    return [
+        {
+            "name": component.resource.name,
+            "count": component.count,
+        }
+        for component in components
+    ]
+
+
+def _load_shop_catalog():
+
+    shop_sets_qs = ShopSet.objects.order_by('pk').prefetch_related(
+        'shoppricecomponent_set__resource',
+        'shopsetcomponent_set__resource',
+    )
+
+    shop_sets = []
+    prices = {}
+    contents = {}
+
+    for shop_set in shop_sets_qs:
+        price_components = shop_set.shoppricecomponent_set.all()
+        set_components = shop_set.shopsetcomponent_set.all()
+
+        # Каноническая строка набора для подписи ответа вычисляется один раз при загрузке снимка
+        shop_sets.append(CanonicalDict({
+            "id": shop_set.id,
+            "name": shop_set.name,
+            "price": _serialize_components(price_components),
+            "components": _serialize_components(set_components),
+        }))
+        prices[shop_set.id] = tuple((c.resource_id, c.count) for c in price_components)
+        contents[shop_set.id] = tuple((c.resource_id, c.count) for c in set_components)
+
+    return ShopCatalog(shop_sets, prices, contents)
+
+
+_snapshot = Snapshot(_load_shop_catalog, ttl=settings.GAME_SHOP_CATALOG_CACHE_TTL)
+
+
+def get_shop_catalog():
+    """Возвращает текущий снимок витрины."""
+
+    return _snapshot.get()
+
+
+async def aget_shop_catalog():
+    """Асинхронный вариант get_shop_catalog: загрузка снимка (если нужна) выполняется в потоке."""
+
+    value = _snapshot.peek()
+
+    return value if value is not None else await sync_to_async(get_shop_catalog)()
+
+
+def invalidate_shop_catalog():
+
+    _snapshot.invalidate()
+
+
+def get_shop_catalog_stats():
+
+    return _snapshot.stats()
@@ -0,0 +1,109 @@
+"""
+Сброс внутрипроцессных снимков при изменении справочников, магазина, настроек и шаблона нового игрока через админку.
+
+Удаление записи каталога каскадом удаляет строки игроков, поэтому у игроков, у которых
+такие строки есть, заодно увеличиваются версии данных и сбрасываются снимки состояния
+(Player.state_snapshot).
+
+Здесь же на каждое новое соединение с БД ставится счётчик запросов (см. instrumentation.py).
+"""
+
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from game_triangle_racer import catalog, instrumentation, limits, player_template, shop_catalog
+from game_triangle_racer.models import (
+    Config,
+    ConfigOfInitialPlayerCostume,
+    ConfigOfInitialPlayerResource,
+    ConfigOfInitialPlayerTimer,
+    ConfigOfResourceLimit,
+    Costume,
+    Player,
+    PlayerCostume,
+    PlayerResource,
+    PlayerTimer,
+    Resource,
+    ShopPriceComponent,
+    ShopSet,
+    ShopSetComponent,
+    Timer,
+)
+
+
+# Модель каталога -> (модель строк игроков, поле ссылки на запись каталога)
+_PLAYER_ROWS = {
+    Resource: (PlayerResource, 'resource_id'),
+    Costume: (PlayerCostume, 'costume_id'),
+    Timer: (PlayerTimer, 'timer_id'),
+}
+
+
+def _invalidate_now_and_on_commit(invalidate):
+    """Сбрасывает снимок сразу и ещё раз после фиксации транзакции админки."""
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=Costume)
+@receiver(post_delete, sender=Costume)
+@receiver(post_save, sender=Timer)
+@receiver(post_delete, sender=Timer)
+def on_catalog_changed(sender, **kwargs):
+
+    _invalidate_now_and_on_commit(catalog.invalidate_catalog)
+
+
+@receiver(pre_delete, sender=Resource)
+@receiver(pre_delete, sender=Costume)
+@receiver(pre_delete, sender=Timer)
+def on_catalog_entry_deleting(sender, instance, **kwargs):
+
+    # Строки игроков с этим id будут удалены каскадом в той же транзакции: ответы Pull
+    # изменятся только у их владельцев - одним UPDATE с подзапросом
+    row_model, field_name = _PLAYER_ROWS[sender]
+    Player.bump_versions(row_model.objects.filter(**{field_name: instance.pk}).values('player_id'))
+
+
+@receiver(post_save, sender=Resource)  # Имена ресурсов входят в витрину
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=ShopSet)
+@receiver(post_delete, sender=ShopSet)
+@receiver(post_save, sender=ShopSetComponent)
+@receiver(post_delete, sender=ShopSetComponent)
+@receiver(post_save, sender=ShopPriceComponent)
+@receiver(post_delete, sender=ShopPriceComponent)
+def on_shop_changed(sender, **kwargs):
+
+    _invalidate_now_and_on_commit(shop_catalog.invalidate_shop_catalog)
+
+
+@receiver(post_save, sender=Config)
+@receiver(post_delete, sender=Config)
+@receiver(post_save, sender=ConfigOfResourceLimit)
+@receiver(post_delete, sender=ConfigOfResourceLimit)
+def on_limits_changed(sender, **kwargs):
+
+    _invalidate_now_and_on_commit(limits.invalidate_limits)
+
+
+@receiver(post_save, sender=ConfigOfInitialPlayerResource)
+@receiver(post_delete, sender=ConfigOfInitialPlayerResource)
+@receiver(post_save, sender=ConfigOfInitialPlayerCostume)
+@receiver(post_delete, sender=ConfigOfInitialPlayerCostume)
+@receiver(post_save, sender=ConfigOfInitialPlayerTimer)
+@receiver(post_delete, sender=ConfigOfInitialPlayerTimer)
+def on_new_player_template_changed(sender, **kwargs):
+
+    _invalidate_now_and_on_commit(player_template.invalidate_template)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+
+    instrumentation.install_query_recorder(connection)
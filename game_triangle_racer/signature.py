@@ -0,0 +1,115 @@
+"""
+Подписи запросов и ответов игрового API.
+
+Подпись - MD5 от канонической строки структуры, за которой следует секрет сессии.
+Каноническая строка побайтно совпадает с helpers.stringify (её использует
+игровой клиент), но строится за один проход:
+
+- список -> '[', отсортированные канонические строки элементов, ']' через запятую;
+- словарь -> отсортированные строки 'ключ=каноническая строка значения' через запятую;
+- остальное -> str(значение).
+
+Верхний уровень не склеивается в одну строку, а по частям подаётся в объект
+хэша. Для неизменяемых частей ответов (наборы витрины магазина) каноническая
+строка вычисляется один раз - см. CanonicalDict и CanonicalList.
+
+Совместимость с helpers.stringify проверяют тесты (SignatureCompatibilityTests).
+"""
+
+
+import hashlib
+import hmac
+
+
+FIELD_SIGNATURE = 'sig'
+
+_SEPARATOR = b','
+
+
+class CanonicalDict(dict):
+    """
+    Словарь с заранее вычисленной канонической строкой.
+
+    Предназначен для неизменяемых частей ответов, которые отдаются много раз
+    (например, из снимков в памяти). После создания словарь изменять нельзя:
+    каноническая строка не пересчитывается.
+    """
+
+    __slots__ = ('canonical',)
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.canonical = ','.join(_canonicalize_items(self))
+
+
+class CanonicalList(list):
+    """Список с заранее вычисленной канонической строкой. После создания список изменять нельзя."""
+
+    __slots__ = ('canonical',)
+
+    def __init__(self, *args):
+
+        super().__init__(*args)
+        self.canonical = ','.join(['[', *sorted([canonicalize(e) for e in self]), ']'])
+
+
+def canonicalize(value):
+    """Возвращает каноническую строку значения (то же, что helpers.stringify)."""
+
+    if isinstance(value, (CanonicalDict, CanonicalList)):
+        return value.canonical
+
+    if isinstance(value, list):
+        return ','.join(['[', *sorted([canonicalize(e) for e in value]), ']'])
+
+    if isinstance(value, dict):
+        return ','.join(_canonicalize_items(value))
+
+    return str(value)
+
+
+def _canonicalize_items(struct, exclude=None):
+
+    return sorted([f'{k}={canonicalize(v)}' for k, v in struct.items() if k != exclude])
+
+
+def compute(struct, secret, exclude=None):
+    """
+    Вычисляет подпись словаря struct с секретом secret.
+
+    Поле exclude (обычно 'sig') в подпись не входит.
+    """
+
+    digest = hashlib.md5()
+    is_first = True
+
+    for part in _canonicalize_items(struct, exclude):
+        if not is_first:
+            digest.update(_SEPARATOR)
+
+        digest.update(part.encode('utf-8'))
+        is_first = False
+
+    digest.update(str(secret).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def sign(struct, secret):
+    """Добавляет подпись в поле 'sig' словаря struct."""
+
+    struct[FIELD_SIGNATURE] = compute(struct, secret)
+
+
+def verify(struct, secret):
+    """Проверяет подпись в поле 'sig' (сравнение за постоянное время)."""
+
+    received_sig = struct.get(FIELD_SIGNATURE, '')
+
+    if not isinstance(received_sig, str):
+        return False
+
+    computed_sig = compute(struct, secret, exclude=FIELD_SIGNATURE)
+
+    return hmac.compare_digest(received_sig.encode('utf-8'), computed_sig.encode('ascii'))
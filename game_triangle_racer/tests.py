@@ -0,0 +1,560 @@
+import hashlib
+import random
+import threading
+from datetime import timedelta
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from game_triangle_racer import catalog, helpers, limits, player_template, shop_catalog, signature
+from game_triangle_racer.models import (
+    Config,
+    ConfigOfInitialPlayerCostume,
+    ConfigOfInitialPlayerResource,
+    ConfigOfInitialPlayerTimer,
+    ConfigOfResourceLimit,
+    Costume,
+    Player,
+    PlayerCostume,
+    PlayerResource,
+    PlayerTimer,
+    Resource,
+    ShopPriceComponent,
+    ShopSet,
+    ShopSetComponent,
+    Timer,
+)
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.BatchAPI import BatchAPI
+from game_triangle_racer.views.PullAPI import PullAPI
+from game_triangle_racer.views.ShopAPI import ShopAPI
+
+
+def _create_shop_set(name, price, components):
+    """Создаёт набор магазина; price и components - словари "ресурс -> количество"."""
+
+    shop_set = ShopSet.objects.create(name=name)
+
+    for resource, count in price.items():
+        ShopPriceComponent.objects.create(shop_set=shop_set, resource=resource, count=count)
+
+    for resource, count in components.items():
+        ShopSetComponent.objects.create(shop_set=shop_set, resource=resource, count=count)
+
+    return shop_set
+
+
+def _get_count(player, resource):
+
+    return PlayerResource.objects.filter(player=player, resource=resource).values_list('count', flat=True).first() or 0
+
+
+class _ShopTestMixin:
+
+    def setUp(self):
+
+        shop_catalog.invalidate_shop_catalog()
+        limits.invalidate_limits()
+
+        self.coins = Resource.objects.create(name='coins')
+        self.lives = Resource.objects.create(name='lives')
+        self.player = Player.objects.create(platform='vk.com', platform_id=1)
+
+    def tearDown(self):
+
+        # Снимки общие для процесса, а строки тестов удаляются
+        shop_catalog.invalidate_shop_catalog()
+        limits.invalidate_limits()
+
+    def give(self, resource, count):
+
+        PlayerResource.objects.update_or_create(player=self.player, resource=resource, defaults={'count': count})
+
+
+class ShopBuyTests(_ShopTestMixin, TestCase):
+
+    def test_price_is_debited_in_full_before_components_are_credited(self):
+
+        # Набор возвращает часть цены тем же ресурсом: 5 монет не хватает на цену в 10
+        shop_set = _create_shop_set('refund', {self.coins: 10}, {self.coins: 5})
+        self.give(self.coins, 5)
+
+        response = ShopAPI.buy(self.player, shop_set.pk)
+
+        self.assertFalse(interdata.is_successful(response))
+        self.assertEqual(_get_count(self.player, self.coins), 5)
+
+    def test_credit_is_capped_by_max_resource_count(self):
+
+        Config.objects.create(max_resource_count=100)
+        shop_set = _create_shop_set('lives', {self.coins: 10}, {self.lives: 50})
+        self.give(self.coins, 10)
+        self.give(self.lives, 80)
+
+        response = ShopAPI.buy(self.player, shop_set.pk)
+
+        self.assertTrue(interdata.is_successful(response))
+        self.assertEqual(_get_count(self.player, self.coins), 0)
+        self.assertEqual(_get_count(self.player, self.lives), 100)
+
+    def test_price_is_read_in_purchase_transaction(self):
+
+        shop_set = _create_shop_set('pack', {self.coins: 10}, {self.lives: 1})
+        shop_catalog.get_shop_catalog()
+
+        # Цену изменили в другом процессе: снимок витрины этого процесса ещё не сброшен
+        ShopPriceComponent.objects.filter(shop_set=shop_set).update(count=20)
+        self.give(self.coins, 30)
+
+        response = ShopAPI.buy(self.player, shop_set.pk)
+
+        self.assertTrue(interdata.is_successful(response))
+        self.assertEqual(_get_count(self.player, self.coins), 10)
+        self.assertEqual(response['purchase']['price'], [{'name': 'coins', 'count': 20}])
+
+    def test_buy_bumps_player_version_in_its_transaction(self):
+
+        shop_set = _create_shop_set('free', {}, {self.lives: 1})
+        Player.objects.filter(pk=self.player.pk).update(state_snapshot={'l': 0, 'r': {}, 'c': [], 'z': {}})
+
+        ShopAPI.buy(self.player, shop_set.pk)
+
+        self.player.refresh_from_db(fields=['version', 'state_snapshot'])
+        self.assertEqual(self.player.version, 1)
+        self.assertIsNone(self.player.state_snapshot)
+
+
+class ShopBuyConcurrencyTests(_ShopTestMixin, TransactionTestCase):
+
+    N_THREADS = 8
+    N_BUYS_PER_THREAD = 5
+    INITIAL_COINS = 75
+    PRICE = 10
+    REFUND = 5
+    LIVES = 2
+
+    def buy_in_parallel(self, shop_set_ids):
+        """Покупает наборы в N_THREADS потоках (поток i - набор shop_set_ids[i % len]). Возвращает число покупок."""
+
+        n_successes = []
+        lock = threading.Lock()
+
+        def buy_many(shop_set_id):
+
+            n = 0
+
+            try:
+                for _ in range(self.N_BUYS_PER_THREAD):
+                    try:
+                        response = ShopAPI.buy(self.player, shop_set_id)
+
+                    except OperationalError:
+                        continue  # Блокировка БД (SQLite): покупка не состоялась
+
+                    if interdata.is_successful(response):
+                        n += 1
+
+            finally:
+                connection.close()
+
+            with lock:
+                n_successes.append(n)
+
+        threads = [
+            threading.Thread(target=buy_many, args=(shop_set_ids[i % len(shop_set_ids)],))
+            for i in range(self.N_THREADS)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return sum(n_successes)
+
+    def test_parallel_buys_never_overdraft(self):
+
+        shop_set = _create_shop_set(
+            'pack', {self.coins: self.PRICE}, {self.coins: self.REFUND, self.lives: self.LIVES},
+        )
+        self.give(self.coins, self.INITIAL_COINS)
+
+        n_successes = self.buy_in_parallel([shop_set.pk])
+        coins = _get_count(self.player, self.coins)
+
+        self.assertGreater(n_successes, 0)
+        self.assertGreaterEqual(coins, 0)
+        self.assertEqual(coins, self.INITIAL_COINS - n_successes * (self.PRICE - self.REFUND))
+        self.assertEqual(_get_count(self.player, self.lives), n_successes * self.LIVES)
+
+    def test_parallel_buys_of_mirror_sets(self):
+
+        # Наборы обменивают ресурсы в противоположные стороны: строки ресурсов должны
+        # блокироваться в одном порядке, иначе на PostgreSQL покупки взаимоблокируются
+        coins_to_lives = _create_shop_set('coins to lives', {self.coins: self.PRICE}, {self.lives: self.PRICE})
+        lives_to_coins = _create_shop_set('lives to coins', {self.lives: self.PRICE}, {self.coins: self.PRICE})
+        self.give(self.coins, self.INITIAL_COINS)
+        self.give(self.lives, self.INITIAL_COINS)
+
+        n_successes = self.buy_in_parallel([coins_to_lives.pk, lives_to_coins.pk])
+        coins = _get_count(self.player, self.coins)
+        lives = _get_count(self.player, self.lives)
+
+        self.assertGreater(n_successes, 0)
+        self.assertGreaterEqual(min(coins, lives), 0)
+        self.assertEqual(coins + lives, 2 * self.INITIAL_COINS)
+
+
+class BatchValidationTests(SimpleTestCase):
+
+    def test_ops_must_carry_their_index(self):
+
+        self.assertIsNone(BatchAPI.validate_ops([{'n': 0, 'op': 'pull'}, {'n': 1, 'op': 'push'}]))
+        self.assertIsNotNone(BatchAPI.validate_ops([{'n': 1, 'op': 'push'}, {'n': 0, 'op': 'pull'}]))
+        self.assertIsNotNone(BatchAPI.validate_ops([{'op': 'pull'}]))
+        self.assertIsNotNone(BatchAPI.validate_ops([{'n': '0', 'op': 'pull'}]))
+
+
+class ConditionalPullTests(TestCase):
+
+    def test_started_planned_timer_changes_version_once(self):
+
+        timer = Timer.objects.create(name='life', duration=60000)
+        player = Player.objects.create(platform='vk.com', platform_id=1)
+        start_datetime = helpers.datetime_now_utc() + timedelta(hours=1)
+        PlayerTimer.objects.create(player=player, timer=timer, start_datetime=start_datetime)
+        Player.update_next_timer_start(player.pk)
+
+        player = Player.objects.get(pk=player.pk)
+        self.assertEqual(player.next_timer_start, start_datetime)
+        self.assertEqual(PullAPI.read_player_version(player), 0)
+
+        # Таймер запустился без записи в БД: версия должна измениться ровно один раз
+        PlayerTimer.objects.filter(player=player).update(start_datetime=helpers.datetime_now_utc())
+        Player.objects.filter(pk=player.pk).update(next_timer_start=helpers.datetime_now_utc())
+
+        player = Player.objects.get(pk=player.pk)
+        self.assertEqual(PullAPI.read_player_version(player), 1)
+        self.assertIsNone(player.next_timer_start)
+
+        player = Player.objects.get(pk=player.pk)
+        self.assertEqual(PullAPI.read_player_version(player), 1)
+
+
+class CatalogEntryDeletionTests(TestCase):
+
+    def test_only_owners_of_deleted_entry_are_bumped(self):
+
+        coins = Resource.objects.create(name='coins')
+        owner = Player.objects.create(platform='vk.com', platform_id=1)
+        other = Player.objects.create(platform='vk.com', platform_id=2)
+        PlayerResource.objects.create(player=owner, resource=coins, count=5)
+        Player.objects.update(state_snapshot={'l': 0, 'r': {}, 'c': [], 'z': {}})
+
+        coins.delete()
+
+        owner.refresh_from_db(fields=['version', 'state_snapshot'])
+        other.refresh_from_db(fields=['version', 'state_snapshot'])
+        self.assertEqual((owner.version, owner.state_snapshot), (1, None))
+        self.assertEqual(other.version, 0)
+        self.assertIsNotNone(other.state_snapshot)
+
+
+class RegistrationTests(TestCase):
+
+    def setUp(self):
+
+        self.addCleanup(player_template.invalidate_template)
+
+    def test_new_player_is_seeded_from_template_with_one_insert_per_table(self):
+
+        coins = Resource.objects.create(name='coins')
+        red = Costume.objects.create(name='red', image_url='http://example.com/red.png')
+        life = Timer.objects.create(name='life', duration=60000)
+        bonus = Timer.objects.create(name='bonus', duration=1000)
+        ConfigOfInitialPlayerResource.objects.create(resource=coins, initial_count=100)
+        ConfigOfInitialPlayerCostume.objects.create(costume=red)
+        ConfigOfInitialPlayerTimer.objects.create(timer=life, start_delay=0)
+        ConfigOfInitialPlayerTimer.objects.create(timer=bonus, start_delay=3600000)
+        player_template.get_template()  # Шаблон читается один раз, не при регистрации
+
+        before = helpers.datetime_now_utc()
+
+        # Игрок и по одному bulk_create на ресурсы, костюмы и таймеры
+        with self.assertNumQueries(4):
+            player = Player.create_and_get_new_player('vk.com', 1, 1000)
+
+        self.assertEqual(list(PlayerResource.objects.filter(player=player).values_list('resource', 'count')), [
+            (coins.pk, 100),
+        ])
+        self.assertEqual(list(PlayerCostume.objects.filter(player=player).values_list('costume', flat=True)), [red.pk])
+
+        starts = dict(PlayerTimer.objects.filter(player=player).values_list('timer', 'start_datetime'))
+        self.assertEqual(set(starts), {life.pk, bonus.pk})
+        self.assertLess(starts[life.pk], before + timedelta(seconds=5))
+        self.assertGreaterEqual(starts[bonus.pk], before + timedelta(hours=1))
+        self.assertEqual(player.next_timer_start, starts[bonus.pk])
+
+
+class LogInTests(TestCase):
+
+    def test_log_in_without_login_stamp_keeps_it(self):
+
+        player = Player.objects.create(platform='vk.com', platform_id=1, login_stamp=123)
+
+        self.assertEqual(Player.log_in('vk.com', 1, None), player.pk)
+        player.refresh_from_db(fields=['login_stamp'])
+        self.assertEqual(player.login_stamp, 123)
+
+        game_id = Player.log_in('vk.com', 2, None, regin_stamp=456)
+        self.assertEqual(
+            Player.objects.filter(pk=game_id).values_list('regin_stamp', 'login_stamp').get(), (456, 0),
+        )
+
+
+class CatalogSnapshotTests(TestCase):
+
+    def tearDown(self):
+
+        catalog.invalidate_catalog()
+
+    def test_next_read_sees_saved_and_deleted_entries(self):
+
+        catalog.get_catalog()
+
+        stars = Resource.objects.create(name='stars')
+        self.assertEqual(catalog.get_catalog().resource_ids.get('stars'), stars.pk)
+
+        stars.name = 'gems'
+        stars.save()
+        self.assertEqual(catalog.get_catalog().resource_names[stars.pk], 'gems')
+
+        timer = Timer.objects.create(name='life', duration=60000)
+        timer.duration = 1000
+        timer.save()
+        self.assertEqual(catalog.get_catalog().timer_durations[timer.pk], 1000)
+
+        stars.delete()
+        self.assertNotIn('gems', catalog.get_catalog().resource_ids)
+
+
+class ShopCatalogSnapshotTests(TestCase):
+
+    def tearDown(self):
+
+        shop_catalog.invalidate_shop_catalog()
+
+    def test_next_read_sees_saved_shop_set(self):
+
+        coins = Resource.objects.create(name='coins')
+        shop_set = _create_shop_set('pack', {coins: 10}, {})
+        shop_catalog.get_shop_catalog()
+
+        price = ShopPriceComponent.objects.get(shop_set=shop_set)
+        price.count = 20
+        price.save()
+        self.assertEqual(shop_catalog.get_shop_catalog().prices[shop_set.pk], ((coins.pk, 20),))
+
+        shop_set.name = 'big pack'
+        shop_set.save()
+        self.assertEqual(shop_catalog.get_shop_catalog().shop_sets_by_id[shop_set.pk]['name'], 'big pack')
+
+        # Имена ресурсов входят в витрину
+        coins.name = 'gold'
+        coins.save()
+        self.assertEqual(
+            shop_catalog.get_shop_catalog().shop_sets_by_id[shop_set.pk]['price'], [{'name': 'gold', 'count': 20}],
+        )
+
+        shop_set.delete()
+        self.assertNotIn(shop_set.pk, shop_catalog.get_shop_catalog().shop_sets_by_id)
+
+
+class LimitsSnapshotTests(TestCase):
+
+    def tearDown(self):
+
+        limits.invalidate_limits()
+
+    def test_next_read_sees_saved_config(self):
+
+        coins = Resource.objects.create(name='coins')
+        limits.get_limits()
+
+        config = Config.objects.create(max_level=5, max_resource_count=100)
+        self.assertEqual(limits.get_limits().max_level, 5)
+
+        config.max_resource_count = 200
+        config.save()
+        self.assertEqual(limits.get_limits().get_max_resource_count(coins.pk), 200)
+
+        resource_limit = ConfigOfResourceLimit.objects.create(resource=coins, max_count=50)
+        self.assertEqual(limits.get_limits().get_max_resource_count(coins.pk), 50)
+
+        resource_limit.delete()
+        self.assertEqual(limits.get_limits().get_max_resource_count(coins.pk), 200)
+
+
+class SnapshotInvalidationOnCommitTests(TransactionTestCase):
+    """Снимок, загруженный до фиксации транзакции админки (в другом процессе - устаревший), сбрасывается после неё."""
+
+    def tearDown(self):
+
+        catalog.invalidate_catalog()
+        shop_catalog.invalidate_shop_catalog()
+        limits.invalidate_limits()
+
+    def assert_reloaded_after_commit(self, get_snapshot, get_stats, change):
+
+        with transaction.atomic():
+            change()
+            get_snapshot()
+            n_misses = get_stats()['misses']
+
+        get_snapshot()
+        self.assertEqual(get_stats()['misses'], n_misses + 1)
+
+    def test_catalog(self):
+
+        self.assert_reloaded_after_commit(
+            catalog.get_catalog, catalog.get_catalog_stats, lambda: Resource.objects.create(name='stars'),
+        )
+
+    def test_shop_catalog(self):
+
+        self.assert_reloaded_after_commit(
+            shop_catalog.get_shop_catalog,
+            shop_catalog.get_shop_catalog_stats,
+            lambda: ShopSet.objects.create(name='pack'),
+        )
+
+    def test_limits(self):
+
+        self.assert_reloaded_after_commit(
+            limits.get_limits, limits.get_limits_stats, lambda: Config.objects.create(max_level=5),
+        )
+
+
+class TokenCacheTests(TestCase):
+
+    def test_cached_player_loads_game_fields_in_one_query(self):
+
+        player = Player.objects.create(platform='vk.com', platform_id=1, level=3, version=2)
+        token = player.get_token()
+        self.addCleanup(player.forget_cached_token)
+
+        Player.get_player_by_token(token)  # Кладёт токен в кэш
+        cached_player = Player.get_player_by_token(token)
+        self.assertTrue(cached_player.from_token_cache)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_player.level, 3)
+            self.assertEqual(cached_player.version, 2)
+            self.assertIsNone(cached_player.next_timer_start)
+
+
+# Структуры, которые отправляет и получает игровой клиент, и крайние случаи канонической формы
+SIGNATURE_CORPUS = (
+    {},
+    {'isSuccess': 1},
+    {'isSuccess': 0, 'purchase': {}},
+    {'0': ['level'], 'r': ['coins', 'lives', 'stars', 'chances'], 'c': [], 'z': ['life', 'bonus']},
+    {'0': {'level': 42, 'playerID': 5262235}, 'r': {'stars': 0, 'lives': 2, 'chances': 7, 'coins': 1000}},
+    {'c': {'red': True, 'blue': False}, 'z': {'life': 23001, 'bonus': 0}},
+    {'platform': 'vk.com', 'platformID': 42, 'platformAPIID': 1, 'platformAuthKey': 'a' * 32},
+    {'isSuccess': 1, 'token': 'OVh5pq5oRBzaQN+964NGEiOnxYGGGZYm', 't': 1792316969337},
+    {'action': 'showSome', 'fromId': 4, 'toId': 16},
+    {
+        'isSuccess': 1,
+        'shopSetsCount': 2,
+        'shopSets': [
+            {'id': 2, 'name': 'Набор 2', 'price': [{'name': 'coins', 'count': 30}], 'components': []},
+            {'id': 1, 'name': 'Набор, "1"', 'price': [], 'components': [{'name': 'lives', 'count': 2}]},
+        ],
+    },
+    {'ops': [{'n': 0, 'op': 'push', 'r': {'coins': 100}}, {'n': 1, 'op': 'pull', 'r': ['coins']}]},
+    {'errorCode': 4, 'errorMessage': 'Ресурс "nope" не найден в базе данных.'},
+    {'a': [[], [[]], [{}], {}], 'b': [3, '3', 3.0, None, True, 'True']},
+    {'a=b': 'c,d', '[': ']', ',': '', 'x': ['=', ',', '[', ']', '']},
+    {'n': [10, 9, 100, -1, 1.5, 1e20, 0.1, -0.0, float('inf')]},
+    {'f': False, 't': True, 'none': None, 'nested': {'none': [None, {'x': None}], 'bool': [True, False, 1, 0]}},
+    {'u': 'ёжик', 'Ё': ['я', 'а', 'Я', 'A'], 'ключ': {'вложенный ключ': {'ещё': ['ü', 'é', '漢字']}}},
+)
+
+SIGNATURE_SECRET = '1234567'
+
+
+def _legacy_sig(struct, secret, exclude=None):
+    """Подпись так, как её вычисляет игровой клиент: MD5 от helpers.stringify и секрета."""
+
+    struct = {k: v for k, v in struct.items() if k != exclude}
+
+    return hashlib.md5(f'{helpers.stringify(struct)}{secret}'.encode('utf-8')).hexdigest()
+
+
+def _freeze(value):
+    """Заменяет словари и списки на CanonicalDict и CanonicalList (как в снимках)."""
+
+    if isinstance(value, list):
+        return signature.CanonicalList(_freeze(e) for e in value)
+
+    if isinstance(value, dict):
+        return signature.CanonicalDict({k: _freeze(v) for k, v in value.items()})
+
+    return value
+
+
+def _random_value(rng, depth):
+
+    kind = rng.randrange(8 if depth < 4 else 5)
+
+    if kind == 0:
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == 1:
+        return rng.choice([True, False, None, 0.5, -2.25, 1e-7])
+    if kind in (2, 3, 4):
+        return ''.join(rng.choice('ab,=[]{}: ёЯ1') for _ in range(rng.randrange(6)))
+    if kind in (5, 6):
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(5))]
+
+    return _random_struct(rng, depth + 1)
+
+
+def _random_struct(rng, depth=0):
+
+    return {
+        ''.join(rng.choice('abzё0,=[') for _ in range(rng.randrange(1, 4))): _random_value(rng, depth)
+        for _ in range(rng.randrange(6))
+    }
+
+
+class SignatureCompatibilityTests(SimpleTestCase):
+    """Подписи game_triangle_racer.signature побайтно совпадают с helpers.stringify + MD5 (игровой клиент)."""
+
+    N_RANDOM_STRUCTS = 2000
+
+    def assert_compatible(self, struct):
+
+        expected_sig = _legacy_sig(struct, SIGNATURE_SECRET)
+        signed = dict(struct, sig=expected_sig)
+
+        self.assertEqual(signature.canonicalize(struct), helpers.stringify(struct))
+        self.assertEqual(signature.canonicalize(_freeze(struct)), helpers.stringify(struct))
+        self.assertEqual(signature.compute(struct, SIGNATURE_SECRET), expected_sig)
+        self.assertTrue(signature.verify(signed, SIGNATURE_SECRET))
+        self.assertFalse(signature.verify(signed, SIGNATURE_SECRET + '0'))
+
+    def test_corpus(self):
+
+        for struct in SIGNATURE_CORPUS:
+            with self.subTest(struct=struct):
+                self.assert_compatible(struct)
+
+    def test_random_structs(self):
+
+        rng = random.Random(0)
+
+        for _ in range(self.N_RANDOM_STRUCTS):
+            struct = _random_struct(rng)
+
+            with self.subTest(struct=struct):
+                self.assert_compatible(struct)
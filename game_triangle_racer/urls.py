@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from game_triangle_racer import views
 
 
 app_name = "game_triangle_racer"
 
+# Под ASGI (uvicorn) асинхронные представления не занимают поток на время ожидания БД
+if settings.GAME_API_ASYNC_VIEWS:
+    PullAPI, PushAPI, ShopAPI, BatchAPI = views.AsyncPullAPI, views.AsyncPushAPI, views.AsyncShopAPI, views.AsyncBatchAPI
+else:
+    PullAPI, PushAPI, ShopAPI, BatchAPI = views.PullAPI, views.PushAPI, views.ShopAPI, views.BatchAPI
+
 urlpatterns = [
     path('', views.GameClientView.as_view(), name='client'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
     path('api/start/', views.StartAPI.as_view(), name='api-start'),
-    path('api/pull/<str:token>/', views.PullAPI.as_view(), name='api-pull'),
-    path('api/push/<str:token>/', views.PushAPI.as_view(), name='api-push'),
-    path('api/shop/<str:token>/', views.ShopAPI.as_view(), name='api-shop'),
+    path('api/pull/<str:token>/', PullAPI.as_view(), name='api-pull'),
+    path('api/push/<str:token>/', PushAPI.as_view(), name='api-push'),
+    path('api/shop/<str:token>/', ShopAPI.as_view(), name='api-shop'),
+    path('api/batch/<str:token>/', BatchAPI.as_view(), name='api-batch'),
 ]
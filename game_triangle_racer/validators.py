@@ -1,24 +1,21 @@
 """Валидаторы для проверки игровых данных."""
 
 
-import logging
-from game_triangle_racer.models.Config import Config
+from game_triangle_racer import limits as game_limits
+from game_triangle_racer.limits import MAX_LEVEL, MAX_RESOURCE_COUNT  # noqa: F401  Значения по умолчанию
 
 
-# Константы валидации (можно переопределить через Config модель)
-MAX_LEVEL = 9999
-MAX_RESOURCE_COUNT = 999999999
+# Константы валидации (верхние пределы задаются через Config модель)
 MIN_RESOURCE_COUNT = 0
 
-logger = logging.getLogger(__name__)
 
-
-def validate_level(level):
+def validate_level(level, limits=None):
     """
     Валидирует уровень игрока.
     
     Args:
         level: Уровень для проверки
+        limits: Снимок пределов (limits.get_limits()); если не передан, берётся текущий
         
     Returns:
         tuple: (is_valid, error_message)
@@ -32,7 +29,7 @@ def validate_level(level):
 
         return False, "Уровень не может быть отрицательным"
     
-    max_level = _get_max_level()
+    max_level = (limits or game_limits.get_limits()).max_level
 
     if level > max_level:
 
@@ -41,12 +38,14 @@ def validate_level(level):
     return True, None
 
 
-def validate_resource_count(count):
+def validate_resource_count(count, limits=None, resource_id=None):
     """
     Валидирует количество ресурса.
     
     Args:
         count: Количество для проверки
+        limits: Снимок пределов (limits.get_limits()); если не передан, берётся текущий
+        resource_id: id ресурса, для которого может быть задан собственный предел
         
     Returns:
         tuple: (is_valid, error_message)
@@ -62,7 +61,7 @@ def validate_resource_count(count):
 
         return False, f"Количество ресурса не может быть меньше {MIN_RESOURCE_COUNT}"
     
-    max_count = _get_max_resource_count()
+    max_count = (limits or game_limits.get_limits()).get_max_resource_count(resource_id)
 
     if count > max_count:
 
@@ -70,34 +69,3 @@ def validate_resource_count(count):
     
     return True, None
 
-
-def _get_max_level():
-    """Получает максимальный уровень из конфигурации или использует значение по умолчанию."""
-
-    try:
-        config = Config.objects.first()
-
-        if config and hasattr(config, 'max_level'):
-
-            return config.max_level
-
-    except Exception as e:
-        logger.warning(f'Ошибка при получении max_level из конфигурации: {e}')
-
-    return MAX_LEVEL
-
-
-def _get_max_resource_count():
-    """Получает максимальное количество ресурса из конфигурации или использует значение по умолчанию."""
-
-    try:
-        config = Config.objects.first()
-
-        if config and hasattr(config, 'max_resource_count'):
-
-            return config.max_resource_count
-
-    except Exception as e:
-        logger.warning(f'Ошибка при получении max_resource_count из конфигурации: {e}')
-
-    return MAX_RESOURCE_COUNT
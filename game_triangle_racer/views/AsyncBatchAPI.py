@@ -0,0 +1,17 @@
+from game_triangle_racer.views.BatchAPI import BatchAPI
+from game_triangle_racer.views.async_base_api import AsyncBaseJsonSignedAPIView
+
+
+# Формат запроса и ответа - как у BatchAPI
+
+
+class AsyncBatchAPI(AsyncBaseJsonSignedAPIView):
+    """
+    Асинхронный вариант BatchAPI.
+
+    Пакет с записью выполняется одной транзакцией, а транзакции доступны только
+    синхронному ORM, поэтому handle_request BatchAPI выполняется в потоке
+    (см. AsyncBaseJsonSignedAPIView.ahandle_request).
+    """
+
+    sync_view_class = BatchAPI
@@ -0,0 +1,134 @@
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from game_triangle_racer import catalog, player_state
+from game_triangle_racer.views import interdata
+from game_triangle_racer.models import Player
+from game_triangle_racer.views.PullAPI import PullAPI, VERSION_FIELDS
+from game_triangle_racer.views.async_base_api import AsyncBaseJsonSignedAPIView
+
+
+logger = logging.getLogger(__name__)
+
+
+# Формат запроса и ответа - как у PullAPI
+
+
+class AsyncPullAPI(AsyncBaseJsonSignedAPIView):
+    """Асинхронный вариант PullAPI: чтение через асинхронный ORM, без занятого потока на запрос."""
+
+    sync_view_class = PullAPI
+
+    async def ahandle_request(self, data, player, *args, **kwargs):
+        """Обрабатывает запрос на получение данных игрока."""
+
+        (
+            input_fields_0,
+            input_fields_r,
+            input_fields_c,
+            input_fields_z,
+        ) = interdata.get_fields_as_lists_or_nones(data)
+
+        if input_fields_z is None:
+            input_fields_z = []
+
+        requested_version = interdata.get_v(data)
+
+        if settings.GAME_PLAYER_STATE_SNAPSHOT:
+            version, state = await player_state.aload_state(player)
+
+            if version == requested_version:
+                return PullAPI.make_not_modified_response(player, version)
+
+            game_catalog = await catalog.aget_catalog()
+
+            if player_state.needs_refreshed_catalog(state, game_catalog):
+                game_catalog = await sync_to_async(catalog.get_refreshed_catalog)()
+
+            output_fields_0, output_fields_r, output_fields_c, output_fields_z = player_state.make_output_fields(
+                player, state, input_fields_0, input_fields_r, input_fields_c, input_fields_z, game_catalog,
+            )
+        else:
+            version = await self.aread_player_version(player, input_fields_0)
+
+            if version == requested_version:
+                return PullAPI.make_not_modified_response(player, version)
+
+            output_fields_0 = await self.aread_player_common_data(player, input_fields_0)
+            output_fields_r = await self.aread_player_resources(player, input_fields_r)
+            output_fields_c = await self.aread_player_costumes(player, input_fields_c)
+            output_fields_z = await self.aread_player_timers(player, input_fields_z)
+
+        response = interdata.create_by_field_compositing(
+            interdata.create_by_extending(interdata.create_just_success(), **{interdata.FIELD_V: version}),
+            field_0=output_fields_0,
+            field_r=output_fields_r,
+            field_c=output_fields_c,
+            field_z=output_fields_z,
+        )
+
+        logger.info('Запрос на получение данных выполнен для игрока game_id=%s.', player.game_id)
+
+        return response
+
+    @staticmethod
+    async def aread_player_version(player, input_fields_0):
+
+        fields = player.get_game_fields_to_load()
+
+        if fields:
+            await player.arefresh_from_db(fields=fields)
+
+        if Player.is_next_timer_started(player.next_timer_start):
+            await sync_to_async(Player.bump_version_for_started_timers)(player.pk)
+            await player.arefresh_from_db(fields=VERSION_FIELDS)
+
+        return player.version
+
+    @staticmethod
+    async def aread_player_common_data(player, input_fields_0):
+
+        if input_fields_0 and 'level' in player.get_deferred_fields():
+            # Игрок взят из кэша токенов: уровень догружается без блокирующего обращения к БД
+            await player.arefresh_from_db(fields=['level'])
+
+        return PullAPI.read_player_common_data(player, input_fields_0)
+
+    @staticmethod
+    async def aread_player_resources(player, input_fields_r):
+
+        if input_fields_r is None:
+            return None
+
+        game_catalog = await catalog.aget_catalog()
+        rows = [row async for row in PullAPI.query_player_resources(player, input_fields_r, game_catalog)]
+
+        return PullAPI.make_output_fields_r(input_fields_r, rows, game_catalog)
+
+    @staticmethod
+    async def aread_player_costumes(player, input_fields_c):
+
+        if input_fields_c is None:
+            return None
+
+        game_catalog = await catalog.aget_catalog()
+        rows = [row async for row in PullAPI.query_player_costumes(player, input_fields_c, game_catalog)]
+
+        if any(cid not in game_catalog.costume_names for cid in rows):
+            game_catalog = await sync_to_async(catalog.get_refreshed_catalog)()
+
+        return PullAPI.make_output_fields_c(input_fields_c, rows, game_catalog)
+
+    @staticmethod
+    async def aread_player_timers(player, input_fields_z):
+
+        if input_fields_z is None:
+            return None
+
+        game_catalog = await catalog.aget_catalog()
+        rows = [row async for row in PullAPI.query_player_timers(player, input_fields_z, game_catalog)]
+
+        if any(timer_id not in game_catalog.timer_names for timer_id, _ in rows):
+            game_catalog = await sync_to_async(catalog.get_refreshed_catalog)()
+
+        return PullAPI.make_output_fields_z(input_fields_z, rows, game_catalog)
@@ -0,0 +1,17 @@
+from game_triangle_racer.views.PushAPI import PushAPI
+from game_triangle_racer.views.async_base_api import AsyncBaseJsonSignedAPIView
+
+
+# Формат запроса и ответа - как у PushAPI
+
+
+class AsyncPushAPI(AsyncBaseJsonSignedAPIView):
+    """
+    Асинхронный вариант PushAPI.
+
+    Запись идёт одной транзакцией с блокировкой строки игрока (select_for_update),
+    а транзакции доступны только синхронному ORM, поэтому handle_request PushAPI
+    выполняется в потоке (см. AsyncBaseJsonSignedAPIView.ahandle_request).
+    """
+
+    sync_view_class = PushAPI
@@ -0,0 +1,40 @@
+import logging
+from asgiref.sync import sync_to_async
+from game_triangle_racer import shop_catalog
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.ShopAPI import ShopAPI
+from game_triangle_racer.views.async_base_api import AsyncBaseJsonSignedAPIView
+
+
+logger = logging.getLogger(__name__)
+
+
+# Формат запроса и ответа - как у ShopAPI
+
+
+class AsyncShopAPI(AsyncBaseJsonSignedAPIView):
+    """
+    Асинхронный вариант ShopAPI.
+
+    Витрина отдаётся из снимка (загружается в потоке, только если его ещё нет); покупка (транзакция
+    с условными UPDATE) выполняется синхронным ShopAPI.buy в потоке.
+    """
+
+    sync_view_class = ShopAPI
+
+    async def ahandle_request(self, data, player, *args, **kwargs):
+        """Обрабатывает запрос к магазину."""
+        action, action_args = ShopAPI.parse_request(data)
+
+        if action_args is None:
+            response = interdata.create_just_failure()
+        elif action == 'showAll':
+            response = ShopAPI.show_all(await shop_catalog.aget_shop_catalog())
+        elif action == 'showSome':
+            response = ShopAPI.show_some(*action_args, await shop_catalog.aget_shop_catalog())
+        else:
+            response = await sync_to_async(ShopAPI.buy)(player, *action_args)
+
+        logger.info('Запрос к магазину выполнен для игрока game_id=%s, действие: %s.', player.game_id, action)
+
+        return response
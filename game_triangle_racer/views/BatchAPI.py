@@ -0,0 +1,154 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from game_triangle_racer import instrumentation
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.base_api import BaseJsonSignedAPIView
+from game_triangle_racer.views.PullAPI import PullAPI
+from game_triangle_racer.views.PushAPI import PushAPI
+from game_triangle_racer.views.ShopAPI import ShopAPI
+
+
+logger = logging.getLogger(__name__)
+
+
+# Request JSON example:
+# {
+#     "sig": "<request signature symbols>",
+#     "ops": [
+#         {"n": 0, "op": "push", "0": {"level": 12}, "r": {"coins": 1000}},  ## Body of a PushAPI request
+#         {"n": 1, "op": "pull", "0": ["level"], "r": [], "c": []},  ## Body of a PullAPI request
+#         {"n": 2, "op": "shop", "action": "showAll"}  ## Body of a ShopAPI request
+#     ]
+# }
+#
+# "n" is the operation's index in "ops". The signature sorts list elements, so it
+# does not cover their order; the signed "n" does, and a batch is rejected unless
+# every "n" equals the operation's index.
+#
+# Response JSON example:
+# {
+#     "sig": "<response signature symbols>",
+#     "isSuccess": 1,
+#     "results": [
+#         {"isSuccess": 1},
+#         {"isSuccess": 1, "v": 18, "0": {...}, "r": {...}, "c": {...}, "z": {}},
+#         {"isSuccess": 1, "shopSetsCount": 2, "shopSets": [...]}
+#     ]
+# }
+#
+# Operations are executed in order. If the batch contains writes (push or shop buy),
+# it runs in one transaction: the first failed operation stops the batch and rolls
+# back all its writes; the response is then
+# {"isSuccess": 0, "failedOp": <index>, "results": [<results up to the failed one>]}.
+#
+
+FIELD_OPS = 'ops'
+FIELD_OP = 'op'
+FIELD_N = 'n'  # Порядковый номер операции: подпись не покрывает порядок элементов списка
+FIELD_RESULTS = 'results'
+FIELD_FAILED_OP = 'failedOp'
+
+
+class BatchAPI(BaseJsonSignedAPIView):
+    """
+    API-эндпоинт для нескольких операций Pull/Push/Shop в одном подписанном запросе.
+
+    Токен и подпись проверяются один раз, операции выполняются методами
+    handle_request представлений PullAPI, PushAPI и ShopAPI.
+    """
+
+    endpoint_name = 'batch'
+
+    VIEW_CLASSES = {
+        'pull': PullAPI,
+        'push': PushAPI,
+        'shop': ShopAPI,
+    }
+
+    def handle_request(self, data, player, *args, **kwargs):
+        """Обрабатывает пакет операций."""
+
+        ops = data.get(FIELD_OPS)
+        error_message = self.validate_ops(ops)
+
+        if error_message:
+            logger.warning('Пакет отклонён для игрока game_id=%s: %s', player.game_id, error_message)
+
+            return interdata.create_validation_error(error_message)
+
+        if any(self.is_write_op(op) for op in ops):
+            with transaction.atomic():
+                response = self.run_ops(ops, player, *args, **kwargs)
+
+                if not interdata.is_successful(response):
+                    transaction.set_rollback(True)
+        else:
+            response = self.run_ops(ops, player, *args, **kwargs)
+
+        instrumentation.set_action(None)  # Действия операций (например, магазина) не относятся ко всему пакету
+
+        logger.info('Пакет из %s операций выполнен для игрока game_id=%s.', len(ops), player.game_id)
+
+        return response
+
+    def run_ops(self, ops, player, *args, **kwargs):
+        """Выполняет операции по порядку до первой неудачной."""
+
+        results = []
+
+        for i, op in enumerate(ops):
+            op_data = {k: v for k, v in op.items() if k not in (FIELD_OP, FIELD_N)}
+            result = self.VIEW_CLASSES[op[FIELD_OP]]().handle_request(op_data, player, *args, **kwargs)
+            results.append(result)
+
+            if not interdata.is_successful(result):
+                return interdata.create_by_extending(
+                    interdata.create_just_failure(),
+                    **{FIELD_FAILED_OP: i, FIELD_RESULTS: results},
+                )
+
+            if self.is_write_op(op):
+                self.reload_game_fields(player)
+
+        return interdata.create_by_extending(interdata.create_just_success(), **{FIELD_RESULTS: results})
+
+    @classmethod
+    def validate_ops(cls, ops):
+        """Возвращает текст ошибки или None, если список операций корректен."""
+
+        if not isinstance(ops, list) or not ops:
+            return f'Поле "{FIELD_OPS}" должно быть непустым списком операций.'
+
+        if len(ops) > settings.GAME_BATCH_MAX_OPS:
+            return f'Операций в пакете больше {settings.GAME_BATCH_MAX_OPS}.'
+
+        for i, op in enumerate(ops):
+            if not isinstance(op, dict) or op.get(FIELD_OP) not in cls.VIEW_CLASSES:
+                return f'Операция {i}: ожидается объект с "{FIELD_OP}" из {", ".join(cls.VIEW_CLASSES)}.'
+
+            n = op.get(FIELD_N)
+
+            if type(n) is not int or n != i:
+                return f'Операция {i}: поле "{FIELD_N}" должно быть равно её номеру в пакете ({i}).'
+
+        return None
+
+    @staticmethod
+    def is_write_op(op):
+
+        return op[FIELD_OP] == 'push' or (op[FIELD_OP] == 'shop' and op.get('action') == 'buy')
+
+    @staticmethod
+    def reload_game_fields(player):
+        """
+        Перечитывает уровень и версию игрока после записи.
+
+        Операции получают один и тот же объект игрока, а запись меняет строку в БД;
+        поля, ещё не загруженные (игрок из кэша токенов), и так прочитаются заново.
+        """
+
+        fields = [name for name in ('level', 'version') if name not in player.get_deferred_fields()]
+
+        if fields:
+            player.refresh_from_db(fields=fields)
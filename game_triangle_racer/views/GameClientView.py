@@ -1,6 +1,5 @@
 import logging
 from django.conf import settings
-from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.views.generic import View
@@ -59,25 +58,14 @@ def _make_response_for_vk(request):
         logger.info(f'Запрос принят: VK сессия валидна. Пользователь {platform_id}.')
         stamp = helpers.datetime_to_stamp(helpers.datetime_now_utc())
 
-        with transaction.atomic():
-            # Используем select_for_update для защиты от race conditions при создании
-            player = Player.objects.filter(
-                platform=platform,
-                platform_id=platform_id
-            ).select_for_update().first()
-
-            if not player:
-                logger.info(f'Пользователь {platform_id} - новый игрок. Регистрация...')
-                player = Player.create_and_get_new_player(platform, platform_id, stamp)
-
-            player.login_stamp = stamp
-            player.save(update_fields=['login_stamp'])
+        # Вернувшийся игрок - одним UPDATE по первичному ключу; блокировки и вставка - только для нового
+        Player.log_in(platform, platform_id, stamp)
 
         response = render(
             request, 'game_triangle_racer/triangle_racer.html',
             context={
-                'login_stamp': player.login_stamp,
-                'platform': player.platform,
+                'login_stamp': stamp,
+                'platform': platform,
             }
         )
 
@@ -0,0 +1,28 @@
+import hmac
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.generic import View
+from game_triangle_racer import metrics
+
+
+class MetricsView(View):
+    """
+    Отдаёт метрики всех процессов в текстовом формате Prometheus.
+
+    Без GAME_METRICS_TOKEN эндпоинт выключен (404), чтобы метрики не были публичными.
+    """
+
+    def get(self, request, *args, **kwargs):
+
+        if not settings.GAME_METRICS_ENABLED or not settings.GAME_METRICS_TOKEN:
+            raise Http404()
+
+        expected = f'Bearer {settings.GAME_METRICS_TOKEN}'.encode('utf-8')
+        received = request.headers.get('Authorization', '').encode('utf-8')
+
+        if not hmac.compare_digest(received, expected):
+            return HttpResponse(status=401)
+
+        metrics.flush()  # Значения этого процесса - без задержки
+
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
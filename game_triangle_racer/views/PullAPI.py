@@ -1,17 +1,22 @@
 import logging
-from django.db import transaction
+from django.conf import settings
 from django.db.models import Prefetch
-from game_triangle_racer.models import Player, PlayerResource, PlayerCostume, PlayerTimer, Resource, Costume, Timer
+from game_triangle_racer import catalog, helpers, player_state
+from game_triangle_racer.models import Player, PlayerResource, PlayerCostume, PlayerTimer
 from game_triangle_racer.views import interdata
 from game_triangle_racer.views.base_api import BaseJsonSignedAPIView
 
 
 logger = logging.getLogger(__name__)
 
+# Поля игрока, по которым определяется текущая версия его данных
+VERSION_FIELDS = ('version', 'next_timer_start')
+
 
 # Request JSON example:
 # {
 #     "sig": "<request signature symbols>",
+#     "v": 17,  ## Optional: version from the previous response
 #     "0": [
 #         "level"
 #     ],
@@ -32,6 +37,7 @@ logger = logging.getLogger(__name__)
 # {
 #     "sig": "<response signature symbols>",
 #     "isSuccess": 1,
+#     "v": 18,  ## Player data version
 #     "0": {
 #         "gameID": 5262235,
 #         "level"
@@ -52,13 +58,28 @@ logger = logging.getLogger(__name__)
 #     }
 # }
 #
+# Response JSON example (request "v" equals current version):
+# {
+#     "sig": "<response signature symbols>",
+#     "isSuccess": 1,
+#     "notModified": 1,
+#     "v": 17
+# }
+#
 
 
 class PullAPI(BaseJsonSignedAPIView):
     """API-эндпоинт для получения игровой информации с сервера."""
 
+    endpoint_name = 'pull'
+
     def handle_request(self, data, player, *args, **kwargs):
-        """Обрабатывает запрос на получение данных игрока."""
+        """
+        Обрабатывает запрос на получение данных игрока.
+
+        Если версия "v" из запроса совпадает с текущей версией данных игрока,
+        возвращается короткий ответ notModified без чтения ресурсов, костюмов и таймеров.
+        """
 
         (
             input_fields_0,
@@ -67,23 +88,78 @@ class PullAPI(BaseJsonSignedAPIView):
             input_fields_z,
         ) = interdata.get_fields_as_lists_or_nones(data)
 
-        output_fields_0 = self.read_player_common_data(player, input_fields_0)
-        output_fields_r = self.read_player_resources(player, input_fields_r)
-        output_fields_c = self.read_player_costumes(player, input_fields_c)
-        output_fields_z = self.read_player_timers(player, [] if input_fields_z is None else input_fields_z)
+        if input_fields_z is None:
+            input_fields_z = []
+
+        requested_version = interdata.get_v(data)
+
+        if settings.GAME_PLAYER_STATE_SNAPSHOT:
+            # Все поля - из снимка состояния, одним чтением строки игрока
+            version, state = player_state.load_state(player)
+
+            if version == requested_version:
+                return self.make_not_modified_response(player, version)
+
+            game_catalog = catalog.get_catalog()
+
+            if player_state.needs_refreshed_catalog(state, game_catalog):
+                game_catalog = catalog.get_refreshed_catalog()
+
+            output_fields_0, output_fields_r, output_fields_c, output_fields_z = player_state.make_output_fields(
+                player, state, input_fields_0, input_fields_r, input_fields_c, input_fields_z, game_catalog,
+            )
+        else:
+            version = self.read_player_version(player, input_fields_0)
+
+            if version == requested_version:
+                return self.make_not_modified_response(player, version)
+
+            output_fields_0 = self.read_player_common_data(player, input_fields_0)
+            output_fields_r = self.read_player_resources(player, input_fields_r)
+            output_fields_c = self.read_player_costumes(player, input_fields_c)
+            output_fields_z = self.read_player_timers(player, input_fields_z)
 
         response = interdata.create_by_field_compositing(
-            interdata.create_just_success(),
+            interdata.create_by_extending(interdata.create_just_success(), **{interdata.FIELD_V: version}),
             field_0=output_fields_0,
             field_r=output_fields_r,
             field_c=output_fields_c,
             field_z=output_fields_z,
         )
 
-        logger.info(f'Запрос на получение данных выполнен для игрока game_id={player.game_id}.')
+        logger.info('Запрос на получение данных выполнен для игрока game_id=%s.', player.game_id)
 
         return response
 
+    @staticmethod
+    def make_not_modified_response(player, version):
+
+        logger.info('Данные игрока game_id=%s не изменились (версия %s).', player.game_id, version)
+
+        return interdata.create_not_modified(version)
+
+    @staticmethod
+    def read_player_version(player, input_fields_0=None):
+        """
+        Возвращает версию игровых данных игрока.
+
+        Версия читается раньше самих данных: если их изменят между чтениями, клиент
+        получит старую версию с новыми данными и просто перечитает их в следующий раз.
+        Игрок из кэша токенов догружается одним запросом вместе с уровнем.
+        Если с прошлого чтения запустился запланированный таймер, версия сначала увеличивается.
+        """
+
+        fields = player.get_game_fields_to_load()
+
+        if fields:
+            player.refresh_from_db(fields=fields)
+
+        if Player.is_next_timer_started(player.next_timer_start):
+            Player.bump_version_for_started_timers(player.pk)
+            player.refresh_from_db(fields=VERSION_FIELDS)
+
+        return player.version
+
     @staticmethod
     def read_player_common_data(player, input_fields_0):
 
@@ -102,21 +178,15 @@ class PullAPI(BaseJsonSignedAPIView):
 
     @staticmethod
     def read_player_resources(player, input_fields_r):
-        """Читает ресурсы игрока одним запросом."""
+        """Читает ресурсы игрока одним запросом без JOIN (id ресурсов берутся из каталога)."""
 
         if input_fields_r is None:
             return None
 
-        # Оптимизация: один запрос вместо N запросов
-        player_resources = PlayerResource.objects.filter(
-            player=player,
-            resource__name__in=input_fields_r
-        ).select_related('resource')
+        game_catalog = catalog.get_catalog()
+        rows = list(PullAPI.query_player_resources(player, input_fields_r, game_catalog))
 
-        resource_dict = {pr.resource.name: pr.count for pr in player_resources}
-        output_fields_r = {name: resource_dict.get(name, 0) for name in input_fields_r}
-
-        return output_fields_r
+        return PullAPI.make_output_fields_r(input_fields_r, rows, game_catalog)
 
     @staticmethod
     def read_player_costumes(player, input_fields_c):
@@ -125,92 +195,115 @@ class PullAPI(BaseJsonSignedAPIView):
         if input_fields_c is None:
             return None
 
-        if input_fields_c:
-            # Запрошены конкретные костюмы
-            player_costumes = PlayerCostume.objects.filter(
-                player=player,
-                costume__name__in=input_fields_c
-            ).select_related('costume')
-            costume_names = {pc.costume.name for pc in player_costumes}
-            output_fields_c = {name: name in costume_names for name in input_fields_c}
-        else:
-            # Пустой список означает "вернуть все костюмы игрока"
-            player_costumes = PlayerCostume.objects.filter(player=player).select_related('costume')
-            output_fields_c = {pc.costume.name: True for pc in player_costumes}
+        game_catalog = catalog.get_catalog()
+        rows = list(PullAPI.query_player_costumes(player, input_fields_c, game_catalog))
 
-        return output_fields_c
+        if any(cid not in game_catalog.costume_names for cid in rows):
+            game_catalog = catalog.get_refreshed_catalog()
+
+        return PullAPI.make_output_fields_c(input_fields_c, rows, game_catalog)
 
     @staticmethod
     def read_player_timers(player, input_fields_z):
-        """Читает таймеры игрока. Обновляет их состояние и удаляет истёкшие."""
+        """
+        Читает таймеры игрока. Если список пуст ([]), возвращает все таймеры.
+
+        Только чтение: оставшееся время вычисляется из времени запуска и длительности
+        таймера из каталога. Истёкшие таймеры возвращаются с нулём; их строки удаляет
+        отдельная очистка. Запланированные (ещё не запущенные) таймеры не возвращаются.
+        """
 
         if input_fields_z is None:
             return None
 
+        game_catalog = catalog.get_catalog()
+        rows = list(PullAPI.query_player_timers(player, input_fields_z, game_catalog))
+
+        if any(timer_id not in game_catalog.timer_names for timer_id, _ in rows):
+            game_catalog = catalog.get_refreshed_catalog()
+
+        return PullAPI.make_output_fields_z(input_fields_z, rows, game_catalog)
+
+    # Запросы и сборка ответа отделены друг от друга, чтобы их разделял и асинхронный вариант (AsyncPullAPI)
+
+    @staticmethod
+    def query_player_resources(player, input_fields_r, game_catalog):
+        """Запрос строк (resource_id, count). Пустой, если ни одно имя не известно каталогу."""
+
+        resource_ids = [
+            game_catalog.resource_ids[name] for name in input_fields_r if name in game_catalog.resource_ids
+        ]
+        player_resources = PlayerResource.objects.filter(player=player, resource_id__in=resource_ids)
+
+        return (player_resources if resource_ids else player_resources.none()).values_list('resource_id', 'count')
+
+    @staticmethod
+    def make_output_fields_r(input_fields_r, rows, game_catalog):
+
+        resource_dict = {game_catalog.resource_names[rid]: count for rid, count in rows}
+
+        return {name: resource_dict.get(name, 0) for name in input_fields_r}
+
+    @staticmethod
+    def query_player_costumes(player, input_fields_c, game_catalog):
+        """Запрос id костюмов игрока: запрошенных или всех, если список пуст."""
+
+        player_costumes = PlayerCostume.objects.filter(player=player)
+
+        if input_fields_c:
+            # Запрошены конкретные костюмы
+            costume_ids = [
+                game_catalog.costume_ids[name] for name in input_fields_c if name in game_catalog.costume_ids
+            ]
+            player_costumes = player_costumes.filter(costume_id__in=costume_ids) if costume_ids else player_costumes.none()
+
+        return player_costumes.values_list('costume_id', flat=True)
+
+    @staticmethod
+    def make_output_fields_c(input_fields_c, rows, game_catalog):
+
+        costume_names = {game_catalog.costume_names[cid] for cid in rows if cid in game_catalog.costume_names}
+
+        if input_fields_c:
+            return {name: name in costume_names for name in input_fields_c}
+
+        # Пустой список означает "вернуть все костюмы игрока"
+        return {name: True for name in costume_names}
+
+    @staticmethod
+    def query_player_timers(player, input_fields_z, game_catalog):
+        """Запрос строк (timer_id, start_datetime): запрошенных таймеров или всех, если список пуст."""
+
+        player_timers = PlayerTimer.objects.filter(player=player)
+
         if input_fields_z:
             # Запрошены конкретные таймеры
-            with transaction.atomic():
-                player_timers = PlayerTimer.objects.filter(
-                    player=player,
-                    timer__name__in=input_fields_z
-                ).select_related('timer').select_for_update()
-
-                # Обновляем все таймеры
-                timers_to_update = []
-                timers_to_delete = []
-                output_fields_z = {}
+            timer_ids = [game_catalog.timer_ids[name] for name in input_fields_z if name in game_catalog.timer_ids]
+            player_timers = player_timers.filter(timer_id__in=timer_ids) if timer_ids else player_timers.none()
 
-                for player_timer in player_timers:
-                    player_timer.update()
+        return player_timers.values_list('timer_id', 'start_datetime')
 
-                    if player_timer.state == PlayerTimer.State.EXPIRED:
-                        timers_to_delete.append(player_timer.pk)
-                    elif player_timer.state != PlayerTimer.State.PLANNED:
-                        output_fields_z[player_timer.timer.name] = player_timer.remaining
-                        timers_to_update.append(player_timer)
+    @staticmethod
+    def make_output_fields_z(input_fields_z, rows, game_catalog):
 
-                # Пакетные операции
-                if timers_to_update:
-                    PlayerTimer.objects.bulk_update(timers_to_update, ['state', 'remaining', 'start_datetime'])
+        utcnow = helpers.datetime_now_utc()
+        output_fields_z = {}
+        found_names = set()
 
-                if timers_to_delete:
-                    PlayerTimer.objects.filter(pk__in=timers_to_delete).delete()
+        for timer_id, start_datetime in rows:
+            if timer_id not in game_catalog.timer_names:
+                continue
 
-                # Добавляем нули для запрошенных, но не найденных таймеров
-                found_names = {pt.timer.name for pt in player_timers}
+            name = game_catalog.timer_names[timer_id]
+            found_names.add(name)
+            state, remaining = PlayerTimer.evaluate(start_datetime, game_catalog.timer_durations[timer_id], utcnow)
 
-                for name in input_fields_z:
-                    if name not in found_names:
-                        output_fields_z[name] = 0
+            if state != PlayerTimer.State.PLANNED:
+                output_fields_z[name] = remaining
 
-        else:
-            # Пустой список означает "вернуть все таймеры игрока"
-            with transaction.atomic():
-                player_timers = PlayerTimer.objects.filter(player=player).select_related('timer').select_for_update()
-
-                # Обновляем все таймеры
-                timers_to_update = []
-                timers_to_delete = []
-
-                for player_timer in player_timers:
-                    player_timer.update()
-
-                    if player_timer.state == PlayerTimer.State.EXPIRED:
-                        timers_to_delete.append(player_timer.pk)
-                    else:
-                        timers_to_update.append(player_timer)
-
-                # Пакетные операции
-                if timers_to_update:
-                    PlayerTimer.objects.bulk_update(timers_to_update, ['state', 'remaining', 'start_datetime'])
-
-                if timers_to_delete:
-                    PlayerTimer.objects.filter(pk__in=timers_to_delete).delete()
-
-                output_fields_z = {
-                    player_timer.timer.name: player_timer.remaining
-                    for player_timer in player_timers
-                    if player_timer.state != PlayerTimer.State.PLANNED
-                }
+        # Добавляем нули для запрошенных, но не найденных таймеров
+        for name in input_fields_z:
+            if name not in found_names:
+                output_fields_z[name] = 0
 
         return output_fields_z
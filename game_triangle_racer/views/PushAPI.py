@@ -1,7 +1,9 @@
 import logging
+from django.conf import settings
 from django.db import transaction, IntegrityError
-from game_triangle_racer.models import Player, PlayerResource, PlayerCostume, Costume, Resource
-from game_triangle_racer import validators
+from django.db.models import F
+from game_triangle_racer.models import Player, PlayerResource, PlayerCostume
+from game_triangle_racer import catalog, limits as game_limits, metrics, player_state, validators
 from game_triangle_racer.views import interdata
 from game_triangle_racer.views.base_api import BaseJsonSignedAPIView
 
@@ -57,6 +59,8 @@ logger = logging.getLogger(__name__)
 class PushAPI(BaseJsonSignedAPIView):
     """API-эндпоинт для обновления игровой информации на сервере."""
 
+    endpoint_name = 'push'
+
     def handle_request(self, data, player, *args, **kwargs):
         """Обрабатывает запрос на обновление данных игрока."""
 
@@ -67,24 +71,25 @@ class PushAPI(BaseJsonSignedAPIView):
             _,  # Таймеры игнорируются
         ) = interdata.get_fields_as_dictionaries_or_nones(data)
 
+        # Пределы берутся один раз на весь запрос
+        limits = game_limits.get_limits()
+
         try:
-            with transaction.atomic():
-                # Используем select_for_update для защиты от race conditions
-                player = Player.objects.select_for_update().get(pk=player.pk)
-                
-                self.update_player_common_data(player, input_fields_0)
-                self.update_player_resources(player, input_fields_r)
-                self.update_player_costumes(player, input_fields_c)
+            if settings.GAME_PUSH_CONCURRENCY == 'optimistic':
+                self.write_optimistically(player, input_fields_0, input_fields_r, input_fields_c, limits)
+            else:
+                player = self.write_under_lock(player, input_fields_0, input_fields_r, input_fields_c, limits)
 
             response = interdata.create_by_extending(
                 interdata.create_just_success(),
             )
 
-            logger.info(f'Запрос на обновление данных выполнен для игрока game_id={player.game_id}.')
+            logger.info('Запрос на обновление данных выполнен для игрока game_id=%s.', player.game_id)
 
         except ValueError as e:
             # Ошибка валидации
             logger.warning(f'Ошибка валидации для игрока {player.game_id}: {e}')
+            metrics.inc('game_push_validation_failures_total')
             response = interdata.create_validation_error(str(e))
 
         except IntegrityError as e:
@@ -93,21 +98,100 @@ class PushAPI(BaseJsonSignedAPIView):
             response = interdata.create_just_failure()
             response[interdata.FIELD_ERROR_MESSAGE] = 'Ошибка при сохранении данных.'
 
+        except PlayerVersionConflict as e:
+            # Данные игрока всё время меняли параллельные запросы
+            logger.warning(f'Конфликт версий для игрока {player.game_id}: {e}')
+            response = interdata.create_just_failure()
+            response[interdata.FIELD_ERROR_MESSAGE] = 'Данные игрока изменены другим запросом, повторите запрос.'
+
         return response
 
+    @classmethod
+    def write_under_lock(cls, player, input_fields_0, input_fields_r, input_fields_c, limits=None):
+        """
+        Пессимистичный режим: строка игрока блокируется (select_for_update) на всю транзакцию.
+
+        Возвращает заново прочитанного игрока.
+        """
+
+        with transaction.atomic():
+            # Используем select_for_update для защиты от race conditions
+            player = Player.objects.select_for_update().get(pk=player.pk)
+
+            is_level_updated = cls.update_player_common_data(player, input_fields_0, limits, save=False)
+            cls.update_player_resources(player, input_fields_r, limits)
+            cls.update_player_costumes(player, input_fields_c)
+
+            player.version += 1
+            player.state_snapshot = player_state.merge_push(
+                player.state_snapshot, player.level if is_level_updated else None, input_fields_r, input_fields_c,
+            )
+            player.save(update_fields=['level', 'version', 'state_snapshot'])
+
+        return player
+
+    @classmethod
+    def write_optimistically(cls, player, input_fields_0, input_fields_r, input_fields_c, limits=None):
+        """
+        Оптимистичный режим: строка игрока не блокируется на время записи.
+
+        Сначала пишутся строки ресурсов и костюмов, а в конце транзакции один условный
+        UPDATE проверяет, что версия игрока не изменилась, и увеличивает её (вместе с
+        уровнем и снимком состояния). Если версию успел изменить параллельный запрос, транзакция
+        откатывается и повторяется - не больше GAME_PUSH_MAX_RETRIES раз.
+        """
+
+        max_retries = max(settings.GAME_PUSH_MAX_RETRIES, 0)
+
+        for attempt in range(max_retries + 1):
+            try:
+                with transaction.atomic():
+                    version, state = Player.objects.filter(pk=player.pk).values_list('version', 'state_snapshot').get()
+
+                    is_level_updated = cls.update_player_common_data(player, input_fields_0, limits, save=False)
+                    cls.update_player_resources(player, input_fields_r, limits)
+                    cls.update_player_costumes(player, input_fields_c)
+
+                    # Снимок пишется и когда он пуст: снимок, собранный параллельным Pull, мог устареть
+                    changes = {
+                        'version': F('version') + 1,
+                        'state_snapshot': player_state.merge_push(
+                            state, player.level if is_level_updated else None, input_fields_r, input_fields_c,
+                        ),
+                    }
+
+                    if is_level_updated:
+                        changes['level'] = player.level
+
+                    if not Player.objects.filter(pk=player.pk, version=version).update(**changes):
+                        raise PlayerVersionConflict(f'версия {version} устарела')
+
+                return
+
+            except (PlayerVersionConflict, IntegrityError):
+                # IntegrityError здесь - параллельный запрос успел добавить ту же строку костюма
+                metrics.inc('game_push_version_conflicts_total')
+
+                if attempt == max_retries:
+                    raise
+
     @staticmethod
-    def update_player_common_data(player, input_fields_0):
-        """Обновляет общие данные игрока (уровень и т.п.)."""
+    def update_player_common_data(player, input_fields_0, limits=None, save=True):
+        """
+        Обновляет общие данные игрока (уровень и т.п.).
+
+        С save=False только меняет поля объекта. Возвращает True, если что-то изменилось.
+        """
 
         if input_fields_0 is None:
-            return
+            return False
 
         updated = False
 
         for k, v in input_fields_0.items():
             if k == interdata.PLAYER_LEVEL:
                 # Валидация уровня
-                is_valid, error_message = validators.validate_level(v)
+                is_valid, error_message = validators.validate_level(v, limits)
 
                 if not is_valid:
                     logger.warning(f'Невалидный уровень {v} для игрока {player.game_id}: {error_message}')
@@ -116,12 +200,14 @@ class PushAPI(BaseJsonSignedAPIView):
                 player.level = v
                 updated = True
 
-        if updated:
+        if updated and save:
             player.save(update_fields=['level'])
 
+        return updated
+
     @staticmethod
-    def update_player_resources(player, input_fields_r):
-        """Обновляет ресурсы игрока. Оптимизировано для пакетного сохранения."""
+    def update_player_resources(player, input_fields_r, limits=None):
+        """Обновляет ресурсы игрока одним запросом INSERT ... ON CONFLICT DO UPDATE."""
 
         if input_fields_r is None:
             return
@@ -129,53 +215,41 @@ class PushAPI(BaseJsonSignedAPIView):
         if not input_fields_r:
             return
 
-        # Получаем все нужные ресурсы одним запросом
-        resource_names = list(input_fields_r.keys())
-        resources = {r.name: r for r in Resource.objects.filter(name__in=resource_names)}
+        game_catalog = catalog.get_catalog()
 
-        # Получаем существующие PlayerResource одним запросом
-        existing_resources = PlayerResource.objects.filter(
-            player=player,
-            resource__name__in=resource_names
-        ).select_related('resource')
+        if any(name not in game_catalog.resource_ids for name in input_fields_r):
+            game_catalog = catalog.get_refreshed_catalog()
 
-        existing_dict = {pr.resource.name: pr for pr in existing_resources}
-        resources_to_update = []
-        resources_to_create = []
+        resources_to_upsert = []
 
         for resource_name, count in input_fields_r.items():
-            if resource_name not in resources:
+            if resource_name not in game_catalog.resource_ids:
                 logger.warning(f'Ресурс "{resource_name}" не найден в базе данных.')
                 raise ValueError(f'Ресурс "{resource_name}" не найден в базе данных.')
 
+            resource_id = game_catalog.resource_ids[resource_name]
+
             # Валидация количества ресурса
-            is_valid, error_message = validators.validate_resource_count(count)
+            is_valid, error_message = validators.validate_resource_count(count, limits, resource_id)
 
             if not is_valid:
                 logger.warning(f'Невалидное количество ресурса {resource_name}={count} для игрока {player.game_id}: {error_message}')
                 raise ValueError(f'Ресурс "{resource_name}": {error_message}')
 
-            if resource_name in existing_dict:
-                # Обновляем существующий
-                pr = existing_dict[resource_name]
-                pr.count = count
-                resources_to_update.append(pr)
-            else:
-                # Создаём новый
-                resources_to_create.append(
-                    PlayerResource(player=player, resource=resources[resource_name], count=count)
-                )
+            resources_to_upsert.append(
+                PlayerResource(player=player, resource_id=resource_id, count=count)
+            )
 
-        # Пакетные операции
         try:
-            if resources_to_update:
-                PlayerResource.objects.bulk_update(resources_to_update, ['count'])
-
-            if resources_to_create:
-                PlayerResource.objects.bulk_create(resources_to_create)
+            PlayerResource.objects.bulk_create(
+                resources_to_upsert,
+                update_conflicts=True,
+                unique_fields=('player', 'resource'),
+                update_fields=('count',),
+            )
 
         except IntegrityError as e:
-            logger.error(f'Ошибка при bulk операциях с ресурсами для игрока {player.game_id}: {e}')
+            logger.error(f'Ошибка при сохранении ресурсов для игрока {player.game_id}: {e}')
             raise
 
     @staticmethod
@@ -188,34 +262,38 @@ class PushAPI(BaseJsonSignedAPIView):
         if not input_fields_c:
             return
 
-        # Получаем все нужные костюмы одним запросом
-        costume_names = list(input_fields_c.keys())
-        costumes = {c.name: c for c in Costume.objects.filter(name__in=costume_names)}
+        game_catalog = catalog.get_catalog()
 
-        # Получаем существующие PlayerCostume одним запросом
+        if any(name not in game_catalog.costume_ids for name in input_fields_c):
+            game_catalog = catalog.get_refreshed_catalog()
+
+        # Получаем существующие PlayerCostume одним запросом, без JOIN по имени костюма
         existing_costumes = PlayerCostume.objects.filter(
             player=player,
-            costume__name__in=costume_names
-        ).select_related('costume')
+            costume_id__in=[
+                game_catalog.costume_ids[name] for name in input_fields_c if name in game_catalog.costume_ids
+            ]
+        ).values_list('costume_id', 'pk')
 
-        existing_names = {pc.costume.name for pc in existing_costumes}
+        existing_dict = dict(existing_costumes)
         costumes_to_create = []
         costumes_to_delete = []
 
         for costume_name, should_have in input_fields_c.items():
-            if costume_name not in costumes:
+            if costume_name not in game_catalog.costume_ids:
                 logger.warning(f'Костюм "{costume_name}" не найден в базе данных.')
                 raise ValueError(f'Костюм "{costume_name}" не найден в базе данных.')
 
-            if should_have and costume_name not in existing_names:
+            costume_id = game_catalog.costume_ids[costume_name]
+
+            if should_have and costume_id not in existing_dict:
                 # Нужно добавить
                 costumes_to_create.append(
-                    PlayerCostume(player=player, costume=costumes[costume_name])
+                    PlayerCostume(player=player, costume_id=costume_id)
                 )
-            elif not should_have and costume_name in existing_names:
+            elif not should_have and costume_id in existing_dict:
                 # Нужно удалить
-                pc = next(pc for pc in existing_costumes if pc.costume.name == costume_name)
-                costumes_to_delete.append(pc.pk)
+                costumes_to_delete.append(existing_dict[costume_id])
 
         # Пакетные операции
         try:
@@ -228,3 +306,7 @@ class PushAPI(BaseJsonSignedAPIView):
         except IntegrityError as e:
             logger.error(f'Ошибка при bulk операциях с костюмами для игрока {player.game_id}: {e}')
             raise
+
+
+class PlayerVersionConflict(Exception):
+    """Версию игрока изменил параллельный запрос (оптимистичный режим Push)."""
@@ -1,6 +1,10 @@
 import logging
-from game_triangle_racer import helpers
-from game_triangle_racer.models import Player, ShopSet, ShopSetComponent
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from game_triangle_racer import helpers, instrumentation, limits, shop_catalog
+from game_triangle_racer.models import Player, PlayerResource, ShopPriceComponent, ShopSet, ShopSetComponent
 from game_triangle_racer.views import interdata
 from game_triangle_racer.views.base_api import BaseJsonSignedAPIView
 
@@ -126,55 +130,57 @@ logger = logging.getLogger(__name__)
 class ShopAPI(BaseJsonSignedAPIView):
     """API-эндпоинт для работы с магазином."""
 
+    endpoint_name = 'shop'
+
+    ACTIONS = ('showAll', 'showSome', 'buy')
+
     def handle_request(self, data, player, *args, **kwargs):
         """Обрабатывает запрос к магазину."""
-        action = data.get('action')
+        action, action_args = self.parse_request(data)
 
-        if action == 'showAll':
+        if action_args is None:
+            response = interdata.create_just_failure()
+        elif action == 'showAll':
             response = self.show_all()
         elif action == 'showSome':
-            n_from_id = helpers.try_int(data.get('fromId', -1), -1)
-            n_to_id = helpers.try_int(data.get('toId', -1), -1)
-            response = self.show_some(n_from_id, n_to_id)
-        elif action == 'buy':
-            n_id = helpers.try_int(data.get('id', -1), -1)
-            response = self.buy(player, n_id)
+            response = self.show_some(*action_args)
         else:
-            logger.warning(f'Неизвестное действие магазина: {action}')
-            response = interdata.create_just_failure()
+            response = self.buy(player, *action_args)
 
-        logger.info(f'Запрос к магазину выполнен для игрока game_id={player.game_id}, действие: {action}.')
+        logger.info('Запрос к магазину выполнен для игрока game_id=%s, действие: %s.', player.game_id, action)
 
         return response
 
     @staticmethod
-    def show_all():
-        """Возвращает все наборы магазина с оптимизацией запросов."""
-        # Оптимизация: предзагрузка компонентов одним запросом
-
-        shop_sets_qs = ShopSet.objects.prefetch_related('shopsetcomponent_set__resource').all()
-
-        shop_sets = [
-            {
-                "id": shop_set.id,
-                "name": shop_set.name,
-                "price": [
-                    {
-                        "name": price.resource.name,
-                        "count": price.count,
-                    }
-                    for price in shop_set.shoppricecomponent_set.all()
-                ],
-                "components": [
-                    {
-                        "name": component.resource.name,
-                        "count": component.count,
-                    }
-                    for component in shop_set.shopsetcomponent_set.all()
-                ],
-            }
-            for shop_set in shop_sets_qs
-        ]
+    def parse_request(data):
+        """
+        Разбирает запрос к магазину (общий для ShopAPI и AsyncShopAPI) и отмечает действие в инструментировании.
+
+        Возвращает (действие, аргументы): для "showAll" - (), для "showSome" - (n_from_id, n_to_id),
+        для "buy" - (n_id,); для неизвестного действия аргументы - None.
+        """
+
+        action = data.get('action')
+        instrumentation.set_action(action if action in ShopAPI.ACTIONS else 'unknown')
+
+        if action == 'showAll':
+            return action, ()
+
+        if action == 'showSome':
+            return action, (helpers.try_int(data.get('fromId', -1), -1), helpers.try_int(data.get('toId', -1), -1))
+
+        if action == 'buy':
+            return action, (helpers.try_int(data.get('id', -1), -1),)
+
+        logger.warning('Неизвестное действие магазина: %s', action)
+
+        return action, None
+
+    @staticmethod
+    def show_all(current_shop_catalog=None):
+        """Возвращает все наборы магазина из снимка витрины (без запросов к БД)."""
+
+        shop_sets = (current_shop_catalog or shop_catalog.get_shop_catalog()).shop_sets
 
         return interdata.create_by_extending(
             interdata.create_just_success(),
@@ -185,11 +191,11 @@ class ShopAPI(BaseJsonSignedAPIView):
         )
 
     @staticmethod
-    def show_some(n_from_id, n_to_id):
-        """Возвращает наборы магазина в указанном диапазоне с оптимизацией запросов."""
+    def show_some(n_from_id, n_to_id, current_shop_catalog=None):
+        """Возвращает наборы магазина в указанном диапазоне позиций (по возрастанию pk) из снимка витрины."""
 
-        shop_sets_qs = ShopSet.objects.prefetch_related('shopsetcomponent_set__resource')
-        shop_sets_count = shop_sets_qs.count()
+        all_shop_sets = (current_shop_catalog or shop_catalog.get_shop_catalog()).shop_sets
+        shop_sets_count = len(all_shop_sets)
 
         # Нормализация индексов
         n_from_id = max(0, min(n_from_id, shop_sets_count - 1)) if n_from_id >= 0 else 0
@@ -199,29 +205,7 @@ class ShopAPI(BaseJsonSignedAPIView):
         if n_from_id > n_to_id:
             n_from_id, n_to_id = n_to_id, n_from_id
 
-        shop_sets_qs = shop_sets_qs.order_by('pk')[n_from_id:n_to_id + 1]
-
-        shop_sets = [
-            {
-                "id": shop_set.id,
-                "name": shop_set.name,
-                "price": [
-                    {
-                        "name": price.resource.name,
-                        "count": price.count,
-                    }
-                    for price in shop_set.shoppricecomponent_set.all()
-                ],
-                "components": [
-                    {
-                        "name": component.resource.name,
-                        "count": component.count,
-                    }
-                    for component in shop_set.shopsetcomponent_set.all()
-                ],
-            }
-            for shop_set in shop_sets_qs
-        ]
+        shop_sets = all_shop_sets[n_from_id:n_to_id + 1]
 
         return interdata.create_by_extending(
             interdata.create_just_success(),
@@ -235,5 +219,131 @@ class ShopAPI(BaseJsonSignedAPIView):
 
     @staticmethod
     def buy(player, n_id):
+        """
+        Покупает набор магазина: списывает цену и начисляет компоненты одной транзакцией.
+
+        Цена и компоненты читаются из БД внутри транзакции: снимок витрины в других
+        процессах может устареть на GAME_SHOP_CATALOG_CACHE_TTL после правки в админке.
+        Затем строки всех ресурсов покупки блокируются одним запросом по возрастанию id
+        ресурса - в одном порядке для любых наборов, поэтому параллельные покупки не
+        взаимоблокируются. Списывается вся цена (каждый ресурс - условным UPDATE при
+        count >= цены), начисляются компоненты (не выше предела ресурса); версия игрока
+        увеличивается в той же транзакции.
+        """
+
+        current_shop_catalog = shop_catalog.get_shop_catalog()
+        shop_set = current_shop_catalog.shop_sets_by_id.get(n_id)
+
+        if shop_set is None:
+            logger.warning(f'Покупка отклонена: набор магазина id={n_id} не найден.')
+
+            return interdata.create_by_extending(interdata.create_just_failure(), purchase={})
+
+        current_limits = limits.get_limits()
+
+        try:
+            with transaction.atomic():
+                prices = _sum_counts(
+                    ShopPriceComponent.objects.filter(shop_set_id=n_id).values_list('resource_id', 'count')
+                )
+                contents = _sum_counts(
+                    ShopSetComponent.objects.filter(shop_set_id=n_id).values_list('resource_id', 'count')
+                )
+
+                if not prices and not contents and not ShopSet.objects.filter(pk=n_id).exists():
+                    raise _ShopSetNotFound()
+
+                # Блокировки строк ресурсов - до первого UPDATE и в общем для всех покупок порядке
+                list(PlayerResource.objects.filter(
+                    player_id=player.pk,
+                    resource_id__in={*prices, *contents},
+                ).order_by('resource_id').select_for_update().values_list('pk', flat=True))
+
+                for resource_id, count in sorted(prices.items()):
+                    if count > 0:
+                        _debit_player_resource(player.pk, resource_id, count)
+
+                for resource_id, count in sorted(contents.items()):
+                    if count > 0:
+                        _credit_player_resource(
+                            player.pk, resource_id, count, current_limits.get_max_resource_count(resource_id),
+                        )
+
+                # Последним UPDATE покупки: строка игрока блокируется лишь до фиксации, а сбой
+                # не оставит версию и снимок состояния без изменений при уже списанной цене
+                Player.bump_versions([player.pk])
+
+        except _ShopSetNotFound:
+            logger.warning(f'Покупка отклонена: набор магазина id={n_id} удалён.')
+            shop_catalog.invalidate_shop_catalog()
+
+            return interdata.create_by_extending(interdata.create_just_failure(), purchase={})
+
+        except _NotEnoughResources as e:
+            logger.info('Покупка набора id=%s отклонена для игрока game_id=%s: %s', n_id, player.game_id, e)
+
+            return interdata.create_by_extending(interdata.create_just_failure(), purchase={})
+
+        if (
+            prices != _sum_counts(current_shop_catalog.prices[n_id])
+            or contents != _sum_counts(current_shop_catalog.contents[n_id])
+        ):
+            # Снимок этого процесса устарел: в ответе - набор по ценам, которые действительно списаны
+            shop_catalog.invalidate_shop_catalog()
+            shop_set = shop_catalog.get_shop_catalog().shop_sets_by_id.get(n_id, shop_set)
+
+        logger.info('Набор id=%s куплен игроком game_id=%s.', n_id, player.game_id)
+
+        return interdata.create_by_extending(interdata.create_just_success(), purchase=shop_set)
+
+
+class _ShopSetNotFound(Exception):
+    """Набор магазина удалён после загрузки снимка витрины (откатывает транзакцию покупки)."""
+
+
+class _NotEnoughResources(Exception):
+    """Недостаточно ресурсов для оплаты покупки (откатывает транзакцию покупки)."""
+
+
+def _sum_counts(components):
+    """Словарь "id ресурса -> количество" из пар (id ресурса, количество); повторы ресурса складываются."""
+
+    counts = defaultdict(int)
+
+    for resource_id, count in components:
+        counts[resource_id] += count
+
+    return dict(counts)
+
+
+def _debit_player_resource(player_id, resource_id, count):
+
+    updated = PlayerResource.objects.filter(
+        player_id=player_id,
+        resource_id=resource_id,
+        count__gte=count,
+    ).update(count=F('count') - count)
+
+    if not updated:
+        raise _NotEnoughResources(f'ресурса id={resource_id} меньше {count}')
+
+
+def _credit_player_resource(player_id, resource_id, count, max_count):
+    """Начисляет ресурс, не превышая max_count (такое количество отклонил бы и Push)."""
+
+    updated = PlayerResource.objects.filter(
+        player_id=player_id,
+        resource_id=resource_id,
+    ).update(count=Least(F('count') + count, max_count))
+
+    if not updated:
+        try:
+            with transaction.atomic():
+                PlayerResource.objects.create(player_id=player_id, resource_id=resource_id, count=min(count, max_count))
 
-        pass
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            PlayerResource.objects.filter(
+                player_id=player_id,
+                resource_id=resource_id,
+            ).update(count=Least(F('count') + count, max_count))
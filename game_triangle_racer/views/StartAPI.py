@@ -1,28 +1,84 @@
 import logging
+import time
 from django.conf import settings
 from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from game_triangle_racer import helpers
+from game_triangle_racer import capture, helpers
+from game_triangle_racer.logging_handlers import LazyStr
 from game_triangle_racer.models import Player
 from game_triangle_racer.views import interdata
+from game_triangle_racer.views.PullAPI import PullAPI
 
 
 logger = logging.getLogger(__name__)
 
 
+# Request JSON example:
+# {
+#     "platform": "vk.com",
+#     "platformID": 5262235,
+#     "platformAPIID": 1,
+#     "platformAuthKey": "<auth key>",
+#     "v": 17,  ## Optional, as in PullAPI
+#     "0": ["level"],  ## Optional "0", "r", "c", "z": the same projection as in PullAPI
+#     "r": ["coins", "lives"],
+#     "c": []
+# }
+#
+# Response JSON example:
+# {
+#     "isSuccess": 1,
+#     "token": "<token>",
+#     "t": 1700000000000,
+#     "v": 18,  ## Only with a projection in the request; then also "0", "r", "c", "z" as in PullAPI
+#     "0": {...},
+#     "r": {...},
+#     "c": {...},
+#     "z": {...}
+# }
+#
+
+# Поля запроса, которые передаются в PullAPI, если в запросе есть проекция
+PULL_FIELDS = (interdata.FIELD_V, interdata.FIELD_0, interdata.FIELD_R, interdata.FIELD_C, interdata.FIELD_Z)
+
+
 class StartAPI(APIView):
-    """API-эндпоинт для начала игровой сессии. Выдаёт токен."""
+    """
+    API-эндпоинт для начала игровой сессии. Выдаёт токен.
+
+    Если в запросе есть поля "0", "r", "c" или "z", ответ сразу содержит и данные
+    игрока, как ответ PullAPI, что избавляет клиента от отдельного Pull после Start.
+    """
 
     def post(self, request, *args, **kwargs):
         """Обрабатывает запрос на начало сессии."""
 
+        started = time.perf_counter()
+        response, status_code = self._process_request(request)
+
+        if capture.is_enabled():
+            data = interdata.from_json(request.body)
+            token = interdata.get_token(response)
+            capture.record(
+                'start', request.body, status_code, started,
+                token_hex=token.encode('utf-8').hex() if token else None,
+                player_alias=capture.get_player_alias(
+                    interdata.get_platform(data), interdata.get_platform_id(data),
+                ) if isinstance(data, dict) else None,
+            )
+
+        return Response(response, status=status_code)
+
+    def _process_request(self, request):
+        """Возвращает (ответ, HTTP-статус)."""
+
         if request.content_type != 'application/json':
             logger.warning('Запрос отклонён: требуется JSON.')
             response = interdata.create_only_json_allowed_error()
 
-            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+            return response, status.HTTP_400_BAD_REQUEST
 
         data = interdata.from_json(request.body)
 
@@ -30,18 +86,17 @@ class StartAPI(APIView):
             logger.warning('Запрос отклонён: некорректный JSON.')
             response = interdata.create_wrong_json_error()
 
-            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+            return response, status.HTTP_400_BAD_REQUEST
 
         platform = interdata.get_platform(data)
-        safe_data = self._mask_sensitive_data(data.copy())
-        logger.info(f'Запрос на начало сессии от платформы \'{platform}\': {safe_data}')
+        logger.info('Запрос на начало сессии от платформы \'%s\': %s', platform, LazyStr(self._mask_sensitive_data, data))
 
         response = interdata.create_just_failure()
 
         if platform == 'vk.com':
             response = self._make_response_for_vk(data)
 
-        return Response(response, status=status.HTTP_200_OK)
+        return response, status.HTTP_200_OK
 
     def _make_response_for_vk(self, data):
         """Обрабатывает запрос от VK платформы."""
@@ -82,9 +137,13 @@ class StartAPI(APIView):
                 ).select_for_update().first()
 
                 # Если разрешено, то новый игрок будет создан, даже если
-                # игровой клиент не веб-приложение, а, например, десктопное
+                # игровой клиент не веб-приложение, а, например, десктопное.
+                # Player.log_in переживает одновременную регистрацию того же игрока; отметку
+                # входа (а с ней секрет сессии игрока, вошедшего параллельно) он не трогает.
+                # platform_id в запросе - строка, а ключи player_id_cache - числа, как в GameClientView
                 if not player and settings.PLAYER_REGISTRATION_AT_START_API_FOR_DEBUG:
-                    player = Player.create_and_get_new_player(platform, platform_id, start_stamp)
+                    game_id = Player.log_in(platform, helpers.try_int(platform_id), None, regin_stamp=start_stamp)
+                    player = Player.objects.select_for_update().get(pk=game_id)
 
                 if player:
                     response = interdata.create_by_extending(
@@ -98,8 +157,14 @@ class StartAPI(APIView):
                     player.start_stamp = start_stamp
                     player.session_quasisecret = start_stamp - player.login_stamp
                     player.save(update_fields=['start_stamp', 'session_quasisecret', 'token', 'token_expiration'])
+                    player.forget_cached_token()  # Секрет сессии изменился
+
+                    pull_data = self.get_pull_data(data)
+
+                    if pull_data is not None:
+                        response = self.extend_by_player_data(response, pull_data, player)
 
-                    logger.info(f'Токен выдан для игрока game_id={player.game_id}.')
+                    logger.info('Токен выдан для игрока game_id=%s.', player.game_id)
 
                 else:
                     logger.warning('Обработка токена не удалась: игрок не найден.')
@@ -109,6 +174,29 @@ class StartAPI(APIView):
 
         return response
 
+    @staticmethod
+    def get_pull_data(data):
+        """Возвращает тело запроса Pull из запроса Start или None, если проекции в запросе нет."""
+
+        if not any(name in data for name in PULL_FIELDS if name != interdata.FIELD_V):
+            return None
+
+        return {name: data[name] for name in PULL_FIELDS if name in data}
+
+    @staticmethod
+    def extend_by_player_data(response, pull_data, player):
+        """
+        Дополняет ответ данными игрока, прочитанными так же, как в PullAPI.
+
+        Вызывается под блокировкой строки игрока, которую Start уже загрузил целиком,
+        поэтому версия и уровень берутся из неё без повторного чтения.
+        """
+
+        pull_response = PullAPI().handle_request(pull_data, player)
+        pull_response.pop(interdata.FIELD_IS_SUCCESS, None)
+
+        return interdata.create_by_extending(response, **pull_response)
+
     @staticmethod
     def _mask_sensitive_data(data):
         """Маскирует чувствительные данные в логах."""
@@ -1,13 +1,25 @@
 from game_triangle_racer.views.GameClientView import GameClientView
+from game_triangle_racer.views.MetricsView import MetricsView
 from game_triangle_racer.views.StartAPI import StartAPI
 from game_triangle_racer.views.PullAPI import PullAPI
 from game_triangle_racer.views.PushAPI import PushAPI
 from game_triangle_racer.views.ShopAPI import ShopAPI
+from game_triangle_racer.views.BatchAPI import BatchAPI
+from game_triangle_racer.views.AsyncPullAPI import AsyncPullAPI
+from game_triangle_racer.views.AsyncPushAPI import AsyncPushAPI
+from game_triangle_racer.views.AsyncShopAPI import AsyncShopAPI
+from game_triangle_racer.views.AsyncBatchAPI import AsyncBatchAPI
 
 __all__ = [
     'GameClientView',
+    'MetricsView',
     'StartAPI',
     'PullAPI',
     'PushAPI',
     'ShopAPI',
+    'BatchAPI',
+    'AsyncPullAPI',
+    'AsyncPushAPI',
+    'AsyncShopAPI',
+    'AsyncBatchAPI',
 ]
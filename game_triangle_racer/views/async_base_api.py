@@ -0,0 +1,99 @@
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from game_triangle_racer import capture, jsoncodec
+from game_triangle_racer.models import Player
+from game_triangle_racer.views import interdata
+from game_triangle_racer.views.base_api import BaseJsonSignedAPIView
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBaseJsonSignedAPIView(View):
+    """
+    Асинхронный вариант BaseJsonSignedAPIView для запуска под ASGI (uvicorn).
+
+    Пока запрос ждёт БД, поток событий обслуживает другие запросы. Шаги проверки
+    запроса общие с синхронным классом; обработка по умолчанию - синхронный
+    handle_request класса sync_view_class, вызванный в потоке.
+    """
+
+    sync_view_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True  # Запросы аутентифицируются токеном и подписью
+
+        return view
+
+    async def post(self, request, *args, **kwargs):
+        """Обрабатывает POST-запрос с JSON-телом."""
+
+        response, status_code = await self.aprocess_signed_request(request.content_type, request.body, *args, **kwargs)
+
+        return HttpResponse(jsoncodec.dumps(response), content_type='application/json', status=status_code)
+
+    async def aprocess_signed_request(self, content_type, body, *args, **kwargs):
+        """Асинхронный вариант BaseJsonSignedAPIView.process_signed_request."""
+
+        started = time.perf_counter()
+        response, status_code = await self._aprocess_signed_request(content_type, body, *args, **kwargs)
+        endpoint_name = self.sync_view_class.endpoint_name if self.sync_view_class else None
+        capture.record(endpoint_name, body, status_code, started, token_hex=kwargs.get('token'))
+
+        return response, status_code
+
+    async def _aprocess_signed_request(self, content_type, body, *args, **kwargs):
+
+        steps = BaseJsonSignedAPIView
+        data, rejection = steps.parse_request_body(content_type, body)
+
+        if rejection:
+            return rejection
+
+        # Получение токена из URL (если требуется)
+        token_hex = kwargs.get('token')
+        player = await Player.aget_player_by_token_from_hex(token_hex) if token_hex else None
+        steps.log_incoming_request(data, token_hex)
+
+        # Проверка подписи
+        session_quasisecret, is_data_signed_well = steps.check_signature(data, player)
+
+        if not is_data_signed_well and player and player.from_token_cache:
+            # Секрет сессии в кэше мог устареть (сессию перезапустили в другом процессе)
+            await player.aforget_cached_token()
+            player = await Player.aget_player_by_token_from_hex(token_hex, use_cache=False)
+            session_quasisecret, is_data_signed_well = steps.check_signature(data, player)
+
+        rejection = steps.reject_unauthorized(player, session_quasisecret, is_data_signed_well)
+
+        if rejection:
+            return rejection
+
+        # Вызов метода обработки запроса
+        try:
+            response = await self.ahandle_request(data, player, *args, **kwargs)
+
+        except Exception as e:
+            return steps.make_internal_error_response(e, session_quasisecret)
+
+        interdata.signify(response, session_quasisecret)
+
+        return response, status.HTTP_200_OK
+
+    async def ahandle_request(self, data, player, *args, **kwargs):
+        """
+        Обработка запроса. По умолчанию вызывает handle_request синхронного класса в потоке:
+        транзакции (transaction.atomic, select_for_update) асинхронному ORM недоступны.
+        """
+
+        if self.sync_view_class is None:
+            raise NotImplementedError("Метод ahandle_request должен быть переопределён или задан sync_view_class.")
+
+        return await sync_to_async(self.sync_view_class().handle_request)(data, player, *args, **kwargs)
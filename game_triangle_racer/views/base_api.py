@@ -1,8 +1,11 @@
 import logging
+import time
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from game_triangle_racer import capture, metrics
+from game_triangle_racer.logging_handlers import LazyStr
 from game_triangle_racer.models import Player
 from game_triangle_racer.views import interdata
 
@@ -13,73 +16,145 @@ logger = logging.getLogger(__name__)
 class BaseJsonSignedAPIView(APIView):
     """Базовый класс для JSON API с проверкой подписи и токена."""
 
+    # Имя запроса в записи запросов (см. game_triangle_racer.capture)
+    endpoint_name = None
+
     def post(self, request, *args, **kwargs):
         """Обрабатывает POST-запрос с JSON-телом."""
 
+        response, status_code = self.process_signed_request(request.content_type, request.body, *args, **kwargs)
+
+        return Response(response, status=status_code)
+
+    def process_signed_request(self, content_type, body, *args, **kwargs):
+        """
+        Проверяет запрос (JSON, токен, подпись), вызывает handle_request и подписывает ответ.
+
+        Не зависит от DRF: возвращает кортеж (словарь ответа, HTTP-статус), поэтому
+        используется и облегчённой диспетчеризацией (см. game_triangle_racer.dispatch).
+        При GAME_REQUEST_CAPTURE=True запрос записывается для replay_capture.
+        """
+
+        started = time.perf_counter()
+        response, status_code = self._process_signed_request(content_type, body, *args, **kwargs)
+        capture.record(self.endpoint_name, body, status_code, started, token_hex=kwargs.get('token'))
+
+        return response, status_code
+
+    def _process_signed_request(self, content_type, body, *args, **kwargs):
+
+        data, rejection = self.parse_request_body(content_type, body)
+
+        if rejection:
+            return rejection
+
+        # Получение токена из URL (если требуется)
+        token_hex = kwargs.get('token')
+        player = Player.get_player_by_token_from_hex(token_hex) if token_hex else None
+        self.log_incoming_request(data, token_hex)
+
+        # Проверка подписи
+        session_quasisecret, is_data_signed_well = self.check_signature(data, player)
+
+        if not is_data_signed_well and player and player.from_token_cache:
+            # Секрет сессии в кэше мог устареть (сессию перезапустили в другом процессе)
+            player.forget_cached_token()
+            player = Player.get_player_by_token_from_hex(token_hex, use_cache=False)
+            session_quasisecret, is_data_signed_well = self.check_signature(data, player)
+
+        rejection = self.reject_unauthorized(player, session_quasisecret, is_data_signed_well)
+
+        if rejection:
+            return rejection
+
+        # Вызов метода обработки запроса
+        try:
+            response = self.handle_request(data, player, *args, **kwargs)
+
+        except Exception as e:
+            return self.make_internal_error_response(e, session_quasisecret)
+
+        interdata.signify(response, session_quasisecret)
+
+        return response, status.HTTP_200_OK
+
+    # Шаги обработки запроса, общие с асинхронным вариантом (см. async_base_api)
+
+    @staticmethod
+    def parse_request_body(content_type, body):
+        """Возвращает (данные запроса, None) или (None, (ответ с ошибкой, HTTP-статус))."""
+
         # Проверка Content-Type
-        if request.content_type != 'application/json':
+        if content_type != 'application/json':
             logger.warning('Запрос отклонён: требуется JSON.')
             response = interdata.create_only_json_allowed_error()
 
-            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+            return None, (response, status.HTTP_400_BAD_REQUEST)
 
         # Парсинг JSON
-        data = interdata.from_json(request.body)
+        data = interdata.from_json(body)
 
         if not data:
             logger.warning('Запрос отклонён: некорректный JSON.')
             response = interdata.create_wrong_json_error()
 
-            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+            return None, (response, status.HTTP_400_BAD_REQUEST)
 
-        # Получение токена из URL (если требуется)
-        token_hex = kwargs.get('token')
+        return data, None
 
-        if token_hex:
-            player = Player.get_player_by_token_from_hex(token_hex)
-        else:
-            player = None
+    @classmethod
+    def log_incoming_request(cls, data, token_hex):
 
-        # Логирование (без чувствительных данных)
-        safe_data = self._mask_sensitive_data(data.copy())
-        logger.info(f'Входящий запрос: {safe_data}. Токен: {"***" if token_hex else "нет"}.')
+        # Логирование (без чувствительных данных); маскированная копия строится, только если запись попадёт в лог
+        logger.info('Входящий запрос: %s. Токен: %s.', LazyStr(cls._mask_sensitive_data, data), '***' if token_hex else 'нет')
 
-        if not player:
-            logger.info(f'Запрос отклонён: игрок с токеном не найден или токен истёк.')
-            response = interdata.create_just_failure()
-            interdata.signify(response, '')
+    @staticmethod
+    def check_signature(data, player):
+        """Возвращает (секрет сессии, подписан ли запрос верно). Без игрока секрет пустой."""
 
-            return Response(response, status=status.HTTP_401_UNAUTHORIZED)
+        if not player:
+            return '', False
 
-        # Проверка подписи
         session_quasisecret = str(player.session_quasisecret)
         is_data_signed_well = (
             interdata.is_signed_well(data, session_quasisecret)
             or settings.BYPASS_REQUEST_SIGNATURE_VALIDATION_FOR_DEBUG
         )
 
+        return session_quasisecret, is_data_signed_well
+
+    @staticmethod
+    def reject_unauthorized(player, session_quasisecret, is_data_signed_well):
+        """Возвращает (ответ 401, HTTP-статус), если запрос не прошёл аутентификацию, иначе None."""
+
+        if not player:
+            logger.info('Запрос отклонён: игрок с токеном не найден или токен истёк.')
+            metrics.inc('game_api_unauthorized_total', reason='token')
+            response = interdata.create_just_failure()
+            interdata.signify(response, '')
+
+            return response, status.HTTP_401_UNAUTHORIZED
+
         if not is_data_signed_well:
             logger.warning(
                 f'Запрос отклонён: неверная подпись для игрока {player.game_id}.'
             )
+            metrics.inc('game_api_unauthorized_total', reason='signature')
             response = interdata.create_just_failure()
             interdata.signify(response, session_quasisecret)
 
-            return Response(response, status=status.HTTP_401_UNAUTHORIZED)
+            return response, status.HTTP_401_UNAUTHORIZED
 
-        # Вызов метода обработки запроса
-        try:
-            response = self.handle_request(data, player, *args, **kwargs)
-            interdata.signify(response, session_quasisecret)
+        return None
 
-            return Response(response, status=status.HTTP_200_OK)
+    @staticmethod
+    def make_internal_error_response(e, session_quasisecret):
 
-        except Exception as e:
-            logger.error(f'Ошибка при обработке запроса: {e}', exc_info=True)
-            response = interdata.create_just_failure()
-            interdata.signify(response, session_quasisecret)
+        logger.error(f'Ошибка при обработке запроса: {e}', exc_info=True)
+        response = interdata.create_just_failure()
+        interdata.signify(response, session_quasisecret)
 
-            return Response(response, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return response, status.HTTP_500_INTERNAL_SERVER_ERROR
 
     def handle_request(self, data, player, *args, **kwargs):
         """Обрабатывает запрос после всех проверок. Должен быть переопределён в наследниках."""
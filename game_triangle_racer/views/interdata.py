@@ -1,6 +1,5 @@
 import json
-import hashlib
-from game_triangle_racer import helpers
+from game_triangle_racer import helpers, jsoncodec, signature
 
 
 YES = 1
@@ -24,6 +23,8 @@ FIELD_PLATFORM_API_ID = 'platformAPIID'
 FIELD_PLATFORM_AUTH_KEY = 'platformAuthKey'
 FIELD_TOKEN = 'token'
 FIELD_T = 't'
+FIELD_V = 'v'  # Версия игровых данных игрока (условный Pull)
+FIELD_NOT_MODIFIED = 'notModified'
 
 # Names of fields about common gameplay data (section FIELD_0)
 PLAYER_ID = 'playerID'
@@ -37,10 +38,7 @@ def from_json(json_object):
     """Парсит JSON-строку или bytes. Возвращает словарь или пустой словарь при ошибке."""
 
     try:
-        if isinstance(json_object, bytes):
-            json_object = json_object.decode('utf-8')
-
-        data = json.loads(json_object)
+        data = jsoncodec.loads(json_object)
 
     except (json.JSONDecodeError, UnicodeDecodeError):
         data = {}
@@ -52,16 +50,14 @@ def signify(struct, secret):
     """
     Добавляет подпись к структуре данных.
     
-    Подпись вычисляется как MD5 от строкового представления структуры
-    (через stringify) + секрет. Подпись добавляется в поле 'sig'.
+    Подпись вычисляется как MD5 от канонического строкового представления структуры
+    (см. game_triangle_racer.signature) + секрет. Подпись добавляется в поле 'sig'.
     """
 
     if not isinstance(struct, dict):
         raise ValueError("Первый параметр должен быть словарём.")
 
-    struct[FIELD_SIGNATURE] = hashlib.md5(
-        f'{helpers.stringify(struct)}{secret}'.encode('utf-8')
-    ).hexdigest()
+    signature.sign(struct, secret)
 
 
 def is_successful(struct):
@@ -76,12 +72,7 @@ def is_signed_well(struct, secret):
     Вычисляет подпись от структуры без поля 'sig' и сравнивает с полученной подписью.
     """
 
-    received_sig = struct.get(FIELD_SIGNATURE, '')
-    computed_sig = hashlib.md5(
-        f'{helpers.stringify({k: v for k, v in struct.items() if k != FIELD_SIGNATURE})}{secret}'.encode('utf-8')
-    ).hexdigest()
-
-    return received_sig == computed_sig
+    return signature.verify(struct, secret)
 
 
 # Structure creators
@@ -130,6 +121,16 @@ def create_just_failure():
     }
 
 
+def create_not_modified(version):
+    """Ответ условного Pull: данные игрока не изменились с версии version."""
+
+    return {
+        **create_just_success(),
+        FIELD_NOT_MODIFIED: YES,
+        FIELD_V: version,
+    }
+
+
 def create_unrecognized_error():
 
     return {
@@ -223,6 +224,17 @@ def get_t(struct):
     return t
 
 
+def get_v(struct):
+    """Версия данных, известная клиенту, или None, если её нет в запросе."""
+
+    value = struct.get(FIELD_V) if isinstance(struct, dict) else None
+
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+
+    return value
+
+
 # Getters | Data fields
 
 
@@ -1,6 +1,7 @@
 from builtins import FileNotFoundError
 from pathlib import Path
 from decouple import Config, RepositoryEnv, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 
 # ### Paths for files and directories
@@ -15,6 +16,8 @@ STATICFILES_DIRS = [
     BASE_DIR / "game_triangle_racer" / "static",
 ]
 STATIC_ROOT = BASE_DIR.parent / "django_projects_static"
+DEFAULT_METRICS_DIR = BASE_DIR.parent / "django_projects_metrics"
+DEFAULT_CAPTURE_FILE_PATH = BASE_DIR.parent / "django_projects_capture-{pid}.jsonl"
 # MEDIA_ROOT = BASE_DIR.parent / "django_projects_media"
 
 try:
@@ -32,12 +35,63 @@ BYPASS_REQUEST_SIGNATURE_VALIDATION_FOR_DEBUG = config_env("BYPASS_REQUEST_SIGNA
 BYPASS_PLATFORM_SESSION_VALIDATION_FOR_DEBUG = config_env("BYPASS_PLATFORM_SESSION_VALIDATION_FOR_DEBUG", cast=bool, default=False)
 PLAYER_REGISTRATION_AT_START_API_FOR_DEBUG = config_env("PLAYER_REGISTRATION_AT_START_API_FOR_DEBUG", cast=bool, default=False)
 LOG_FILE_PATH = config_env("LOG_FILE_PATH", default=str(DEFAULT_LOG_FILE_PATH))
+LOG_LEVEL = config_env("LOG_LEVEL", default="DEBUG")
+LOG_ROTATION = config_env("LOG_ROTATION", default="none")  # none | size | time
+LOG_MAX_BYTES = config_env("LOG_MAX_BYTES", cast=int, default=50 * 1024 * 1024)  # For LOG_ROTATION=size
+LOG_ROTATION_WHEN = config_env("LOG_ROTATION_WHEN", default="midnight")  # For LOG_ROTATION=time
+LOG_BACKUP_COUNT = config_env("LOG_BACKUP_COUNT", cast=int, default=7)
+LOG_QUEUE_SIZE = config_env("LOG_QUEUE_SIZE", cast=int, default=10000)  # Records beyond it are dropped
+LOG_INFO_SAMPLE_RATE = config_env("LOG_INFO_SAMPLE_RATE", cast=float, default=1.0)  # Share of per-request info logs kept
+
+# Opt-in capture of masked game API requests for the replay_capture command (see game_triangle_racer.capture).
+# "{pid}" in the path gives every worker process its own file
+GAME_REQUEST_CAPTURE = config_env("GAME_REQUEST_CAPTURE", cast=bool, default=False)
+GAME_REQUEST_CAPTURE_FILE_PATH = config_env("GAME_REQUEST_CAPTURE_FILE_PATH", default=str(DEFAULT_CAPTURE_FILE_PATH))
+GAME_REQUEST_CAPTURE_MAX_BYTES = config_env("GAME_REQUEST_CAPTURE_MAX_BYTES", cast=int, default=100 * 1024 * 1024)
+GAME_REQUEST_CAPTURE_BACKUP_COUNT = config_env("GAME_REQUEST_CAPTURE_BACKUP_COUNT", cast=int, default=10)
 SECRET_KEY = config_env("SECRET_KEY")
 PRODUCTION_DATABASE = config_env("PRODUCTION_DATABASE", cast=bool)
 
 # VK integration settings
 VK_APP_SECURE_KEY = config_env("VK_APP_SECURE_KEY", default="")
 
+# Serve signed game API requests without Django middleware and DRF (see game_triangle_racer.dispatch)
+GAME_API_LEAN_DISPATCH = config_env("GAME_API_LEAN_DISPATCH", cast=bool, default=False)
+# Async Pull/Push/Shop views; serve with an ASGI server, e.g. `uvicorn asgi:application`
+GAME_API_ASYNC_VIEWS = config_env("GAME_API_ASYNC_VIEWS", cast=bool, default=False)
+
+# Game API caches (per process)
+GAME_TOKEN_CACHE_MAX_SIZE = config_env("GAME_TOKEN_CACHE_MAX_SIZE", cast=int, default=10000)
+GAME_TOKEN_CACHE_TTL = config_env("GAME_TOKEN_CACHE_TTL", cast=float, default=60.0)  # seconds
+GAME_PLAYER_ID_CACHE_MAX_SIZE = config_env("GAME_PLAYER_ID_CACHE_MAX_SIZE", cast=int, default=100000)
+GAME_PLAYER_ID_CACHE_TTL = config_env("GAME_PLAYER_ID_CACHE_TTL", cast=float, default=3600.0)  # seconds
+GAME_CATALOG_CACHE_TTL = config_env("GAME_CATALOG_CACHE_TTL", cast=float, default=60.0)  # seconds
+GAME_SHOP_CATALOG_CACHE_TTL = config_env("GAME_SHOP_CATALOG_CACHE_TTL", cast=float, default=60.0)  # seconds
+GAME_LIMITS_CACHE_TTL = config_env("GAME_LIMITS_CACHE_TTL", cast=float, default=60.0)  # seconds
+GAME_NEW_PLAYER_TEMPLATE_CACHE_TTL = config_env("GAME_NEW_PLAYER_TEMPLATE_CACHE_TTL", cast=float, default=60.0)  # seconds
+
+# Push concurrency control: "pessimistic" (lock the player row for the whole write) or
+# "optimistic" (version check at the end, retried up to GAME_PUSH_MAX_RETRIES times on conflict)
+GAME_PUSH_CONCURRENCY = config_env("GAME_PUSH_CONCURRENCY", default="pessimistic")
+GAME_PUSH_MAX_RETRIES = config_env("GAME_PUSH_MAX_RETRIES", cast=int, default=3)
+
+# Maximal number of operations in one /api/batch/ request
+GAME_BATCH_MAX_OPS = config_env("GAME_BATCH_MAX_OPS", cast=int, default=10)
+
+# Answer Pull from the denormalized Player.state_snapshot with one primary-key read
+# (see game_triangle_racer.player_state); the player tables stay the source of truth
+GAME_PLAYER_STATE_SNAPSHOT = config_env("GAME_PLAYER_STATE_SNAPSHOT", cast=bool, default=False)
+
+# Per-request SQL count, DB time and view time of game API endpoints (see game_triangle_racer.instrumentation)
+GAME_API_INSTRUMENTATION = config_env("GAME_API_INSTRUMENTATION", cast=bool, default=True)
+GAME_SLOW_REQUEST_MS = config_env("GAME_SLOW_REQUEST_MS", cast=float, default=500.0)
+
+# Prometheus-style metrics shared by all worker processes through files (see game_triangle_racer.metrics)
+GAME_METRICS_ENABLED = config_env("GAME_METRICS_ENABLED", cast=bool, default=True)
+GAME_METRICS_DIR = config_env("GAME_METRICS_DIR", default=str(DEFAULT_METRICS_DIR))
+GAME_METRICS_FLUSH_INTERVAL = config_env("GAME_METRICS_FLUSH_INTERVAL", cast=float, default=1.0)  # seconds
+GAME_METRICS_TOKEN = config_env("GAME_METRICS_TOKEN", default="")  # Required as "Authorization: Bearer <token>"; the endpoint is disabled (404) while empty
+
 
 # ### Log configuration
 
@@ -51,21 +105,54 @@ LOGGING = {
         'file': {
             'format': '%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
         },
+        'capture': {
+            'format': '%(message)s',
+        },
+    },
+    'filters': {
+        'sample_api_info': {
+            '()': 'game_triangle_racer.logging_handlers.SamplingFilter',
+            'rate': LOG_INFO_SAMPLE_RATE,
+            'prefixes': ['game_triangle_racer.views'],
+        },
     },
     'handlers': {
         'file': {
+            # The file is written by a background thread, see game_triangle_racer.logging_handlers
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'game_triangle_racer.logging_handlers.QueuedFileHandler',
             'formatter': 'file',
+            'filters': ['sample_api_info'],
             'filename': LOG_FILE_PATH,
+            'rotation': LOG_ROTATION,
+            'max_bytes': LOG_MAX_BYTES,
+            'when': LOG_ROTATION_WHEN,
+            'backup_count': LOG_BACKUP_COUNT,
+            'queue_size': LOG_QUEUE_SIZE,
+        },
+        'capture': {
+            # The file is opened on the first captured request only
+            'level': 'INFO',
+            'class': 'game_triangle_racer.logging_handlers.QueuedFileHandler',
+            'formatter': 'capture',
+            'filename': GAME_REQUEST_CAPTURE_FILE_PATH,
+            'rotation': 'size',
+            'max_bytes': GAME_REQUEST_CAPTURE_MAX_BYTES,
+            'backup_count': GAME_REQUEST_CAPTURE_BACKUP_COUNT,
+            'queue_size': LOG_QUEUE_SIZE,
         },
     },
     'loggers': {
         '': {
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'handlers': ['file'],
             'propagate': True,
         },
+        'game_triangle_racer.capture': {
+            'level': 'INFO',
+            'handlers': ['capture'],
+            'propagate': False,
+        },
     },
 }
 
@@ -90,6 +177,26 @@ STATIC_URL = "/static/"
 
 # ### Databases configuration
 
+# How connections are reused: "new" (a connection per request), "persistent" (kept for
+# DB_CONN_MAX_AGE seconds and health-checked at the start of each request) or "pool"
+# (psycopg 3 connection pool, PostgreSQL only). Use "new" or "pool" for ASGI deployments:
+# Django does not reuse persistent connections across async requests.
+DB_CONNECTION_MODE = config_env("DB_CONNECTION_MODE", default="new")
+DB_CONN_MAX_AGE = config_env("DB_CONN_MAX_AGE", cast=int, default=600)  # seconds
+DB_POOL_MIN_SIZE = config_env("DB_POOL_MIN_SIZE", cast=int, default=2)
+DB_POOL_MAX_SIZE = config_env("DB_POOL_MAX_SIZE", cast=int, default=10)
+DB_POOL_TIMEOUT = config_env("DB_POOL_TIMEOUT", cast=float, default=10.0)  # seconds to wait for a free connection
+# SQLite tuning for single-box deployments: WAL journal, synchronous=NORMAL, busy timeout
+# and IMMEDIATE write transactions (no "database is locked" on lock upgrade)
+DB_SQLITE_TUNING = config_env("DB_SQLITE_TUNING", cast=bool, default=False)
+DB_SQLITE_BUSY_TIMEOUT = config_env("DB_SQLITE_BUSY_TIMEOUT", cast=float, default=5.0)  # seconds
+
+if DB_CONNECTION_MODE not in ("new", "persistent", "pool"):
+    raise ImproperlyConfigured(f"DB_CONNECTION_MODE must be new, persistent or pool, not {DB_CONNECTION_MODE!r}")
+
+if DB_CONNECTION_MODE == "pool" and not PRODUCTION_DATABASE:
+    raise ImproperlyConfigured("DB_CONNECTION_MODE=pool requires PostgreSQL (PRODUCTION_DATABASE=True)")
+
 if PRODUCTION_DATABASE:
     DATABASES = {
         "default": {
@@ -101,6 +208,16 @@ if PRODUCTION_DATABASE:
             "PORT": config_env("DB_PORT"),
         }
     }
+
+    if DB_CONNECTION_MODE == "pool":
+        # Requires psycopg 3 with the pool extra (see requirements/production.txt)
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": DB_POOL_MIN_SIZE,
+                "max_size": DB_POOL_MAX_SIZE,
+                "timeout": DB_POOL_TIMEOUT,
+            },
+        }
 else:
     DATABASES = {
         "default": {
@@ -109,6 +226,17 @@ else:
         }
     }
 
+    if DB_SQLITE_TUNING:
+        DATABASES["default"]["OPTIONS"] = {
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+            "timeout": DB_SQLITE_BUSY_TIMEOUT,
+            "transaction_mode": "IMMEDIATE",
+        }
+
+if DB_CONNECTION_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
@@ -138,6 +266,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "game_triangle_racer.middleware.GameAPIInstrumentationMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -181,9 +310,9 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'game_triangle_racer.renderers.FastJSONRenderer',  # orjson, if installed
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'game_triangle_racer.parsers.FastJSONParser',  # orjson, if installed
     ],
 }
@@ -1,6 +1,11 @@
 import os
 import django.core.wsgi
+from django.conf import settings
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.production")
 application = django.core.wsgi.get_wsgi_application()
+
+if settings.GAME_API_LEAN_DISPATCH:
+    from game_triangle_racer.dispatch import LeanGameAPIMiddleware
+    application = LeanGameAPIMiddleware(application)